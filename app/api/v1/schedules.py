@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from uuid import UUID
+from typing import Annotated
+
+from app.db.database import get_database
+from app.schemas.schedule import TaskScheduleCreate, TaskScheduleResponse
+from app.servisec.schedules import create_schedule_s, get_schedules_s, delete_schedule_s
+
+router = APIRouter()
+
+
+@router.post('/', response_model=TaskScheduleResponse, status_code=201)
+async def create_schedule(
+    schedule_in: TaskScheduleCreate,
+    session: Annotated[AsyncSession, Depends(get_database)]
+):
+    '''
+    Создает повторяющуюся задачу по cron-выражению
+    '''
+
+    return await create_schedule_s(schedule_in, session)
+
+
+@router.get('/', response_model=list[TaskScheduleResponse])
+async def get_schedules(
+    session: Annotated[AsyncSession, Depends(get_database)]
+):
+    '''
+    Возвращает все расписания
+    '''
+
+    return await get_schedules_s(session)
+
+
+@router.delete('/{schedule_id}', status_code=204)
+async def delete_schedule(
+    schedule_id: UUID,
+    session: Annotated[AsyncSession, Depends(get_database)]
+):
+    '''
+    Удаляет расписание, созданные из него задачи остаются
+    '''
+
+    await delete_schedule_s(schedule_id, session)
+    return
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Body, Header, WebSocket
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from uuid import UUID
 from typing import Annotated
 
+from app.core.config import settings
 from app.db.database import get_database
 from app.models.task import TaskStatus
 from app.schemas.task import (TaskResponse, TaskCreate, TaskStatusResponse,
-                              PaginatedTasksResponse, TaskPriority)
+                              PaginatedTasksResponse, TaskPriority, TaskBatchResponse,
+                              TotalMode, DeadLetterResponse, DeadLetterReplayRequest,
+                              DeadLetterReplayResponse)
 from app.servisec.tasks import (create_task_s, get_tasks_s, get_task_s,
-                                cancel_task_s, get_task_status_s)
+                                cancel_task_s, get_task_status_s,
+                                create_tasks_batch_s)
+from app.servisec.notifications import stream_task_events_s, watch_tasks_ws
+from app.servisec.dead_letters import get_dead_letters_s, replay_dead_letters_s
+from app.servisec.results import get_task_result_s
+from app.servisec.admission import get_client_id
 
 router = APIRouter()
 
@@ -17,17 +26,38 @@ router = APIRouter()
 @router.post('/', response_model=TaskResponse, status_code=201)
 async def create_task(
     task_in: TaskCreate,
-    session: Annotated[AsyncSession, Depends(get_database)]
+    session: Annotated[AsyncSession, Depends(get_database)],
+    client_id: Annotated[str, Depends(get_client_id)],
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None
 ):
     '''
-    Создает новую задачу и отправляет на обработку
+    Создает новую задачу и отправляет на обработку.
+    Повтор с тем же Idempotency-Key возвращает исходную задачу.
+    При превышении лимита клиента - 429, при переполненной очереди - 503
     '''
 
-    database_task = await create_task_s(task_in, session)
+    database_task = await create_task_s(task_in, session, client_id, idempotency_key)
     return database_task
 
 
-@router.get('/', response_model=PaginatedTasksResponse)
+@router.post('/batch', response_model=TaskBatchResponse, status_code=201)
+async def create_tasks_batch(
+    tasks_in: Annotated[
+        list[TaskCreate],
+        Body(min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE)
+    ],
+    session: Annotated[AsyncSession, Depends(get_database)],
+    client_id: Annotated[str, Depends(get_client_id)]
+):
+    '''
+    Создает пачку задач и отправляет их на обработку.
+    Лимит клиента расходуется по токену на задачу
+    '''
+
+    return await create_tasks_batch_s(tasks_in, session, client_id)
+
+
+@router.get('/', response_model=PaginatedTasksResponse, response_model_exclude_unset=True)
 async def get_tasks(
     session: Annotated[AsyncSession, Depends(get_database)],
     status: TaskStatus | None = Query(
@@ -44,13 +74,51 @@ async def get_tasks(
         ge=1,
         le=100,
         description='Количество задач на странице'
+    ),
+    cursor: str | None = Query(
+        default=None,
+        description='Курсор из next_cursor предыдущей страницы, page игнорируется'
+    ),
+    total: TotalMode = Query(
+        default=TotalMode.COUNTED,
+        description=('Как считать total: counted - по счетчикам, '
+                     'estimate - по статистике pg_class, exact - COUNT(*)')
+    ),
+    fields: str | None = Query(
+        default=None,
+        description='Поля задач через запятую, например id,status,priority,created_at'
     )
 ):
     '''
     Возвращает список задач с учетом заданных фильтров
     '''
 
-    return await get_tasks_s(session, status, priority, page, page_size)
+    return await get_tasks_s(session, status, priority, page, page_size,
+                             cursor, total, fields)
+
+
+@router.get('/dead-letters', response_model=list[DeadLetterResponse])
+async def get_dead_letters(
+    limit: int = Query(default=100, ge=1, le=1000, description='Сколько сообщений DLQ показать')
+):
+    '''
+    Возвращает задачи, которые не выполнились за все попытки
+    '''
+
+    return await get_dead_letters_s(limit)
+
+
+@router.post('/dead-letters/replay', response_model=DeadLetterReplayResponse)
+async def replay_dead_letters(
+    replay_in: DeadLetterReplayRequest,
+    session: Annotated[AsyncSession, Depends(get_database)],
+    limit: int = Query(default=100, ge=1, le=1000, description='Сколько сообщений DLQ разобрать')
+):
+    '''
+    Отправляет задачи из DLQ на повторное выполнение
+    '''
+
+    return await replay_dead_letters_s(session, replay_in.task_ids, limit)
 
 
 @router.get('/{task_id}', response_model=TaskResponse)
@@ -71,7 +139,7 @@ async def cancel_task(
     session: Annotated[AsyncSession, Depends(get_database)]
 ):
     '''
-    Удаляет задачу, если она находится в статусе NEW или PENDING
+    Отменяет задачу, если она находится в статусе NEW, PENDING или IN_PROGRESS
     '''
 
     await cancel_task_s(task_id, session)
@@ -88,3 +156,52 @@ async def get_task_status(
     '''
 
     return await get_task_status_s(task_id, session)
+
+
+@router.get('/{task_id}/result')
+async def get_task_result(
+    task_id: UUID,
+    session: Annotated[AsyncSession, Depends(get_database)]
+):
+    '''
+    Отдает результат задачи потоком, не загружая его в память целиком
+    '''
+
+    result = await get_task_result_s(task_id, session)
+    headers = {'Content-Length': str(result.size)}
+    if result.digest is not None:
+        headers['ETag'] = f'"{result.digest}"'
+    return StreamingResponse(
+        result.chunks,
+        media_type='text/plain; charset=utf-8',
+        headers=headers
+    )
+
+
+@router.get('/{task_id}/events')
+async def get_task_events(
+    task_id: UUID,
+    session: Annotated[AsyncSession, Depends(get_database)]
+):
+    '''
+    Присылает изменения статуса задачи через Server-Sent Events
+    '''
+
+    return StreamingResponse(
+        await stream_task_events_s(task_id, session),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@router.websocket('/ws')
+async def watch_tasks(
+    websocket: WebSocket,
+    session: Annotated[AsyncSession, Depends(get_database)]
+):
+    '''
+    Присылает изменения статусов нескольких задач через WebSocket
+    '''
+
+    await websocket.accept()
+    await watch_tasks_ws(websocket, session)
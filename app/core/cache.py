@@ -0,0 +1,70 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+
+import time
+
+
+class TTLCache:
+    '''
+    LRU-кэш с ограничением по количеству записей и времени жизни.
+    Рассчитан на один event loop, блокировок не использует.
+
+    Чтение из БД может закончиться после инвалидации того же ключа.
+    Чтобы не положить в кэш устаревшее значение, перед чтением
+    берется token(), и set() с устаревшим токеном ничего не сохраняет
+    '''
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = True
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._invalidated: OrderedDict[Hashable, int] = OrderedDict()
+        self._epoch = 0
+        self._trimmed_epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def token(self) -> int:
+        return self._epoch
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, token: int | None = None):
+        if not self.enabled or (token is not None and self._is_stale(key, token)):
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _is_stale(self, key: Hashable, token: int) -> bool:
+        if token < self._trimmed_epoch:
+            return True
+        return self._invalidated.get(key, -1) > token
+
+    def invalidate(self, key: Hashable):
+        self._epoch += 1
+        self._data.pop(key, None)
+        self._invalidated[key] = self._epoch
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > self.maxsize:
+            _, self._trimmed_epoch = self._invalidated.popitem(last=False)
+
+    def clear(self):
+        self._epoch += 1
+        self._data.clear()
+        self._invalidated.clear()
+        self._trimmed_epoch = self._epoch
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from loguru import logger
 
+from typing import Literal
 import sys
 
 
@@ -12,8 +13,103 @@ class Settings(BaseSettings):
 
     LOG_LEVEL: str = 'INFO'
 
+    # Роль процесса выбирает настройки пула соединений с БД
+    PROCESS_ROLE: Literal['api', 'worker'] = 'api'
+    DB_POOL_SIZE_API: int = 10
+    DB_MAX_OVERFLOW_API: int = 10
+    DB_POOL_SIZE_WORKER: int = 3
+    DB_MAX_OVERFLOW_WORKER: int = 2
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    # PgBouncer в режиме transaction: prepared statements без кэша и с уникальными именами
+    DB_PGBOUNCER: bool = False
+    DB_POOL_STATS_INTERVAL: float = 60.0
+
+    TASK_BATCH_MAX_SIZE: int = 1000
+    TASK_MAX_DEPENDENCIES: int = 100
+    PUBLISH_BATCH_SIZE: int = 500
+    PUBLISH_CHANNEL_POOL_SIZE: int = 4
+    PUBLISH_BUFFER_SIZE: int = 10000
+
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_RETRY_DELAY: float = 5.0
+
+    # Отложенные задачи попадают в память, когда до run_at остается
+    # SCHEDULER_LOOKAHEAD секунд, но не больше SCHEDULER_HEAP_SIZE штук
+    SCHEDULER_LOOKAHEAD: float = 60.0
+    SCHEDULER_REFRESH_INTERVAL: float = 30.0
+    SCHEDULER_HEAP_SIZE: int = 10000
+    SCHEDULER_BATCH_SIZE: int = 500
+
+    # 0 - архивация выключена
+    TASK_ARCHIVE_RETENTION_DAYS: int = 30
+    TASK_ARCHIVE_INTERVAL: float = 300.0
+    TASK_ARCHIVE_BATCH_SIZE: int = 1000
+    # Секции создаются независимо от архивации
+    TASK_PARTITIONS_AHEAD: int = 2
+    TASK_PARTITIONS_INTERVAL: float = 3600.0
+
+    # Результат длиннее TASK_RESULT_INLINE_LIMIT байт хранится вне строки задачи
+    TASK_RESULT_INLINE_LIMIT: int = 4096
+    TASK_RESULT_CHUNK_SIZE: int = 262144
+
+    TASK_CACHE_TTL: float = 30.0
+    TASK_CACHE_MAX_SIZE: int = 10000
+
+    # Token bucket на клиента: ключ X-API-Key, если он есть в API_KEYS,
+    # иначе IP (JSON-список в окружении). RATE_LIMIT_PER_SECOND
+    # задач в секунду со всплеском до RATE_LIMIT_BURST, 0 - без ограничения.
+    # Состояние в памяти, лимит действует в каждом процессе API отдельно
+    RATE_LIMIT_PER_SECOND: float = 100.0
+    RATE_LIMIT_BURST: float = 1000.0
+    RATE_LIMIT_MAX_CLIENTS: int = 10000
+    API_KEYS: frozenset[str] = frozenset()
+    # Новые задачи не принимаются, пока в их очереди больше TASK_QUEUE_MAX_DEPTH
+    # сообщений, 0 - без ограничения. Глубина перечитывается не чаще
+    # раза в TASK_QUEUE_DEPTH_TTL секунд
+    TASK_QUEUE_MAX_DEPTH: int = 100000
+    TASK_QUEUE_DEPTH_TTL: float = 1.0
+    TASK_QUEUE_RETRY_AFTER: int = 30
+
+    # Ключ идемпотентности хранится в БД TASK_IDEMPOTENCY_TTL секунд,
+    # последние TASK_IDEMPOTENCY_CACHE_SIZE ключей держатся в памяти процесса
+    TASK_IDEMPOTENCY_TTL: float = 86400.0
+    TASK_IDEMPOTENCY_CACHE_SIZE: int = 10000
+
+    TASK_EVENTS_HEARTBEAT: float = 15.0
+    TASK_EVENTS_QUEUE_SIZE: int = 100
+    TASK_WS_MAX_WATCH: int = 1000
+
     WORKER_PREFETCH_COUNT: int = 1
     WORKER_MAX_CONCURRENT_TASKS: int = 5
+    WORKER_PROCESSES: int = 0
+    # 0 - ядра делятся поровну между процессами workerа
+    WORKER_CPU_POOL_SIZE: int = 0
+    WORKER_SHUTDOWN_TIMEOUT: float = 30.0
+    WORKER_STATS_INTERVAL: float = 30.0
+    # Процесс workerа номер N слушает порт WORKER_METRICS_PORT + N, 0 - выключено
+    WORKER_METRICS_PORT: int = 9100
+    WORKER_STATUS_FLUSH_INTERVAL: float = 0.05
+    WORKER_STATUS_BATCH_SIZE: int = 500
+
+    # weighted: три очереди task_queue_* и планировщик с весами в workerе
+    # priority: одна очередь с x-max-priority, порядок задает RabbitMQ
+    TASK_QUEUE_MODE: Literal['weighted', 'priority'] = 'weighted'
+    WORKER_WEIGHT_HIGH: int = 6
+    WORKER_WEIGHT_MEDIUM: int = 3
+    WORKER_WEIGHT_LOW: int = 1
+    WORKER_PRIORITY_MAX_WAIT: float = 30.0
+
+    TASK_TIMEOUT_HIGH: float = 30.0
+    TASK_TIMEOUT_MEDIUM: float = 60.0
+    TASK_TIMEOUT_LOW: float = 120.0
+    # Попытки считаются вместе с первой, после последней задача уходит в DLQ
+    TASK_MAX_ATTEMPTS: int = 3
+    TASK_RETRY_BASE_DELAY: float = 5.0
+    TASK_RETRY_MAX_DELAY: float = 300.0
 
     model_config = SettingsConfigDict(env_file='.env', extra='ignore')
 
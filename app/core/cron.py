@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+
+class CronExpression:
+    '''
+    Cron-выражение из пяти полей: минута, час, день месяца, месяц,
+    день недели (0 и 7 - воскресенье). Поддерживаются *, числа,
+    диапазоны a-b, шаги */n и a-b/n и списки через запятую.
+    Если заданы и день месяца, и день недели, подходит любой из них,
+    как в обычном cron
+    '''
+
+    FIELDS = (
+        ('минута', 0, 59),
+        ('час', 0, 23),
+        ('день месяца', 1, 31),
+        ('месяц', 1, 12),
+        ('день недели', 0, 7)
+    )
+    # Выражение вроде 0 0 30 2 * не сработает никогда, поиск ограничен
+    MAX_YEARS = 5
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != len(self.FIELDS):
+            raise ValueError(f'В cron-выражении должно быть 5 полей: {expression!r}')
+        self.expression = expression
+        (self.minutes, self.hours, self.days, self.months, weekdays) = (
+            self._parse_field(part, *field) for part, field in zip(parts, self.FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = parts[2].startswith('*')
+        self._any_weekday = parts[4].startswith('*')
+
+    @staticmethod
+    def _parse_field(part: str, name: str, low: int, high: int) -> set[int]:
+        values = set()
+        for item in part.split(','):
+            span, _, step = item.partition('/')
+            try:
+                step = int(step) if step else 1
+                if span == '*':
+                    start, end = low, high
+                elif '-' in span:
+                    start, end = (int(value) for value in span.split('-', 1))
+                else:
+                    start = int(span)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ValueError(f'Некорректное поле {name}: {part!r}')
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f'Поле {name} вне диапазона {low}-{high}: {part!r}')
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        '''
+        Ближайшее время срабатывания строго позже moment
+        '''
+
+        current = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        last_year = current.year + self.MAX_YEARS
+        while current.year <= last_year:
+            if current.month not in self.months:
+                current = (current.replace(day=1, hour=0, minute=0)
+                           + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(current):
+                current = current.replace(hour=0, minute=0) + timedelta(days=1)
+            elif current.hour not in self.hours:
+                current = current.replace(minute=0) + timedelta(hours=1)
+            elif current.minute not in self.minutes:
+                current += timedelta(minutes=1)
+            else:
+                return current
+        raise ValueError(f'Cron-выражение {self.expression!r} никогда не срабатывает')
@@ -0,0 +1,153 @@
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+from prometheus_client.registry import Collector, REGISTRY
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from typing import Callable
+
+import time
+
+# Границы подобраны под задачи от миллисекунд (запросы, БД) до минут (выполнение)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки HTTP-запроса',
+    ['method', 'route', 'status'],
+    buckets=FAST_BUCKETS
+)
+
+PUBLISH_BATCH_DURATION = Histogram(
+    'task_publish_batch_duration_seconds',
+    'Время от отправки пачки сообщений до подтверждения брокером',
+    buckets=FAST_BUCKETS
+)
+PUBLISHED_MESSAGES = Counter(
+    'task_published_messages',
+    'Сообщения задач, отправленные в RabbitMQ',
+    ['result']
+)
+PUBLISHED_OK = PUBLISHED_MESSAGES.labels('ok')
+PUBLISHED_ERROR = PUBLISHED_MESSAGES.labels('error')
+
+TASKS_REJECTED = Counter(
+    'task_admission_rejected',
+    'Запросы на создание задач, отклоненные лимитом клиента или глубиной очереди',
+    ['reason']
+)
+REJECTED_RATE_LIMIT = TASKS_REJECTED.labels('rate_limit')
+REJECTED_QUEUE_FULL = TASKS_REJECTED.labels('queue_full')
+
+TASK_QUEUE_WAIT = Histogram(
+    'task_queue_wait_seconds',
+    'Время от постановки задачи в очередь (PENDING) до начала первой попытки',
+    ['priority'],
+    buckets=SLOW_BUCKETS
+)
+TASK_RUN_DURATION = Histogram(
+    'task_run_seconds',
+    'Время выполнения попытки задачи',
+    ['type', 'outcome'],
+    buckets=SLOW_BUCKETS
+)
+WORKER_TASKS = Counter(
+    'worker_tasks',
+    'Сообщения, обработанные workerом, по итогу',
+    ['outcome']
+)
+
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds',
+    'Время выполнения SQL-запроса',
+    ['operation'],
+    buckets=FAST_BUCKETS
+)
+DB_OPERATIONS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+DB_QUERY_CHILDREN = {operation: DB_QUERY_DURATION.labels(operation)
+                     for operation in DB_OPERATIONS + ('OTHER',)}
+
+
+def gauge_from(name: str, documentation: str, function: Callable[[], float]) -> Gauge:
+    '''
+    Gauge, который читает значение только при сборе метрик
+    '''
+
+    gauge = Gauge(name, documentation)
+    gauge.set_function(function)
+    return gauge
+
+
+class MetricsMiddleware:
+    '''
+    ASGI middleware: время запроса по шаблону маршрута, а не по пути,
+    чтобы id задач не раздували число временных рядов
+    '''
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.labels(
+                scope['method'],
+                route.path if route is not None else 'unmatched',
+                status
+            ).observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine: AsyncEngine):
+    '''
+    Замеряет каждый SQL-запрос через события SQLAlchemy
+    '''
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        operation = (statement.lstrip()[:7].split() or ['OTHER'])[0].upper()
+        child = DB_QUERY_CHILDREN.get(operation, DB_QUERY_CHILDREN['OTHER'])
+        child.observe(time.perf_counter() - context._query_started)
+
+
+class PoolCollector(Collector):
+    '''
+    Снимает состояние пула соединений в момент сбора метрик
+    '''
+
+    def __init__(self, get_stats: Callable[[], dict[str, float]]):
+        self._get_stats = get_stats
+
+    def collect(self):
+        stats = self._get_stats()
+        for name in ('size', 'checked_out', 'overflow', 'utilization'):
+            yield GaugeMetricFamily(f'db_pool_{name}', f'Пул БД: {name}', value=stats[name])
+        yield GaugeMetricFamily('db_pool_max_wait_seconds',
+                                'Пул БД: самое долгое ожидание соединения',
+                                value=stats['max_wait_seconds'])
+        for name in ('checkouts', 'timeouts', 'wait_seconds'):
+            yield CounterMetricFamily(f'db_pool_{name}', f'Пул БД: {name}',
+                                      value=stats[name])
+
+
+def register_pool_collector(get_stats: Callable[[], dict[str, float]]):
+    REGISTRY.register(PoolCollector(get_stats))
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from typing import Hashable
+
+import time
+
+
+class TokenBucketLimiter:
+    '''
+    Token bucket на каждый ключ: rate токенов в секунду, запас не больше burst.
+    Состояние - пара (токены, время) на ключ в памяти процесса, проверка
+    стоит одного чтения часов и пары операций со словарем.
+    Ключей не больше maxsize, вытесняются давно не обращавшиеся:
+    их bucket к этому времени, как правило, уже полон
+    '''
+
+    def __init__(self, rate: float, burst: float, maxsize: int):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: Hashable, cost: float = 1.0) -> float:
+        '''
+        Списывает cost токенов. Возвращает 0, если их хватило,
+        иначе через сколько секунд их станет достаточно.
+        Запрос дороже burst списывает весь запас, иначе он не прошел бы никогда
+        '''
+
+        now = time.monotonic()
+        cost = min(cost, self.burst)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            self._buckets.move_to_end(key)
+
+        if tokens < cost:
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / self.rate
+        self._buckets[key] = (tokens - cost, now)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+    def clear(self):
+        self._buckets.clear()
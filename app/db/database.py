@@ -1,15 +1,115 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
+from uuid import uuid4
+
+import asyncio
 import greenlet
+import time
+
+from app.core.config import settings, logger
+from app.core.metrics import instrument_engine, register_pool_collector
+
+
+class PoolStats:
+    '''
+    Сколько ждали соединение из пула: ожидание включает и открытие
+    нового соединения, если пул еще не заполнен
+    '''
+
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            PoolStats.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            PoolStats.checkouts += 1
+            PoolStats.wait_seconds += waited
+            PoolStats.max_wait_seconds = max(PoolStats.max_wait_seconds, waited)
+
+
+def get_pool_options() -> dict:
+    if settings.PROCESS_ROLE == 'worker':
+        pool_size, max_overflow = settings.DB_POOL_SIZE_WORKER, settings.DB_MAX_OVERFLOW_WORKER
+    else:
+        pool_size, max_overflow = settings.DB_POOL_SIZE_API, settings.DB_MAX_OVERFLOW_API
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING
+    }
+
+
+def get_connect_args() -> dict:
+    if settings.DB_PGBOUNCER:
+        return {
+            'statement_cache_size': 0,
+            'prepared_statement_cache_size': 0,
+            'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__'
+        }
+    return {
+        'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+        'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE
+    }
 
-from app.core.config import settings
 
 engine = create_async_engine(
     url=settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=False
+    connect_args=get_connect_args(),
+    echo=False,
+    **get_pool_options()
 )
 SessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
+
+
+def get_pool_stats() -> dict[str, float]:
+    pool = engine.sync_engine.pool
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'utilization': pool.checkedout() / capacity if capacity else 0.0,
+        'checkouts': PoolStats.checkouts,
+        'timeouts': PoolStats.timeouts,
+        'wait_seconds': PoolStats.wait_seconds,
+        'max_wait_seconds': PoolStats.max_wait_seconds
+    }
+
+
+register_pool_collector(get_pool_stats)
+
+
+async def report_pool_stats():
+    '''
+    Периодически пишет в лог загрузку пула и ожидание соединений
+    '''
+
+    while True:
+        await asyncio.sleep(settings.DB_POOL_STATS_INTERVAL)
+        stats = get_pool_stats()
+        average = stats['wait_seconds'] / max(stats['checkouts'], 1)
+        logger.info(f'Пул БД ({settings.PROCESS_ROLE}): занято {stats["checked_out"]} '
+                    f'из {stats["size"]}+{stats["overflow"]}, загрузка '
+                    f'{stats["utilization"]:.0%}, ожидание в среднем '
+                    f'{average * 1000:.1f} мс, максимум '
+                    f'{stats["max_wait_seconds"] * 1000:.1f} мс, '
+                    f'таймаутов {stats["timeouts"]}')
 
 
 async def get_database():
@@ -1,13 +1,24 @@
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from contextlib import asynccontextmanager
 from loguru import logger
 
+import asyncio
+
 from app.db.base import Base
-from app.db.database import engine
+from app.db.database import engine, report_pool_stats
 from app.queue.producer import RabbitMQProducer
+from app.queue.outbox import OutboxRelay
+from app.servisec.archive import TaskArchiver
+from app.servisec.scheduler import TaskScheduler
+from app.servisec.admission import QueueDepthMonitor
+from app.queue.events import TaskEventsListener
+from app.servisec.cache import invalidate_task_cache, set_task_cache_enabled
+from app.servisec.notifications import TaskEventHub
 from app.core.config import settings
-from app.api.v1 import tasks
+from app.core.metrics import MetricsMiddleware
+from app.api.v1 import tasks, schedules
 
 
 @asynccontextmanager
@@ -24,21 +35,50 @@ async def lifespan(app: FastAPI):
         await RabbitMQProducer.connect()
     except Exception as err:
         logger.error(f'Не удалось подключиться к RabbitMQ во время запуска: {err}')
+    await OutboxRelay.start()
+    await TaskArchiver.start()
+    await TaskScheduler.start()
+    pool_reporter = asyncio.create_task(report_pool_stats())
+    TaskEventsListener.add_handler(invalidate_task_cache)
+    TaskEventsListener.add_state_handler(set_task_cache_enabled)
+    TaskEventsListener.add_handler(TaskEventHub.publish)
+    try:
+        await TaskEventsListener.connect()
+    except Exception as err:
+        logger.error(f'Кэш задач отключен, нет подписки на события: {err}')
     yield
     logger.info('Завершение работы сервера')
+    pool_reporter.cancel()
+    await TaskEventsListener.disconnect()
+    await QueueDepthMonitor.stop()
+    await TaskScheduler.stop()
+    await TaskArchiver.stop()
+    await OutboxRelay.stop()
     await RabbitMQProducer.disconnect()
 
 app = FastAPI(title='Aсинхронный сервис управления задачами',
               openapi_url=f'{settings.API_V1_STR}/openapi.json',
               lifespan=lifespan)
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(
     tasks.router,
     prefix=f'{settings.API_V1_STR}/tasks',
     tags=['tasks']
 )
+app.include_router(
+    schedules.router,
+    prefix=f'{settings.API_V1_STR}/schedules',
+    tags=['schedules']
+)
 
 
 @app.get('/', include_in_schema=False)
 async def root():
     return RedirectResponse(url='/docs')
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,48 @@
+'''
+Обслуживание таблицы задач:
+
+    python -m app.maintenance partitions --ahead 3
+    python -m app.maintenance archive --retention-days 30
+    python -m app.maintenance drop-partitions --retention-days 30
+    python -m app.maintenance purge-idempotency-keys
+'''
+import argparse
+import asyncio
+
+from app.core.config import logger
+from app.db.database import engine
+from app.servisec.archive import TaskArchiver
+
+
+async def main(args: argparse.Namespace):
+    try:
+        if args.command == 'partitions':
+            created = await TaskArchiver.ensure_partitions(args.ahead)
+            logger.info(f'Новых секций: {created}')
+        elif args.command == 'archive':
+            moved = await TaskArchiver.archive_all(args.retention_days)
+            logger.info(f'В архив перенесено задач: {moved}')
+        elif args.command == 'drop-partitions':
+            dropped = await TaskArchiver.drop_empty_partitions(args.retention_days)
+            logger.info(f'Удалено секций: {len(dropped)}')
+        elif args.command == 'purge-idempotency-keys':
+            purged = await TaskArchiver.purge_idempotency_keys()
+            logger.info(f'Удалено ключей идемпотентности: {purged}')
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Обслуживание таблицы задач')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('partitions', help='Создать секции tasks на будущие месяцы') \
+        .add_argument('--ahead', type=int, default=None)
+    commands.add_parser('purge-idempotency-keys',
+                        help='Удалить ключи идемпотентности старше TASK_IDEMPOTENCY_TTL')
+    for command, description in (
+        ('archive', 'Перенести старые завершенные задачи в tasks_archive'),
+        ('drop-partitions', 'Удалить пустые секции старше срока хранения')
+    ):
+        commands.add_parser(command, help=description) \
+            .add_argument('--retention-days', type=int, default=None)
+    asyncio.run(main(parser.parse_args()))
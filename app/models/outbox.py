@@ -0,0 +1,34 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import BigInteger, DateTime, UUID, Integer
+from sqlalchemy.dialects.postgresql import ENUM
+
+from datetime import datetime
+
+import uuid
+
+from app.db.base import Base
+from app.models.task import TaskPriority
+
+
+class OutboxMessage(Base):
+    '''
+    Сообщение, которое нужно опубликовать в RabbitMQ.
+    Пишется в одной транзакции с задачей, публикуется OutboxRelay.
+    Внешнего ключа на tasks нет: у секционированной tasks уникален
+    только (id, created_at)
+    '''
+
+    __tablename__ = 'task_outbox'
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    task_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    priority: Mapped[TaskPriority] = mapped_column(
+        ENUM(TaskPriority, name='task_priority', create_type=False),
+        nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, DateTime, Text, UUID, Index
-from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy import (String, DateTime, Text, UUID, Index, Integer, BigInteger,
+                        DDL, event, text)
+from sqlalchemy.dialects.postgresql import ENUM, JSONB
 
 from enum import Enum
 from datetime import datetime
@@ -25,9 +26,38 @@ class TaskStatus(str, Enum):
     CANCELLED = 'CANCELLED'
 
 
+TERMINAL_STATUSES = frozenset({
+    TaskStatus.COMPLETED,
+    TaskStatus.FAILED,
+    TaskStatus.CANCELLED
+})
+
+
 class Task(Base):
+    '''
+    Горячая таблица задач, секционирована по created_at помесячно.
+    Первичный ключ секционированной таблицы обязан включать created_at.
+    Завершенные задачи старше TASK_ARCHIVE_RETENTION_DAYS переносятся
+    в tasks_archive
+    '''
+
     __tablename__ = 'tasks'
-    __table_args__ = (Index('ix_tasks_status_priority', 'status', 'priority'),)
+    __table_args__ = (
+        Index('ix_tasks_status_priority', 'status', 'priority'),
+        Index(
+            'ix_tasks_created_at_id',
+            'created_at',
+            'id',
+            postgresql_include=['status', 'priority']
+        ),
+        # Планировщик читает только отложенные задачи, которые еще ждут запуска
+        Index(
+            'ix_tasks_run_at',
+            'run_at',
+            postgresql_where=text("status = 'NEW' AND run_at IS NOT NULL")
+        ),
+        {'postgresql_partition_by': 'RANGE (created_at)'}
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -36,7 +66,20 @@ class Task(Base):
         index=True
     )
     title: Mapped[str] = mapped_column(String, nullable=False)
-    description: Mapped[str] = mapped_column(Text, nullable=True)
+    # Тяжелые колонки не грузятся с select(Task), их выбирают явно
+    description: Mapped[str] = mapped_column(
+        Text,
+        nullable=True,
+        deferred=True,
+        deferred_raiseload=True
+    )
+    type: Mapped[str] = mapped_column(
+        String(64),
+        default='default',
+        server_default='default',
+        nullable=False
+    )
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=True)
     priority: Mapped[TaskPriority] = mapped_column(
         ENUM(TaskPriority, name='task_priority', create_type=True),
         default=TaskPriority.MEDIUM,
@@ -51,10 +94,103 @@ class Task(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime,
         default=datetime.utcnow,
-        nullable=False
+        primary_key=True
     )
+    run_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # Когда задача стала PENDING: от него считается ожидание в очереди
+    queued_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    attempts: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        server_default='0',
+        nullable=False
+    )
+    # Сколько зависимостей из task_dependencies еще не завершено
+    pending_parents: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        server_default='0',
+        nullable=False
+    )
+
+    result: Mapped[str] = mapped_column(
+        Text,
+        nullable=True,
+        deferred=True,
+        deferred_raiseload=True
+    )
+    # Результат больше TASK_RESULT_INLINE_LIMIT лежит в task_results
+    result_ref: Mapped[str] = mapped_column(String(64), nullable=True)
+    result_size: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    error_info: Mapped[str] = mapped_column(
+        Text,
+        nullable=True,
+        deferred=True,
+        deferred_raiseload=True
+    )
+
+
+# Секции tasks_YYYY_MM создаются с запасом на months_ahead месяцев вперед,
+# tasks_default ловит строки вне созданных секций. Если секцию не создали
+# вовремя, ее строки переносятся из tasks_default при создании
+# DDL подставляет %(table)s, поэтому % в format() удвоены
+TASK_PARTITIONS_FUNCTION = DDL('''
+CREATE OR REPLACE FUNCTION create_task_partitions(
+    from_date timestamp,
+    months_ahead integer
+) RETURNS integer AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', from_date);
+    last_month timestamp := date_trunc(
+        'month',
+        (now() AT TIME ZONE 'utc') + make_interval(months => months_ahead)
+    );
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'tasks_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            IF EXISTS (
+                SELECT 1 FROM tasks_default
+                WHERE created_at >= month_start
+                    AND created_at < month_start + interval '1 month'
+            ) THEN
+                -- Строки месяца уже в tasks_default: она отключается на время
+                -- создания секции, строки переносятся между секциями напрямую,
+                -- минуя триггеры счетчиков на tasks
+                ALTER TABLE tasks DETACH PARTITION tasks_default;
+                EXECUTE format(
+                    'CREATE TABLE %%I PARTITION OF tasks FOR VALUES FROM (%%L) TO (%%L)',
+                    partition_name, month_start, month_start + interval '1 month'
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM tasks_default '
+                    'WHERE created_at >= %%L AND created_at < %%L RETURNING *) '
+                    'INSERT INTO %%I SELECT * FROM moved',
+                    month_start, month_start + interval '1 month', partition_name
+                );
+                ALTER TABLE tasks ATTACH PARTITION tasks_default DEFAULT;
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %%I PARTITION OF tasks FOR VALUES FROM (%%L) TO (%%L)',
+                    partition_name, month_start, month_start + interval '1 month'
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql;
+''')
+TASK_PARTITIONS = (
+    DDL('CREATE TABLE tasks_default PARTITION OF tasks DEFAULT'),
+    DDL("SELECT create_task_partitions(now() AT TIME ZONE 'utc', 2)")
+)
 
-    result: Mapped[str] = mapped_column(Text, nullable=True)
-    error_info: Mapped[str] = mapped_column(Text, nullable=True)
+for ddl in (TASK_PARTITIONS_FUNCTION, *TASK_PARTITIONS):
+    event.listen(Task.__table__, 'after_create', ddl)
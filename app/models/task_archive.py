@@ -0,0 +1,51 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, Text, UUID, Integer, BigInteger
+from sqlalchemy.dialects.postgresql import ENUM, JSONB
+
+from datetime import datetime
+
+import uuid
+
+from app.db.base import Base
+from app.models.task import TaskPriority, TaskStatus
+
+
+class TaskArchive(Base):
+    '''
+    Холодное хранилище завершенных задач, куда их переносит TaskArchiver.
+    Колонки совпадают с tasks, чтобы перенос был одним INSERT ... SELECT
+    '''
+
+    __tablename__ = 'tasks_archive'
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    description: Mapped[str] = mapped_column(Text, nullable=True)
+    type: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=True)
+    priority: Mapped[TaskPriority] = mapped_column(
+        ENUM(TaskPriority, name='task_priority', create_type=False),
+        nullable=False
+    )
+    status: Mapped[TaskStatus] = mapped_column(
+        ENUM(TaskStatus, name='task_status', create_type=False),
+        nullable=False
+    )
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    run_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    queued_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    pending_parents: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    result: Mapped[str] = mapped_column(Text, nullable=True)
+    result_ref: Mapped[str] = mapped_column(String(64), nullable=True)
+    result_size: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    error_info: Mapped[str] = mapped_column(Text, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
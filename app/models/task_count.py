@@ -0,0 +1,99 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import BigInteger, SmallInteger, DDL, event
+from sqlalchemy.dialects.postgresql import ENUM
+
+from app.db.base import Base
+from app.models.task import Task, TaskPriority, TaskStatus
+
+TASK_COUNT_SHARDS = 16
+
+
+class TaskCount(Base):
+    '''
+    Счетчики задач по (status, priority). Каждая пара разбита на шарды,
+    чтобы параллельные транзакции не ждали блокировку одной строки.
+    Итог = сумма count по всем шардам
+    '''
+
+    __tablename__ = 'task_counts'
+
+    status: Mapped[TaskStatus] = mapped_column(
+        ENUM(TaskStatus, name='task_status', create_type=False),
+        primary_key=True
+    )
+    priority: Mapped[TaskPriority] = mapped_column(
+        ENUM(TaskPriority, name='task_priority', create_type=False),
+        primary_key=True
+    )
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+
+
+# Счетчики обновляются триггерами уровня оператора на tasks: один
+# агрегированный upsert на каждый INSERT/UPDATE/DELETE в той же транзакции.
+# Так их не обходят ни пакетные UPDATE, ни вставки мимо сервисов
+TASK_COUNTS_FUNCTION = DDL(f'''
+CREATE OR REPLACE FUNCTION tasks_update_counts() RETURNS trigger AS $$
+DECLARE
+    target_shard smallint := floor(random() * {TASK_COUNT_SHARDS});
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO task_counts (status, priority, shard, count)
+        SELECT status, priority, target_shard, count(*)
+        FROM new_rows
+        GROUP BY status, priority
+        ORDER BY status, priority
+        ON CONFLICT (status, priority, shard)
+        DO UPDATE SET count = task_counts.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO task_counts (status, priority, shard, count)
+        SELECT status, priority, target_shard, -count(*)
+        FROM old_rows
+        GROUP BY status, priority
+        ORDER BY status, priority
+        ON CONFLICT (status, priority, shard)
+        DO UPDATE SET count = task_counts.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO task_counts (status, priority, shard, count)
+        SELECT status, priority, target_shard, sum(delta)
+        FROM (
+            SELECT old_rows.status, old_rows.priority, -1 AS delta
+            FROM old_rows JOIN new_rows USING (id)
+            WHERE (old_rows.status, old_rows.priority)
+                  IS DISTINCT FROM (new_rows.status, new_rows.priority)
+            UNION ALL
+            SELECT new_rows.status, new_rows.priority, 1
+            FROM old_rows JOIN new_rows USING (id)
+            WHERE (old_rows.status, old_rows.priority)
+                  IS DISTINCT FROM (new_rows.status, new_rows.priority)
+        ) AS changes
+        GROUP BY status, priority
+        HAVING sum(delta) <> 0
+        ORDER BY status, priority
+        ON CONFLICT (status, priority, shard)
+        DO UPDATE SET count = task_counts.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+''')
+TASK_COUNTS_TRIGGERS = (
+    DDL('''
+CREATE TRIGGER tasks_counts_insert AFTER INSERT ON tasks
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION tasks_update_counts();
+'''),
+    DDL('''
+CREATE TRIGGER tasks_counts_update AFTER UPDATE ON tasks
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION tasks_update_counts();
+'''),
+    DDL('''
+CREATE TRIGGER tasks_counts_delete AFTER DELETE ON tasks
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION tasks_update_counts();
+''')
+)
+
+for ddl in (TASK_COUNTS_FUNCTION, *TASK_COUNTS_TRIGGERS):
+    event.listen(Task.__table__, 'after_create', ddl)
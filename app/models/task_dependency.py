@@ -0,0 +1,21 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import UUID, Index
+
+import uuid
+
+from app.db.base import Base
+
+
+class TaskDependency(Base):
+    '''
+    Ребро графа задач: child запускается, когда завершены все его parent.
+    Внешних ключей нет: у секционированной tasks уникален только (id, created_at)
+    '''
+
+    __tablename__ = 'task_dependencies'
+    __table_args__ = (
+        Index('ix_task_dependencies_child_id', 'child_id'),
+    )
+
+    parent_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    child_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
@@ -0,0 +1,31 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, UUID, Index
+
+from datetime import datetime
+
+import uuid
+
+from app.db.base import Base
+
+
+class TaskIdempotencyKey(Base):
+    '''
+    Ключ идемпотентности создания задачи. Отдельная таблица нужна потому,
+    что уникальный индекс секционированной tasks обязан включать created_at.
+    fingerprint - sha256 тела запроса: повтор с тем же ключом, но другим
+    телом отклоняется. Ключи старше TASK_IDEMPOTENCY_TTL удаляет TaskArchiver
+    '''
+
+    __tablename__ = 'task_idempotency_keys'
+    __table_args__ = (
+        Index('ix_task_idempotency_keys_created_at', 'created_at'),
+    )
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    task_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
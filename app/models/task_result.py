@@ -0,0 +1,50 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import (String, DateTime, BigInteger, Integer, LargeBinary, ForeignKey,
+                        DDL, event)
+
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class TaskResult(Base):
+    '''
+    Большие результаты задач, вынесенные из строки tasks. Ключ - sha256
+    содержимого, поэтому одинаковые результаты хранятся один раз.
+    Строка задачи хранит только result_ref и result_size
+    '''
+
+    __tablename__ = 'task_results'
+
+    digest: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+
+
+class TaskResultChunk(Base):
+    '''
+    Куски результата по TASK_RESULT_CHUNK_SIZE байт, каждый сжат zlib
+    отдельно, чтобы результат отдавался потоком без загрузки целиком
+    '''
+
+    __tablename__ = 'task_result_chunks'
+
+    digest: Mapped[str] = mapped_column(
+        String(64),
+        ForeignKey('task_results.digest', ondelete='CASCADE'),
+        primary_key=True
+    )
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+# Куски уже сжаты zlib, повторно сжимать их в TOAST бессмысленно
+event.listen(
+    TaskResultChunk.__table__,
+    'after_create',
+    DDL('ALTER TABLE task_result_chunks ALTER COLUMN data SET STORAGE EXTERNAL')
+)
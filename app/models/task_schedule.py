@@ -0,0 +1,48 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, Text, UUID, Boolean, Index, text
+from sqlalchemy.dialects.postgresql import ENUM, JSONB
+
+from datetime import datetime
+
+import uuid
+
+from app.db.base import Base
+from app.models.task import TaskPriority
+
+
+class TaskSchedule(Base):
+    '''
+    Повторяющаяся задача по cron-выражению. TaskScheduler заранее, за
+    SCHEDULER_LOOKAHEAD секунд, создает из нее обычные задачи с run_at
+    и сдвигает next_run_at на следующее срабатывание
+    '''
+
+    __tablename__ = 'task_schedules'
+    __table_args__ = (
+        Index('ix_task_schedules_next_run_at', 'next_run_at',
+              postgresql_where=text('enabled')),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4
+    )
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    description: Mapped[str] = mapped_column(Text, nullable=True)
+    type: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=True)
+    priority: Mapped[TaskPriority] = mapped_column(
+        ENUM(TaskPriority, name='task_priority', create_type=False),
+        nullable=False
+    )
+    cron: Mapped[str] = mapped_column(String(255), nullable=False)
+    enabled: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+    next_run_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_run_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
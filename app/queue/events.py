@@ -0,0 +1,125 @@
+from aio_pika import (ExchangeType, IncomingMessage, Message, RobustConnection,
+                      connect_robust)
+from aio_pika.abc import AbstractRobustChannel, AbstractExchange
+
+from typing import Callable
+from uuid import UUID
+
+import json
+
+from app.core.config import logger, settings
+from app.models.task import TaskStatus
+
+TASK_EVENTS_EXCHANGE = 'task_events'
+TASK_CANCEL_EXCHANGE = 'task_cancel'
+
+
+def build_task_event(task_id: str, status: TaskStatus) -> Message:
+    return Message(
+        body=json.dumps({'task_id': task_id, 'status': status.value}).encode('utf-8'),
+        content_type='application/json'
+    )
+
+
+def build_task_cancel(task_id: str) -> Message:
+    return Message(
+        body=json.dumps({'task_id': task_id}).encode('utf-8'),
+        content_type='application/json'
+    )
+
+
+async def declare_task_cancel_exchange(
+        channel: AbstractRobustChannel
+) -> AbstractExchange:
+    return await channel.declare_exchange(
+        TASK_CANCEL_EXCHANGE,
+        ExchangeType.FANOUT,
+        durable=True
+    )
+
+
+async def declare_task_events_exchange(
+        channel: AbstractRobustChannel
+) -> AbstractExchange:
+    return await channel.declare_exchange(
+        TASK_EVENTS_EXCHANGE,
+        ExchangeType.FANOUT,
+        durable=True
+    )
+
+
+class TaskEventsListener:
+    '''
+    Получает события об изменении статусов задач из fanout-обменника.
+    У каждого процесса API своя эксклюзивная очередь, поэтому событие
+    доходит до всех процессов
+    '''
+
+    _connection: RobustConnection | None = None
+    _channel: AbstractRobustChannel | None = None
+    _handlers: list[Callable[[UUID, TaskStatus], None]] = []
+    _state_handlers: list[Callable[[bool], None]] = []
+
+    @classmethod
+    def add_handler(cls, handler: Callable[[UUID, TaskStatus], None]):
+        cls._handlers.append(handler)
+
+    @classmethod
+    def add_state_handler(cls, handler: Callable[[bool], None]):
+        '''
+        handler(True) вызывается после подключения, handler(False) при потере связи
+        '''
+
+        cls._state_handlers.append(handler)
+
+    @classmethod
+    def _notify_state(cls, connected: bool):
+        for handler in cls._state_handlers:
+            handler(connected)
+
+    @classmethod
+    async def connect(cls):
+        if cls._connection is not None and not cls._connection.is_closed:
+            return
+        try:
+            cls._connection = await connect_robust(settings.AMQP_URL)
+            cls._channel = await cls._connection.channel()
+            exchange = await declare_task_events_exchange(cls._channel)
+            queue = await cls._channel.declare_queue(exclusive=True, auto_delete=True)
+            await queue.bind(exchange)
+            await queue.consume(cls._on_message, no_ack=True)
+        except Exception as err:
+            logger.error(f'Не удалось подписаться на события задач: {err}')
+            cls._connection = None
+            cls._channel = None
+            raise
+
+        cls._connection.close_callbacks.add(
+            lambda connection, exc: cls._notify_state(False)
+        )
+        cls._connection.reconnect_callbacks.add(
+            lambda connection: cls._notify_state(True)
+        )
+        cls._notify_state(True)
+        logger.info(f'Подписка на {TASK_EVENTS_EXCHANGE} активна')
+
+    @classmethod
+    async def disconnect(cls):
+        if cls._connection is not None and not cls._connection.is_closed:
+            await cls._connection.close()
+            logger.info(f'Подписка на {TASK_EVENTS_EXCHANGE} закрыта')
+        cls._connection = None
+        cls._channel = None
+        cls._notify_state(False)
+
+    @classmethod
+    async def _on_message(cls, message: IncomingMessage):
+        try:
+            payload = json.loads(message.body)
+            task_id = UUID(payload['task_id'])
+            status = TaskStatus(payload['status'])
+        except (ValueError, KeyError, TypeError) as err:
+            logger.warning(f'Некорректное событие задачи {message.body}: {err}')
+            return
+        for handler in cls._handlers:
+            handler(task_id, status)
@@ -0,0 +1,101 @@
+from sqlalchemy import select, delete, update
+
+import asyncio
+
+from app.core.config import logger, settings
+from app.db.database import SessionLocal
+from app.models.outbox import OutboxMessage
+from app.queue.producer import RabbitMQProducer
+
+
+class OutboxRelay:
+    '''
+    Фоново публикует сообщения из task_outbox пачками с publisher confirms.
+    Строки блокируются через SKIP LOCKED, поэтому relay может работать
+    в нескольких процессах API одновременно
+    '''
+
+    _task: asyncio.Task | None = None
+    _wakeup: asyncio.Event | None = None
+
+    @classmethod
+    def notify(cls):
+        '''
+        Будит relay после коммита новой задачи, чтобы не ждать опроса
+        '''
+
+        if cls._wakeup is not None:
+            cls._wakeup.set()
+
+    @classmethod
+    async def start(cls):
+        if cls._task is None:
+            cls._wakeup = asyncio.Event()
+            cls._task = asyncio.create_task(cls._run())
+            logger.info('Outbox relay запущен')
+
+    @classmethod
+    async def stop(cls):
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
+            cls._wakeup = None
+            logger.info('Outbox relay остановлен')
+
+    @classmethod
+    async def relay_batch(cls) -> tuple[int, int]:
+        '''
+        Публикует одну пачку сообщений.
+        Возвращает количество опубликованных и неопубликованных сообщений
+        '''
+
+        async with SessionLocal() as session:
+            rows = (await session.execute(
+                select(OutboxMessage.id, OutboxMessage.task_id, OutboxMessage.priority)
+                .order_by(OutboxMessage.id)
+                .limit(settings.OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                return 0, 0
+
+            errors = await RabbitMQProducer.publish_task_messages(
+                [(str(row.task_id), row.priority) for row in rows]
+            )
+            published = [row.id for row, error in zip(rows, errors) if error is None]
+            failed = [row.id for row, error in zip(rows, errors) if error is not None]
+
+            if published:
+                await session.execute(
+                    delete(OutboxMessage).where(OutboxMessage.id.in_(published))
+                )
+            if failed:
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(failed))
+                    .values(attempts=OutboxMessage.attempts + 1)
+                )
+            await session.commit()
+            return len(published), len(failed)
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            cls._wakeup.clear()
+            try:
+                published, failed = await cls.relay_batch()
+            except Exception as err:
+                logger.error(f'Outbox relay: ошибка публикации: {err}')
+                published, failed = 0, 1
+
+            if failed:
+                await asyncio.sleep(settings.OUTBOX_RETRY_DELAY)
+            elif not published:
+                try:
+                    await asyncio.wait_for(
+                        cls._wakeup.wait(),
+                        timeout=settings.OUTBOX_POLL_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    pass
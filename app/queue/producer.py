@@ -1,15 +1,29 @@
 from aio_pika import RobustChannel, RobustQueue, connect_robust, Message, DeliveryMode
+from aio_pika.abc import AbstractExchange, AbstractIncomingMessage
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
-import json, asyncio
+import json, asyncio, time
 
-from app.models.task import TaskPriority
+from app.models.task import TaskPriority, TaskStatus
 from app.core.config import logger, settings
+from app.core.metrics import (PUBLISH_BATCH_DURATION, PUBLISHED_OK, PUBLISHED_ERROR,
+                              gauge_from)
+from app.queue.routing import get_queue_name, get_queue_arguments, MESSAGE_PRIORITIES
+from app.queue.events import (build_task_event, declare_task_events_exchange,
+                              build_task_cancel, declare_task_cancel_exchange)
+from app.queue.retry import declare_dead_letter_queue
 
 
 class RabbitMQProducer:
     _connection: RobustChannel | None = None
     _channel: RobustChannel | None = None
     _queues: dict[TaskPriority, RobustQueue] = {}
+    _events_exchange: AbstractExchange | None = None
+    _cancel_exchange: AbstractExchange | None = None
+    _depth_channel: RobustChannel | None = None
+    _buffer: asyncio.Queue | None = None
+    _publishers: list[asyncio.Task] = []
 
     @classmethod
     def isconnection(cls) -> bool:
@@ -24,33 +38,40 @@ class RabbitMQProducer:
                 cls._channel = await cls._connection.channel()
                 logger.info('RabbitMQP подключен')
 
+                declared: dict[str, RobustQueue] = {}
                 for priority in TaskPriority:
-                    queue_name = cls._get_queue_name(priority)
-                    cls._queues[priority] = await cls._channel.declare_queue(
-                        queue_name,
-                        durable=True
-                    )
-                    logger.info(f'Объявлена очередь в RabbitMQP: {queue_name}')
+                    queue_name = get_queue_name(priority)
+                    if queue_name not in declared:
+                        declared[queue_name] = await cls._channel.declare_queue(
+                            queue_name,
+                            durable=True,
+                            arguments=get_queue_arguments()
+                        )
+                        logger.info(f'Объявлена очередь в RabbitMQP: {queue_name}')
+                    cls._queues[priority] = declared[queue_name]
+                cls._events_exchange = await declare_task_events_exchange(cls._channel)
+                cls._cancel_exchange = await declare_task_cancel_exchange(cls._channel)
+                cls._start_publishers()
             except Exception as err:
                 logger.error(f'Не удалось подключиться к RabbitMQP: {err}')
                 cls._connection = None
                 cls._channel = None
+                cls._events_exchange = None
+                cls._cancel_exchange = None
                 raise
 
     @classmethod
     async def disconnect(cls):
+        await cls._stop_publishers()
         if not cls.isconnection():
             await cls._connection.close()
             cls._connection = None
             cls._channel = None
+            cls._depth_channel = None
             logger.info('RabbitMQP отключен')
 
-    @staticmethod
-    def _get_queue_name(priority: TaskPriority) -> str:
-        return f'task_queue_{priority.value.lower()}'
-
     @classmethod
-    async def publish_task_message(cls, task_id: str, priority: TaskPriority):
+    async def _ensure_channel(cls):
         if cls._channel is None or cls._channel.is_closed:
             logger.info('RabbitMQP не активен, выполняется подключение')
             await cls.connect()
@@ -59,28 +80,222 @@ class RabbitMQProducer:
             logger.error('Не удалось опубликовать сообщение: канал RabbitMQP недоступен.')
             raise ConnectionError('Канал RabbitMQ недоступен.')
 
-        message_body = json.dumps({'task_id': task_id}).encode('utf-8')
-        queue = cls._queues.get(priority)
+    @classmethod
+    def _start_publishers(cls):
+        if cls._buffer is None:
+            cls._buffer = asyncio.Queue(maxsize=settings.PUBLISH_BUFFER_SIZE)
+        if not cls._publishers:
+            cls._publishers = [
+                asyncio.create_task(cls._publish_loop())
+                for _ in range(settings.PUBLISH_CHANNEL_POOL_SIZE)
+            ]
+            logger.info(f'RabbitMQP: каналов публикации {len(cls._publishers)}, '
+                        f'буфер {settings.PUBLISH_BUFFER_SIZE} сообщений')
 
-        if not queue:
-            logger.error(f'Очередь на получение приоритета {priority} не найдена')
-            await cls.connect()
-            queue = cls._queues.get(priority)
-            if not queue:
-                raise ValueError(
-                    f'Очередь на получение приоритета {priority} '
-                    'по-прежнему недоступна после повторного подключения.'
-                )
-
-        await cls._channel.default_exchange.publish(
-            Message(
-                body=message_body,
-                delivery_mode=DeliveryMode.PERSISTENT
-            ),
-            routing_key=queue.name
+    @classmethod
+    async def _stop_publishers(cls):
+        for publisher in cls._publishers:
+            publisher.cancel()
+        await asyncio.gather(*cls._publishers, return_exceptions=True)
+        cls._publishers = []
+
+        while cls._buffer is not None and not cls._buffer.empty():
+            _, _, future = cls._buffer.get_nowait()
+            if not future.done():
+                future.set_exception(ConnectionError('RabbitMQP отключен'))
+
+    @classmethod
+    async def _publish_loop(cls):
+        '''
+        Один канал пула. Забирает из буфера до PUBLISH_BATCH_SIZE сообщений,
+        отправляет их не дожидаясь друг друга и разом ждет подтверждений.
+        Сообщение считается опубликованным, когда брокер подтвердил его
+        (publisher confirms) и положил в очередь (on_return_raises)
+        '''
+
+        channel = None
+        batch = []
+        try:
+            while True:
+                batch = [await cls._buffer.get()]
+                while len(batch) < settings.PUBLISH_BATCH_SIZE and not cls._buffer.empty():
+                    batch.append(cls._buffer.get_nowait())
+
+                started = time.perf_counter()
+                try:
+                    if channel is None or channel.is_closed:
+                        channel = await cls._connection.channel(
+                            publisher_confirms=True,
+                            on_return_raises=True
+                        )
+                    exchange = channel.default_exchange
+                    confirms = await asyncio.gather(
+                        *(exchange.publish(message, routing_key=routing_key)
+                          for message, routing_key, _ in batch),
+                        return_exceptions=True
+                    )
+                except Exception as err:
+                    logger.error(f'RabbitMQP: не удалось опубликовать {len(batch)} '
+                                 f'сообщений: {err}')
+                    confirms = [err] * len(batch)
+                PUBLISH_BATCH_DURATION.observe(time.perf_counter() - started)
+                errors = sum(isinstance(confirm, Exception) for confirm in confirms)
+                PUBLISHED_ERROR.inc(errors)
+                PUBLISHED_OK.inc(len(batch) - errors)
+
+                for (_, _, future), confirm in zip(batch, confirms):
+                    if future.done():
+                        continue
+                    if isinstance(confirm, Exception):
+                        future.set_exception(confirm)
+                    else:
+                        future.set_result(None)
+                batch = []
+        finally:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(ConnectionError('RabbitMQP отключен'))
+            if channel is not None and not channel.is_closed:
+                await channel.close()
+
+    @classmethod
+    async def _enqueue(cls, message: Message, routing_key: str) -> asyncio.Future:
+        '''
+        Кладет сообщение в буфер. Если буфер заполнен, ждет, пока
+        каналы освободят место: так медленный брокер притормаживает
+        запросы, а не копит сообщения в памяти
+        '''
+
+        future = asyncio.get_running_loop().create_future()
+        await cls._buffer.put((message, routing_key, future))
+        return future
+
+    @staticmethod
+    def _build_message(task_id: str, priority: TaskPriority) -> Message:
+        return Message(
+            body=json.dumps({'task_id': task_id}).encode('utf-8'),
+            delivery_mode=DeliveryMode.PERSISTENT,
+            priority=MESSAGE_PRIORITIES[priority]
         )
+
+    @classmethod
+    async def publish_task_message(cls, task_id: str, priority: TaskPriority):
+        await cls._ensure_channel()
+        queue_name = get_queue_name(priority)
+
+        await (await cls._enqueue(cls._build_message(task_id, priority), queue_name))
         logger.info(f'Опубликованная задача {task_id} '
-                    f'помещена в очередь {queue.name}')
+                    f'помещена в очередь {queue_name}')
+
+    @classmethod
+    async def publish_task_messages(
+            cls,
+            tasks: list[tuple[str, TaskPriority]]
+    ) -> list[Exception | None]:
+        '''
+        Публикует пачку задач через пул каналов с publisher confirms.
+        Возвращает ошибку для каждой задачи или None, если брокер ее принял
+        '''
+
+        try:
+            await cls._ensure_channel()
+        except Exception as err:
+            logger.error(f'Не удалось опубликовать пачку из {len(tasks)} задач: {err}')
+            return [err] * len(tasks)
+
+        futures = [
+            await cls._enqueue(cls._build_message(task_id, priority),
+                               get_queue_name(priority))
+            for task_id, priority in tasks
+        ]
+        confirms = await asyncio.gather(*futures, return_exceptions=True)
+        results: list[Exception | None] = [
+            confirm if isinstance(confirm, Exception) else None
+            for confirm in confirms
+        ]
+
+        failed = sum(result is not None for result in results)
+        logger.info(f'Опубликовано {len(tasks) - failed} из {len(tasks)} задач')
+        return results
+
+    @classmethod
+    async def publish_task_event(cls, task_id: str, status: TaskStatus):
+        '''
+        Сообщает всем процессам об изменении статуса задачи.
+        Ошибка публикации не прерывает запрос, кэши защищены TTL
+        '''
+
+        try:
+            await cls._ensure_channel()
+            await cls._events_exchange.publish(
+                build_task_event(task_id, status),
+                routing_key=''
+            )
+        except Exception as err:
+            logger.warning(f'Не удалось опубликовать событие задачи {task_id}: {err}')
+
+    @classmethod
+    async def publish_task_cancel(cls, task_id: str):
+        '''
+        Просит workerы прервать выполнение задачи.
+        Статус CANCELLED к этому моменту уже записан в БД
+        '''
+
+        try:
+            await cls._ensure_channel()
+            await cls._cancel_exchange.publish(build_task_cancel(task_id), routing_key='')
+        except Exception as err:
+            logger.warning(f'Не удалось отправить отмену задачи {task_id}: {err}')
+
+
+    @classmethod
+    @asynccontextmanager
+    async def fetch_dead_letters(
+            cls,
+            limit: int
+    ) -> AsyncIterator[list[AbstractIncomingMessage]]:
+        '''
+        Забирает до limit сообщений из DLQ на отдельном канале.
+        Сообщения, которые не подтвердили, при закрытии канала
+        возвращаются в очередь
+        '''
+
+        await cls._ensure_channel()
+        channel = await cls._connection.channel()
+        try:
+            queue = await declare_dead_letter_queue(channel)
+            messages = []
+            while len(messages) < limit:
+                message = await queue.get(no_ack=False, fail=False)
+                if message is None:
+                    break
+                messages.append(message)
+            yield messages
+        finally:
+            await channel.close()
+
+    @classmethod
+    async def fetch_queue_depths(cls) -> dict[str, int]:
+        '''
+        Количество сообщений в очередях задач через пассивное объявление.
+        Канал отдельный: ошибка пассивного объявления закрывает канал
+        '''
+
+        await cls._ensure_channel()
+        if cls._depth_channel is None or cls._depth_channel.is_closed:
+            cls._depth_channel = await cls._connection.channel()
+        depths = {}
+        for queue_name in {get_queue_name(priority) for priority in TaskPriority}:
+            queue = await cls._depth_channel.declare_queue(queue_name, passive=True)
+            depths[queue_name] = queue.declaration_result.message_count
+        return depths
+
+
+gauge_from(
+    'task_publish_buffer_size',
+    'Сообщения задач, ожидающие отправки в RabbitMQ',
+    lambda: RabbitMQProducer._buffer.qsize() if RabbitMQProducer._buffer else 0
+)
 
 
 async def main():
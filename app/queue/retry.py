@@ -0,0 +1,90 @@
+from aio_pika import ExchangeType, Message, DeliveryMode
+from aio_pika.abc import AbstractRobustChannel, AbstractExchange, AbstractQueue
+
+from datetime import datetime
+
+import json
+
+from app.core.config import settings
+from app.models.task import TaskPriority
+from app.queue.routing import MESSAGE_PRIORITIES
+
+TASK_RETRY_EXCHANGE = 'task_retry'
+DEAD_LETTER_QUEUE = 'task_dead_letter'
+
+
+def get_retry_delay(attempt: int) -> int:
+    '''
+    Задержка перед повтором после неудачной попытки attempt, в мс.
+    Растет вдвое с каждой попыткой, но не больше TASK_RETRY_MAX_DELAY
+    '''
+
+    delay = min(
+        settings.TASK_RETRY_BASE_DELAY * 2 ** (attempt - 1),
+        settings.TASK_RETRY_MAX_DELAY
+    )
+    return int(delay * 1000)
+
+
+def get_retry_delays() -> list[int]:
+    return sorted({get_retry_delay(attempt)
+                   for attempt in range(1, settings.TASK_MAX_ATTEMPTS)})
+
+
+async def declare_retry_topology(channel: AbstractRobustChannel) -> AbstractExchange:
+    '''
+    Объявляет headers exchange и по очереди на каждую задержку.
+    Сообщение лежит в task_retry_<мс> до истечения x-message-ttl,
+    затем RabbitMQ перекладывает его через exchange по умолчанию
+    в исходную очередь задач: routing key при публикации - ее имя.
+    У всех сообщений очереди один TTL, поэтому они истекают по порядку
+    '''
+
+    exchange = await channel.declare_exchange(
+        TASK_RETRY_EXCHANGE,
+        ExchangeType.HEADERS,
+        durable=True
+    )
+    for delay in get_retry_delays():
+        queue = await channel.declare_queue(
+            f'task_retry_{delay}',
+            durable=True,
+            arguments={
+                'x-message-ttl': delay,
+                'x-dead-letter-exchange': ''
+            }
+        )
+        await queue.bind(exchange, arguments={'x-match': 'all', 'retry-delay': delay})
+    return exchange
+
+
+async def declare_dead_letter_queue(channel: AbstractRobustChannel) -> AbstractQueue:
+    return await channel.declare_queue(DEAD_LETTER_QUEUE, durable=True)
+
+
+def build_retry_message(task_id: str, priority: TaskPriority, delay: int) -> Message:
+    return Message(
+        body=json.dumps({'task_id': task_id}).encode('utf-8'),
+        delivery_mode=DeliveryMode.PERSISTENT,
+        priority=MESSAGE_PRIORITIES[priority],
+        headers={'retry-delay': delay}
+    )
+
+
+def build_dead_letter(
+        task_id: str,
+        priority: TaskPriority,
+        attempts: int,
+        error_info: str
+) -> Message:
+    return Message(
+        body=json.dumps({
+            'task_id': task_id,
+            'priority': priority.value,
+            'attempts': attempts,
+            'error_info': error_info,
+            'failed_at': datetime.utcnow().isoformat()
+        }).encode('utf-8'),
+        content_type='application/json',
+        delivery_mode=DeliveryMode.PERSISTENT
+    )
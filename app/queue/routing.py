@@ -0,0 +1,30 @@
+from app.core.config import settings
+from app.models.task import TaskPriority
+
+PRIORITY_QUEUE_NAME = 'task_queue_priority'
+MAX_PRIORITY = 10
+MESSAGE_PRIORITIES: dict[TaskPriority, int] = {
+    TaskPriority.LOW: 1,
+    TaskPriority.MEDIUM: 5,
+    TaskPriority.HIGH: 9
+}
+
+
+def is_priority_mode() -> bool:
+    '''
+    True, если все задачи идут в одну очередь с x-max-priority
+    '''
+
+    return settings.TASK_QUEUE_MODE == 'priority'
+
+
+def get_queue_name(priority: TaskPriority) -> str:
+    if is_priority_mode():
+        return PRIORITY_QUEUE_NAME
+    return f'task_queue_{priority.value.lower()}'
+
+
+def get_queue_arguments() -> dict | None:
+    if is_priority_mode():
+        return {'x-max-priority': MAX_PRIORITY}
+    return None
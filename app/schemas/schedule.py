@@ -0,0 +1,33 @@
+from pydantic import Field, field_validator
+
+from datetime import datetime
+from uuid import UUID
+
+from app.core.cron import CronExpression
+from app.schemas.task import TaskBase
+
+
+class TaskScheduleCreate(TaskBase):
+    cron: str = Field(
+        ...,
+        max_length=255,
+        description='Cron-выражение из пяти полей в UTC, например */5 * * * *'
+    )
+
+    @field_validator('cron')
+    @classmethod
+    def check_cron(cls, value: str) -> str:
+        cron = CronExpression(value)
+        cron.next_after(datetime.utcnow())
+        return ' '.join(value.split())
+
+
+class TaskScheduleResponse(TaskScheduleCreate):
+    id: UUID
+    enabled: bool
+    created_at: datetime
+    next_run_at: datetime
+    last_run_at: datetime | None
+
+    class Config:
+        from_attributes = True
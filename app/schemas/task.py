@@ -1,11 +1,45 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field, field_validator
 
-from datetime import datetime
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any
 from uuid import UUID
 
+from app.core.config import settings
 from app.models.task import TaskPriority, TaskStatus
 
 
+class TotalMode(str, Enum):
+    COUNTED = 'counted'
+    ESTIMATE = 'estimate'
+    EXACT = 'exact'
+
+
+class TaskField(str, Enum):
+    ID = 'id'
+    TITLE = 'title'
+    DESCRIPTION = 'description'
+    TYPE = 'type'
+    PAYLOAD = 'payload'
+    PRIORITY = 'priority'
+    STATUS = 'status'
+    CREATED_AT = 'created_at'
+    RUN_AT = 'run_at'
+    STARTED_AT = 'started_at'
+    COMPLETED_AT = 'completed_at'
+    ATTEMPTS = 'attempts'
+    PENDING_PARENTS = 'pending_parents'
+    RESULT = 'result'
+    RESULT_SIZE = 'result_size'
+    ERROR_INFO = 'error_info'
+
+
+def get_result_url(task_id: UUID, result_size: int | None) -> str | None:
+    if result_size is None:
+        return None
+    return f'{settings.API_V1_STR}/tasks/{task_id}/result'
+
+
 class TaskBase(BaseModel):
     title: str = Field(..., max_length=255, description='Название задачи')
     description: str | None = Field(None, description='Описание задачи')
@@ -13,10 +47,35 @@ class TaskBase(BaseModel):
         TaskPriority.MEDIUM,
         description='Приоритет задачи'
     )
+    type: str = Field('default', max_length=64, description='Тип задачи, выбирает обработчик')
+    payload: dict[str, Any] | None = Field(None, description='Входные данные обработчика')
 
 
 class TaskCreate(TaskBase):
-    pass
+    run_at: datetime | None = Field(
+        None,
+        description='Когда запустить задачу, без зоны - UTC. По умолчанию сразу'
+    )
+    depends_on: list[UUID] | None = Field(
+        None,
+        max_length=settings.TASK_MAX_DEPENDENCIES,
+        description='Задачи, после успешного завершения которых запустится эта'
+    )
+    dedup_key: str | None = Field(
+        None,
+        min_length=1,
+        max_length=255,
+        description='Ключ идемпотентности: повтор запроса вернет исходную задачу. '
+                    'Для одиночной задачи его можно передать заголовком Idempotency-Key'
+    )
+
+    @field_validator('run_at')
+    @classmethod
+    def to_naive_utc(cls, value: datetime | None) -> datetime | None:
+        # В БД время хранится без зоны, в UTC
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 class TaskUpdateStatus(BaseModel):
@@ -27,11 +86,23 @@ class TaskResponse(TaskBase):
     id: UUID
     status: TaskStatus
     created_at: datetime
+    run_at: datetime | None = Field(None, description='Запланированное время запуска')
     started_at: datetime | None
     completed_at: datetime | None
+    attempts: int = Field(0, description='Сколько раз задача бралась в работу')
+    pending_parents: int = Field(0, description='Сколько зависимостей еще не завершено')
     result: str | None
+    result_size: int | None = Field(
+        None,
+        description='Размер результата в байтах, если он хранится отдельно'
+    )
     error_info: str | None
 
+    @computed_field(description='Ссылка на результат, если его нет в поле result')
+    @property
+    def result_url(self) -> str | None:
+        return get_result_url(self.id, self.result_size)
+
     class Config:
         from_attributes = True
 
@@ -44,11 +115,89 @@ class TaskStatusResponse(BaseModel):
         from_attributes = True
 
 
+class TaskListItem(BaseModel):
+    '''
+    Задача в списке. При ?fields= в ответ попадают только
+    запрошенные поля, result_url приходит вместе с result_size
+    '''
+
+    id: UUID | None = None
+    title: str | None = None
+    description: str | None = None
+    type: str | None = None
+    payload: dict[str, Any] | None = None
+    priority: TaskPriority | None = None
+    status: TaskStatus | None = None
+    created_at: datetime | None = None
+    run_at: datetime | None = None
+    started_at: datetime | None = None
+    completed_at: datetime | None = None
+    attempts: int | None = None
+    pending_parents: int | None = None
+    result: str | None = None
+    result_size: int | None = None
+    error_info: str | None = None
+    result_url: str | None = None
+
+
 class PaginatedTasksResponse(BaseModel):
     total: int
     page: int
     page_size: int
-    items: list[TaskResponse]
+    next_cursor: str | None = Field(
+        None,
+        description='Курсор следующей страницы, если она есть'
+    )
+    items: list[TaskListItem]
 
     class Config:
         from_attributes = True
+
+
+class TaskBatchItemResponse(BaseModel):
+    index: int = Field(..., description='Позиция задачи в запросе')
+    id: UUID
+    status: TaskStatus
+    error_info: str | None = None
+    deduplicated: bool = Field(
+        False,
+        description='Задача уже была создана запросом с тем же dedup_key'
+    )
+
+
+class DeadLetterResponse(BaseModel):
+    task_id: UUID
+    priority: TaskPriority
+    attempts: int
+    error_info: str | None
+    failed_at: datetime
+
+
+class DeadLetterReplayRequest(BaseModel):
+    task_ids: list[UUID] | None = Field(
+        None,
+        description='Какие задачи повторить, по умолчанию все из выборки'
+    )
+
+
+class DeadLetterReplayResponse(BaseModel):
+    replayed: list[UUID]
+    discarded: list[UUID] = Field(
+        ...,
+        description='Задачи, которые уже не FAILED, их сообщения удалены из DLQ'
+    )
+
+
+class TaskBatchResponse(BaseModel):
+    total: int
+    queued: int
+    failed: int
+    scheduled: int = Field(
+        0,
+        description='Сколько задач ждут run_at или завершения зависимостей'
+    )
+    deduplicated: int = Field(
+        0,
+        description='Сколько задач не созданы повторно по dedup_key'
+    )
+    items: list[TaskBatchItemResponse]
@@ -0,0 +1,112 @@
+from fastapi import HTTPException, Request
+
+from datetime import datetime
+
+import asyncio
+import math
+import time
+
+from app.core.config import logger, settings
+from app.core.metrics import REJECTED_RATE_LIMIT, REJECTED_QUEUE_FULL
+from app.core.rate_limit import TokenBucketLimiter
+from app.queue.producer import RabbitMQProducer
+from app.queue.routing import get_queue_name
+from app.schemas.task import TaskCreate
+
+rate_limiter = TokenBucketLimiter(
+    rate=settings.RATE_LIMIT_PER_SECOND,
+    burst=settings.RATE_LIMIT_BURST,
+    maxsize=settings.RATE_LIMIT_MAX_CLIENTS
+)
+
+
+def get_client_id(request: Request) -> str:
+    '''
+    Клиент для лимитов: ключ из X-API-Key, если он есть в API_KEYS,
+    иначе адрес. Непроверенный ключ не учитывается, иначе клиент
+    получал бы новый bucket на каждый запрос и вытеснял чужие
+    '''
+
+    api_key = request.headers.get('x-api-key')
+    if api_key and api_key in settings.API_KEYS:
+        return f'key:{api_key}'
+    return f'ip:{request.client.host if request.client else "unknown"}'
+
+
+class QueueDepthMonitor:
+    '''
+    Кэш глубины очередей task_queue_*. Запрос не ждет RabbitMQ: он читает
+    последнее известное значение, а устаревшее перечитывается одной
+    фоновой задачей через пассивное объявление очередей.
+    Пока глубина неизвестна, задачи принимаются
+    '''
+
+    _depths: dict[str, int] = {}
+    _fetched_at: float = float('-inf')
+    _refresh: asyncio.Task | None = None
+
+    @classmethod
+    def depth(cls, queue_name: str) -> int | None:
+        if (cls._refresh is None
+                and time.monotonic() - cls._fetched_at >= settings.TASK_QUEUE_DEPTH_TTL):
+            cls._refresh = asyncio.create_task(cls._fetch())
+        return cls._depths.get(queue_name)
+
+    @classmethod
+    async def _fetch(cls):
+        try:
+            cls._depths = await RabbitMQProducer.fetch_queue_depths()
+            cls._fetched_at = time.monotonic()
+        except Exception as err:
+            logger.warning(f'Не удалось получить глубину очередей: {err}')
+            cls._depths = {}
+            # Недоступный брокер не опрашивается на каждый запрос
+            cls._fetched_at = time.monotonic() + settings.OUTBOX_RETRY_DELAY
+        finally:
+            cls._refresh = None
+
+    @classmethod
+    async def stop(cls):
+        if cls._refresh is not None:
+            cls._refresh.cancel()
+            await asyncio.gather(cls._refresh, return_exceptions=True)
+            cls._refresh = None
+        cls._depths = {}
+        cls._fetched_at = float('-inf')
+
+
+def admit_tasks_s(client_id: str, tasks_in: list[TaskCreate]):
+    '''
+    Допуск создания задач до их записи в БД: сначала глубина очередей (503),
+    затем token bucket клиента (429), оба отказа с Retry-After.
+    Задачи с run_at в будущем или depends_on в очередь сразу не попадают
+    и глубину не проверяют. Пачка расходует по токену на задачу
+    '''
+
+    if settings.TASK_QUEUE_MAX_DEPTH > 0:
+        now = datetime.utcnow()
+        queues = {
+            get_queue_name(task_in.priority) for task_in in tasks_in
+            if not task_in.depends_on and (task_in.run_at is None or task_in.run_at <= now)
+        }
+        full = sorted(
+            queue_name for queue_name in queues
+            if (QueueDepthMonitor.depth(queue_name) or 0) > settings.TASK_QUEUE_MAX_DEPTH
+        )
+        if full:
+            REJECTED_QUEUE_FULL.inc()
+            raise HTTPException(
+                status_code=503,
+                detail=f'Очередь переполнена: {", ".join(full)}',
+                headers={'Retry-After': str(settings.TASK_QUEUE_RETRY_AFTER)}
+            )
+
+    if settings.RATE_LIMIT_PER_SECOND > 0:
+        wait = rate_limiter.acquire(client_id, len(tasks_in))
+        if wait:
+            REJECTED_RATE_LIMIT.inc()
+            raise HTTPException(
+                status_code=429,
+                detail='Превышен лимит создания задач',
+                headers={'Retry-After': str(math.ceil(wait))}
+            )
@@ -0,0 +1,193 @@
+from sqlalchemy import text
+
+from datetime import datetime, timedelta
+
+import asyncio
+
+from app.core.config import logger, settings
+from app.db.database import SessionLocal
+from app.models.task import Task
+
+TASK_COLUMNS = ', '.join(column.name for column in Task.__table__.columns)
+TASK_UPDATES = ', '.join(
+    f'{column.name} = EXCLUDED.{column.name}'
+    for column in Task.__table__.columns if column.name != 'id'
+)
+
+# Перенос одним оператором: строки удаляются из tasks и вставляются
+# в tasks_archive в одной транзакции, ребра зависимостей от них удаляются.
+# Условие на created_at отсекает свежие секции, SKIP LOCKED позволяет
+# запускать архивацию в нескольких процессах. Строка уже удалена из tasks,
+# поэтому при конфликте по id архивная копия перезаписывается, а не теряется
+ARCHIVE_STATEMENT = text(f'''
+WITH moved AS (
+    DELETE FROM tasks AS t
+    USING (
+        SELECT id, created_at FROM tasks
+        WHERE status IN ('COMPLETED', 'FAILED', 'CANCELLED')
+            AND completed_at < :before
+            AND created_at < :before
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ) AS old
+    WHERE t.id = old.id AND t.created_at = old.created_at
+    RETURNING t.*
+), edges AS (
+    DELETE FROM task_dependencies AS d USING moved WHERE d.parent_id = moved.id
+)
+INSERT INTO tasks_archive ({TASK_COLUMNS}, archived_at)
+SELECT {TASK_COLUMNS}, now() AT TIME ZONE 'utc' FROM moved
+ON CONFLICT (id) DO UPDATE SET {TASK_UPDATES}, archived_at = EXCLUDED.archived_at
+''')
+
+PARTITIONS_STATEMENT = text('''
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+WHERE parent.relname = 'tasks' AND child.relname ~ '^tasks_[0-9]{4}_[0-9]{2}$'
+ORDER BY child.relname
+''')
+
+PURGE_IDEMPOTENCY_KEYS_STATEMENT = text(
+    'DELETE FROM task_idempotency_keys WHERE created_at < :before'
+)
+
+ENSURE_PARTITIONS_STATEMENT = text(
+    "SELECT create_task_partitions(now() AT TIME ZONE 'utc', :months_ahead)"
+)
+
+
+class TaskArchiver:
+    '''
+    Фоново переносит завершенные задачи старше TASK_ARCHIVE_RETENTION_DAYS
+    в tasks_archive и удаляет устаревшие ключи идемпотентности.
+    Секции tasks на будущие месяцы создаются отдельным циклом,
+    который работает и при выключенной архивации
+    '''
+
+    _task: asyncio.Task | None = None
+    _partitions_task: asyncio.Task | None = None
+
+    @classmethod
+    async def start(cls):
+        if cls._partitions_task is None:
+            cls._partitions_task = asyncio.create_task(cls._run_partitions())
+        if cls._task is None and settings.TASK_ARCHIVE_RETENTION_DAYS > 0:
+            cls._task = asyncio.create_task(cls._run())
+            logger.info('Архивация задач запущена, хранение '
+                        f'{settings.TASK_ARCHIVE_RETENTION_DAYS} дн.')
+
+    @classmethod
+    async def stop(cls):
+        for task in (cls._task, cls._partitions_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if cls._task is not None:
+            logger.info('Архивация задач остановлена')
+        cls._task = None
+        cls._partitions_task = None
+
+    @classmethod
+    async def ensure_partitions(cls, months_ahead: int | None = None) -> int:
+        async with SessionLocal() as session:
+            created = (await session.execute(ENSURE_PARTITIONS_STATEMENT, {
+                'months_ahead': months_ahead or settings.TASK_PARTITIONS_AHEAD
+            })).scalar_one()
+            await session.commit()
+        if created:
+            logger.info(f'Создано секций tasks: {created}')
+        return created
+
+    @classmethod
+    async def drop_empty_partitions(cls, retention_days: int | None = None) -> list[str]:
+        '''
+        Удаляет пустые секции, которые целиком старше срока хранения.
+        Непустые остаются: в них незавершенные задачи
+        '''
+
+        before = datetime.utcnow() - timedelta(
+            days=retention_days or settings.TASK_ARCHIVE_RETENTION_DAYS
+        )
+        dropped = []
+        async with SessionLocal() as session:
+            for name in (await session.execute(PARTITIONS_STATEMENT)).scalars():
+                month_start = datetime.strptime(name, 'tasks_%Y_%m')
+                month_end = (month_start + timedelta(days=32)).replace(day=1)
+                if month_end > before:
+                    continue
+                has_rows = (await session.execute(
+                    text(f'SELECT EXISTS (SELECT 1 FROM "{name}")')
+                )).scalar_one()
+                if not has_rows:
+                    await session.execute(text(f'DROP TABLE "{name}"'))
+                    dropped.append(name)
+            await session.commit()
+        if dropped:
+            logger.info(f'Удалены пустые секции tasks: {", ".join(dropped)}')
+        return dropped
+
+    @classmethod
+    async def archive_batch(cls, retention_days: int | None = None) -> int:
+        '''
+        Переносит одну пачку задач, возвращает количество перенесенных
+        '''
+
+        before = datetime.utcnow() - timedelta(
+            days=retention_days or settings.TASK_ARCHIVE_RETENTION_DAYS
+        )
+        async with SessionLocal() as session:
+            moved = (await session.execute(ARCHIVE_STATEMENT, {
+                'before': before,
+                'limit': settings.TASK_ARCHIVE_BATCH_SIZE
+            })).rowcount
+            await session.commit()
+        return moved
+
+    @classmethod
+    async def archive_all(cls, retention_days: int | None = None) -> int:
+        total = 0
+        while True:
+            moved = await cls.archive_batch(retention_days)
+            total += moved
+            if moved < settings.TASK_ARCHIVE_BATCH_SIZE:
+                return total
+
+    @classmethod
+    async def purge_idempotency_keys(cls) -> int:
+        '''
+        Удаляет ключи идемпотентности старше TASK_IDEMPOTENCY_TTL,
+        после этого ключ можно использовать для новой задачи
+        '''
+
+        before = datetime.utcnow() - timedelta(seconds=settings.TASK_IDEMPOTENCY_TTL)
+        async with SessionLocal() as session:
+            purged = (await session.execute(
+                PURGE_IDEMPOTENCY_KEYS_STATEMENT, {'before': before}
+            )).rowcount
+            await session.commit()
+        return purged
+
+    @classmethod
+    async def _run_partitions(cls):
+        while True:
+            try:
+                await cls.ensure_partitions()
+            except Exception as err:
+                logger.error(f'Создание секций tasks: ошибка: {err}')
+            await asyncio.sleep(settings.TASK_PARTITIONS_INTERVAL)
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            try:
+                moved = await cls.archive_all()
+                if moved:
+                    logger.info(f'В архив перенесено задач: {moved}')
+                purged = await cls.purge_idempotency_keys()
+                if purged:
+                    logger.info(f'Удалено устаревших ключей идемпотентности: {purged}')
+            except Exception as err:
+                logger.error(f'Архивация задач: ошибка: {err}')
+            await asyncio.sleep(settings.TASK_ARCHIVE_INTERVAL)
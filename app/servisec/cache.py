@@ -0,0 +1,37 @@
+from uuid import UUID
+
+from app.core.cache import TTLCache
+from app.core.config import logger, settings
+from app.models.task import TaskStatus
+
+# Кэши включаются, только пока API получает события об изменении статусов,
+# иначе другие процессы не смогут их инвалидировать
+task_cache = TTLCache(maxsize=settings.TASK_CACHE_MAX_SIZE, ttl=settings.TASK_CACHE_TTL)
+task_status_cache = TTLCache(
+    maxsize=settings.TASK_CACHE_MAX_SIZE,
+    ttl=settings.TASK_CACHE_TTL
+)
+task_cache.enabled = False
+task_status_cache.enabled = False
+# Ключ идемпотентности -> (fingerprint, id задачи). Привязка ключа к задаче
+# не меняется, инвалидация не нужна: сама задача читается через get_task_s
+idempotency_cache = TTLCache(
+    maxsize=settings.TASK_IDEMPOTENCY_CACHE_SIZE,
+    ttl=settings.TASK_IDEMPOTENCY_TTL
+)
+
+
+def invalidate_task_cache(task_id: UUID, status: TaskStatus | None = None):
+    task_cache.invalidate(task_id)
+    task_status_cache.invalidate(task_id)
+
+
+def set_task_cache_enabled(enabled: bool):
+    '''
+    Сбрасывает кэши при потере или восстановлении канала событий
+    '''
+
+    for cache in (task_cache, task_status_cache):
+        cache.clear()
+        cache.enabled = enabled
+    logger.info(f'Кэш задач {"включен" if enabled else "выключен"}')
@@ -0,0 +1,73 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, text
+
+from app.schemas.task import TaskStatus, TaskPriority, TotalMode
+from app.models.task import Task
+from app.models.task_count import TaskCount
+
+
+# reltuples секции -1, пока она ни разу не анализировалась
+ESTIMATE_STATEMENT = text('''
+SELECT count(*) FILTER (WHERE child.reltuples >= 0),
+       sum(child.reltuples) FILTER (WHERE child.reltuples >= 0)
+FROM pg_inherits
+JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'tasks'::regclass
+''')
+
+
+async def get_counted_total_s(
+        session: AsyncSession,
+        status: TaskStatus | None,
+        priority: TaskPriority | None
+) -> int:
+    '''
+    Возвращает количество задач по счетчикам task_counts
+    '''
+
+    statement = select(func.coalesce(func.sum(TaskCount.count), 0))
+    if status:
+        statement = statement.where(TaskCount.status == status)
+    if priority:
+        statement = statement.where(TaskCount.priority == priority)
+    return max(int((await session.execute(statement)).scalar_one()), 0)
+
+
+async def get_estimated_total_s(session: AsyncSession) -> int | None:
+    '''
+    Возвращает оценку количества строк tasks из статистики планировщика.
+    У секционированной tasks reltuples родителя всегда -1, поэтому
+    суммируются секции. None, если ни одна секция еще не анализировалась
+    '''
+
+    analyzed, reltuples = (await session.execute(ESTIMATE_STATEMENT)).one()
+    if not analyzed:
+        return None
+    return int(reltuples)
+
+
+async def get_tasks_total_s(
+        session: AsyncSession,
+        status: TaskStatus | None,
+        priority: TaskPriority | None,
+        mode: TotalMode
+) -> int:
+    '''
+    Возвращает total для списка задач.
+    estimate работает только без фильтров, с фильтрами используются счетчики
+    '''
+
+    if mode == TotalMode.EXACT:
+        statement = select(func.count(Task.id))
+        if status:
+            statement = statement.where(Task.status == status)
+        if priority:
+            statement = statement.where(Task.priority == priority)
+        return (await session.execute(statement)).scalar_one()
+
+    if mode == TotalMode.ESTIMATE and not status and not priority:
+        estimate = await get_estimated_total_s(session)
+        if estimate is not None:
+            return estimate
+
+    return await get_counted_total_s(session, status, priority)
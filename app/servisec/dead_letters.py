@@ -0,0 +1,105 @@
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
+from aio_pika.abc import AbstractIncomingMessage
+
+from uuid import UUID
+from datetime import datetime
+import json
+
+from app.schemas.task import (DeadLetterResponse, DeadLetterReplayResponse,
+                              TaskStatus)
+from app.models.task import Task
+from app.models.outbox import OutboxMessage
+from app.queue.producer import RabbitMQProducer
+from app.queue.outbox import OutboxRelay
+from app.servisec.cache import invalidate_task_cache
+from app.core.config import logger
+
+
+def _parse_dead_letter(message: AbstractIncomingMessage) -> DeadLetterResponse | None:
+    try:
+        return DeadLetterResponse.model_validate(json.loads(message.body))
+    except ValueError as err:
+        logger.warning(f'Некорректное сообщение в DLQ {message.body}: {err}')
+        return None
+
+
+async def get_dead_letters_s(limit: int) -> list[DeadLetterResponse]:
+    '''
+    Возвращает задачи из DLQ, не удаляя их из очереди
+    '''
+
+    try:
+        async with RabbitMQProducer.fetch_dead_letters(limit) as messages:
+            letters = [_parse_dead_letter(message) for message in messages]
+    except Exception as err:
+        raise HTTPException(status_code=503, detail=f'DLQ недоступна: {err}')
+    return [letter for letter in letters if letter is not None]
+
+
+async def replay_dead_letters_s(
+        session: AsyncSession,
+        task_ids: list[UUID] | None,
+        limit: int
+) -> DeadLetterReplayResponse:
+    '''
+    Возвращает задачи из DLQ в работу: FAILED -> PENDING со сброшенным
+    счетчиком попыток и новым сообщением в outbox, одним коммитом.
+    Сообщения DLQ подтверждаются только после коммита, поэтому при
+    ошибке они остаются в очереди
+    '''
+
+    try:
+        async with RabbitMQProducer.fetch_dead_letters(limit) as messages:
+            selected: dict[UUID, list[AbstractIncomingMessage]] = {}
+            for message in messages:
+                letter = _parse_dead_letter(message)
+                if letter is None:
+                    await message.reject(requeue=False)
+                elif task_ids is None or letter.task_id in task_ids:
+                    selected.setdefault(letter.task_id, []).append(message)
+
+            replayed = []
+            if selected:
+                replayed = (await session.execute(
+                    update(Task)
+                    .where(Task.id.in_(selected), Task.status == TaskStatus.FAILED)
+                    .values(
+                        status=TaskStatus.PENDING,
+                        queued_at=datetime.utcnow(),
+                        attempts=0,
+                        started_at=None,
+                        completed_at=None,
+                        error_info=None
+                    )
+                    .returning(Task.id, Task.priority)
+                )).all()
+                session.add_all(
+                    OutboxMessage(task_id=task_id, priority=priority)
+                    for task_id, priority in replayed
+                )
+                await session.commit()
+
+            for task_messages in selected.values():
+                for message in task_messages:
+                    await message.ack()
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=503, detail=f'DLQ недоступна: {err}')
+
+    replayed_ids = [task_id for task_id, _ in replayed]
+    replayed_set = set(replayed_ids)
+    discarded_ids = [task_id for task_id in selected if task_id not in replayed_set]
+    for task_id in replayed_ids:
+        invalidate_task_cache(task_id)
+        await RabbitMQProducer.publish_task_event(str(task_id), TaskStatus.PENDING)
+    if replayed_ids:
+        OutboxRelay.notify()
+    logger.info(f'Из DLQ повторено задач: {len(replayed_ids)}')
+
+    return DeadLetterReplayResponse(
+        replayed=replayed_ids,
+        discarded=discarded_ids
+    )
@@ -0,0 +1,192 @@
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from typing import AsyncIterator
+from uuid import UUID
+
+import asyncio
+import json
+
+from app.core.config import logger, settings
+from app.models.task import TaskStatus, TERMINAL_STATUSES
+from app.servisec.tasks import get_task_status_s
+
+
+class TaskEventHub:
+    '''
+    Раздает события об изменении статусов подписчикам внутри процесса API.
+    Подписчик - это ограниченная asyncio.Queue, поэтому одно соединение
+    стоит одну очередь и одну корутину
+    '''
+
+    _subscribers: dict[UUID, set[asyncio.Queue]] = {}
+
+    @classmethod
+    def new_queue(cls) -> asyncio.Queue:
+        return asyncio.Queue(maxsize=settings.TASK_EVENTS_QUEUE_SIZE)
+
+    @classmethod
+    def subscribe(cls, task_id: UUID, queue: asyncio.Queue):
+        cls._subscribers.setdefault(task_id, set()).add(queue)
+
+    @classmethod
+    def unsubscribe(cls, task_id: UUID, queue: asyncio.Queue):
+        queues = cls._subscribers.get(task_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del cls._subscribers[task_id]
+
+    @classmethod
+    def publish(cls, task_id: UUID, status: TaskStatus):
+        for queue in cls._subscribers.get(task_id, ()):
+            if queue.full():
+                # Медленный подписчик: важен последний статус, старый можно выбросить
+                queue.get_nowait()
+            queue.put_nowait((task_id, status))
+
+
+def _status_payload(task_id: UUID, status: TaskStatus) -> str:
+    return json.dumps({'id': str(task_id), 'status': status.value})
+
+
+async def stream_task_events_s(
+        task_id: UUID,
+        session: AsyncSession
+) -> AsyncIterator[str]:
+    '''
+    Подписывается на статусы задачи и возвращает поток Server-Sent Events.
+    Первым событием идет текущий статус, поток закрывается
+    после финального статуса
+    '''
+
+    queue = TaskEventHub.new_queue()
+    TaskEventHub.subscribe(task_id, queue)
+    try:
+        current = await get_task_status_s(task_id, session)
+    except HTTPException:
+        TaskEventHub.unsubscribe(task_id, queue)
+        raise
+    # Сессия живет до конца потока, соединение с БД ей больше не нужно
+    await session.commit()
+
+    async def _stream() -> AsyncIterator[str]:
+        try:
+            yield f'event: status\ndata: {_status_payload(task_id, current.status)}\n\n'
+            if current.status in TERMINAL_STATUSES:
+                return
+            while True:
+                try:
+                    _, status = await asyncio.wait_for(
+                        queue.get(),
+                        timeout=settings.TASK_EVENTS_HEARTBEAT
+                    )
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                yield f'event: status\ndata: {_status_payload(task_id, status)}\n\n'
+                if status in TERMINAL_STATUSES:
+                    return
+        finally:
+            TaskEventHub.unsubscribe(task_id, queue)
+
+    return _stream()
+
+
+async def watch_tasks_ws(websocket: WebSocket, session: AsyncSession):
+    '''
+    Обслуживает WebSocket, через который клиент следит за многими задачами.
+    Клиент присылает {"action": "watch" | "unwatch", "task_ids": [...]},
+    сервер присылает {"id": ..., "status": ...} при каждом изменении статуса
+    '''
+
+    queue = TaskEventHub.new_queue()
+    # Задача -> последний отправленный клиенту статус
+    watched: dict[UUID, TaskStatus] = {}
+    # События задач, текущий статус которых еще не отправлен
+    pending: dict[UUID, list[TaskStatus]] = {}
+
+    async def _deliver(task_id: UUID, status: TaskStatus):
+        last = watched.get(task_id)
+        if last is None or status == last:
+            return
+        await websocket.send_json({'id': str(task_id), 'status': status.value})
+        watched[task_id] = status
+        if status in TERMINAL_STATUSES:
+            del watched[task_id]
+            TaskEventHub.unsubscribe(task_id, queue)
+
+    async def _receive():
+        while True:
+            message = await websocket.receive_json()
+            try:
+                action = message['action']
+                task_ids = [UUID(task_id) for task_id in message['task_ids']]
+            except (KeyError, TypeError, ValueError) as err:
+                await websocket.send_json({'error': f'Некорректное сообщение: {err}'})
+                continue
+
+            if action == 'unwatch':
+                for task_id in task_ids:
+                    watched.pop(task_id, None)
+                    TaskEventHub.unsubscribe(task_id, queue)
+                continue
+            if action != 'watch':
+                await websocket.send_json({'error': f'Неизвестное действие {action}'})
+                continue
+            if len(watched) + len(task_ids) > settings.TASK_WS_MAX_WATCH:
+                await websocket.send_json({
+                    'error': f'Можно следить не более чем за {settings.TASK_WS_MAX_WATCH} задачами'
+                })
+                continue
+
+            for task_id in task_ids:
+                if task_id in watched:
+                    continue
+                # Подписка до чтения статуса: события, пришедшие во время
+                # чтения и отправки, копятся и сверяются с отправленным статусом
+                pending[task_id] = []
+                TaskEventHub.subscribe(task_id, queue)
+                try:
+                    current = await get_task_status_s(task_id, session)
+                except HTTPException:
+                    del pending[task_id]
+                    TaskEventHub.unsubscribe(task_id, queue)
+                    await websocket.send_json({'id': str(task_id), 'error': 'Такой задачи нет'})
+                    continue
+                await websocket.send_json({'id': str(task_id), 'status': current.status.value})
+                events = pending.pop(task_id)
+                if current.status in TERMINAL_STATUSES:
+                    TaskEventHub.unsubscribe(task_id, queue)
+                    continue
+                watched[task_id] = current.status
+                for status in events:
+                    await _deliver(task_id, status)
+            # Соединение с БД не держим, пока клиент просто слушает
+            await session.commit()
+
+    async def _send():
+        while True:
+            task_id, status = await queue.get()
+            if task_id in pending:
+                pending[task_id].append(status)
+            else:
+                await _deliver(task_id, status)
+
+    receiver = asyncio.create_task(_receive())
+    sender = asyncio.create_task(_send())
+    try:
+        done, _ = await asyncio.wait(
+            (receiver, sender),
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        for finished in done:
+            error = finished.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.error(f'WebSocket статусов завершился с ошибкой: {error}')
+    finally:
+        receiver.cancel()
+        sender.cancel()
+        for task_id in (*watched, *pending):
+            TaskEventHub.unsubscribe(task_id, queue)
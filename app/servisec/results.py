@@ -0,0 +1,68 @@
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from typing import AsyncIterator, NamedTuple
+from uuid import UUID
+
+import zlib
+
+from app.db.database import SessionLocal
+from app.models.task import Task
+from app.models.task_archive import TaskArchive
+from app.models.task_result import TaskResultChunk
+
+
+class TaskResultStream(NamedTuple):
+    chunks: AsyncIterator[bytes]
+    size: int
+    digest: str | None
+
+
+async def _inline_chunks(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+async def _stored_chunks(digest: str) -> AsyncIterator[bytes]:
+    '''
+    Читает куски результата курсором по два, в памяти не больше
+    двух сжатых кусков и одного распакованного
+    '''
+
+    async with SessionLocal() as session:
+        chunks = await session.stream_scalars(
+            select(TaskResultChunk.data)
+            .where(TaskResultChunk.digest == digest)
+            .order_by(TaskResultChunk.seq)
+            .execution_options(yield_per=2)
+        )
+        async for chunk in chunks:
+            yield zlib.decompress(chunk)
+
+
+async def get_task_result_s(task_id: UUID, session: AsyncSession) -> TaskResultStream:
+    '''
+    Возвращает результат задачи потоком байтов. Результат из строки
+    задачи отдается одним куском, из task_results - по кускам
+    '''
+
+    row = None
+    for model in (Task, TaskArchive):
+        row = (await session.execute(
+            select(model.result, model.result_ref, model.result_size)
+            .where(model.id == task_id)
+        )).one_or_none()
+        if row is not None:
+            break
+    # Сессия живет до конца потока, соединение с БД ей больше не нужно
+    await session.commit()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail='Такой задачи нет')
+    result, result_ref, result_size = row
+    if result_ref is not None:
+        return TaskResultStream(_stored_chunks(result_ref), result_size, result_ref)
+    if result is None:
+        raise HTTPException(status_code=404, detail='У задачи нет результата')
+    data = result.encode()
+    return TaskResultStream(_inline_chunks(data), len(data), None)
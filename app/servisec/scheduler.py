@@ -0,0 +1,217 @@
+from sqlalchemy import select, insert, text
+
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+import asyncio
+import heapq
+
+from app.core.config import logger, settings
+from app.core.cron import CronExpression
+from app.db.database import SessionLocal
+from app.models.task import Task, TaskStatus
+from app.models.task_schedule import TaskSchedule
+from app.queue.producer import RabbitMQProducer
+from app.queue.outbox import OutboxRelay
+from app.servisec.cache import invalidate_task_cache
+
+# Запуск - условный переход NEW -> PENDING вместе с записью в outbox,
+# задачу, которую отменили или уже запустил другой процесс, он пропускает
+RELEASE_STATEMENT = text('''
+WITH released AS (
+    UPDATE tasks
+    SET status = 'PENDING', queued_at = now() AT TIME ZONE 'utc'
+    WHERE id = ANY(CAST(:ids AS uuid[]))
+        AND status = 'NEW' AND run_at IS NOT NULL AND pending_parents = 0
+    RETURNING id, priority
+)
+INSERT INTO task_outbox (task_id, priority, attempts, created_at)
+SELECT id, priority, 0, now() AT TIME ZONE 'utc' FROM released
+RETURNING task_id
+''')
+
+
+class TaskScheduler:
+    '''
+    Запускает отложенные задачи в срок. В памяти держится куча (run_at, id)
+    только для задач, до запуска которых меньше SCHEDULER_LOOKAHEAD секунд.
+    Куча перечитывается раз в SCHEDULER_REFRESH_INTERVAL по частичному
+    индексу ix_tasks_run_at, поэтому миллион задач на будущее не грузится
+    в память и не опрашивается. Таймер один: цикл спит до ближайшего run_at.
+    Наступившие задачи уходят в outbox пачками по SCHEDULER_BATCH_SIZE,
+    их публикует OutboxRelay через RabbitMQProducer
+    '''
+
+    _heap: list[tuple[datetime, UUID]] = []
+    _loaded_until: datetime = datetime.min
+    _task: asyncio.Task | None = None
+    _wakeup: asyncio.Event | None = None
+
+    @classmethod
+    async def start(cls):
+        if cls._task is None:
+            cls._wakeup = asyncio.Event()
+            cls._task = asyncio.create_task(cls._run())
+            logger.info('Планировщик отложенных задач запущен')
+
+    @classmethod
+    async def stop(cls):
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
+            cls._wakeup = None
+            cls._heap = []
+            cls._loaded_until = datetime.min
+            logger.info('Планировщик отложенных задач остановлен')
+
+    @classmethod
+    def schedule(cls, task_id: UUID, run_at: datetime):
+        '''
+        Добавляет созданную задачу в кучу, если ее run_at попадает
+        в уже загруженное окно. Остальные подхватит перечитывание
+        '''
+
+        if (cls._task is None or run_at > cls._loaded_until
+                or len(cls._heap) >= settings.SCHEDULER_HEAP_SIZE):
+            return
+        heapq.heappush(cls._heap, (run_at, task_id))
+        cls._wakeup.set()
+
+    @classmethod
+    async def materialize_schedules(cls, horizon: datetime) -> int:
+        '''
+        Создает задачи из расписаний, срабатывающих до horizon.
+        Пропущенные, пока API не работал, срабатывания сливаются в одно.
+        Расписания блокируются через SKIP LOCKED, поэтому несколько
+        процессов API не создадут одну задачу дважды
+        '''
+
+        now = datetime.utcnow()
+        rows = []
+        async with SessionLocal() as session:
+            schedules = (await session.execute(
+                select(TaskSchedule)
+                .where(TaskSchedule.enabled, TaskSchedule.next_run_at <= horizon)
+                .order_by(TaskSchedule.next_run_at)
+                .limit(settings.SCHEDULER_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+            for schedule in schedules:
+                cron = CronExpression(schedule.cron)
+                occurrences = [schedule.next_run_at]
+                run_at = cron.next_after(max(schedule.next_run_at, now))
+                while run_at <= horizon:
+                    occurrences.append(run_at)
+                    run_at = cron.next_after(run_at)
+                schedule.next_run_at = run_at
+                schedule.last_run_at = occurrences[-1]
+                rows.extend(
+                    {
+                        'id': uuid4(),
+                        'title': schedule.title,
+                        'description': schedule.description,
+                        'type': schedule.type,
+                        'payload': schedule.payload,
+                        'priority': schedule.priority,
+                        'status': TaskStatus.NEW,
+                        'created_at': now,
+                        'run_at': occurrence
+                    }
+                    for occurrence in occurrences
+                )
+            if rows:
+                await session.execute(insert(Task), rows)
+            await session.commit()
+        if rows:
+            logger.info(f'По расписаниям создано задач: {len(rows)}')
+        return len(rows)
+
+    @classmethod
+    async def refresh(cls):
+        '''
+        Перечитывает кучу: задачи NEW с run_at до конца окна
+        '''
+
+        horizon = datetime.utcnow() + timedelta(seconds=settings.SCHEDULER_LOOKAHEAD)
+        await cls.materialize_schedules(horizon)
+        async with SessionLocal() as session:
+            rows = [tuple(row) for row in (await session.execute(
+                select(Task.run_at, Task.id)
+                .where(
+                    Task.status == TaskStatus.NEW,
+                    Task.run_at.is_not(None),
+                    Task.run_at <= horizon,
+                    Task.pending_parents == 0
+                )
+                .order_by(Task.run_at)
+                .limit(settings.SCHEDULER_HEAP_SIZE)
+            )).all()]
+        # Окно урезается, если в кучу поместились не все задачи
+        loaded_until = horizon if len(rows) < settings.SCHEDULER_HEAP_SIZE else rows[-1][0]
+        # Задачи, добавленные через schedule() во время чтения, не теряются
+        loaded = {task_id for _, task_id in rows}
+        rows.extend(item for item in cls._heap
+                    if item[1] not in loaded and item[0] <= loaded_until)
+        heapq.heapify(rows)
+        cls._heap, cls._loaded_until = rows, loaded_until
+
+    @classmethod
+    async def release_due(cls) -> int:
+        '''
+        Запускает одну пачку наступивших задач.
+        Возвращает количество задач, взятых из кучи
+        '''
+
+        now = datetime.utcnow()
+        due = []
+        while (cls._heap and cls._heap[0][0] <= now
+               and len(due) < settings.SCHEDULER_BATCH_SIZE):
+            due.append(heapq.heappop(cls._heap)[1])
+        if not due:
+            return 0
+
+        # При ошибке задачи остаются NEW и вернутся в кучу при перечитывании
+        async with SessionLocal() as session:
+            released = (await session.execute(RELEASE_STATEMENT, {'ids': due})).scalars().all()
+            await session.commit()
+
+        for task_id in released:
+            invalidate_task_cache(task_id)
+            await RabbitMQProducer.publish_task_event(str(task_id), TaskStatus.PENDING)
+        if released:
+            OutboxRelay.notify()
+            logger.info(f'Запущено отложенных задач: {len(released)}')
+        return len(due)
+
+    @classmethod
+    def _seconds_until_due(cls) -> float | None:
+        if not cls._heap:
+            return None
+        return (cls._heap[0][0] - datetime.utcnow()).total_seconds()
+
+    @classmethod
+    async def _run(cls):
+        next_refresh = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            cls._wakeup.clear()
+            try:
+                if loop.time() >= next_refresh:
+                    await cls.refresh()
+                    next_refresh = loop.time() + settings.SCHEDULER_REFRESH_INTERVAL
+                if await cls.release_due():
+                    continue
+            except Exception as err:
+                logger.error(f'Планировщик: ошибка: {err}')
+                await asyncio.sleep(settings.OUTBOX_RETRY_DELAY)
+                continue
+
+            timeout = next_refresh - loop.time()
+            until_due = cls._seconds_until_due()
+            if until_due is not None:
+                timeout = min(timeout, until_due)
+            try:
+                await asyncio.wait_for(cls._wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
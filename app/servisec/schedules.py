@@ -0,0 +1,76 @@
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+
+from uuid import UUID, uuid4
+from datetime import datetime
+
+from app.core.cron import CronExpression
+from app.models.task_schedule import TaskSchedule
+from app.schemas.schedule import TaskScheduleCreate, TaskScheduleResponse
+from app.servisec_worker.handlers import is_registered
+from app.core.config import logger
+
+
+async def create_schedule_s(
+        schedule_in: TaskScheduleCreate,
+        session: AsyncSession
+) -> TaskScheduleResponse:
+    '''
+    Создает расписание. Задачи из него создает TaskScheduler
+    незадолго до каждого срабатывания
+    '''
+
+    if not is_registered(schedule_in.type):
+        raise HTTPException(
+            status_code=422,
+            detail=f'Неизвестный тип задачи: {schedule_in.type}'
+        )
+    now = datetime.utcnow()
+    schedule = TaskSchedule(
+        id=uuid4(),
+        title=schedule_in.title,
+        description=schedule_in.description,
+        priority=schedule_in.priority,
+        type=schedule_in.type,
+        payload=schedule_in.payload,
+        cron=schedule_in.cron,
+        enabled=True,
+        created_at=now,
+        next_run_at=CronExpression(schedule_in.cron).next_after(now)
+    )
+    session.add(schedule)
+    schedule_response = TaskScheduleResponse.model_validate(schedule)
+    await session.commit()
+
+    logger.info(f'Создано расписание {schedule.id} ({schedule.cron}), '
+                f'первый запуск {schedule.next_run_at}')
+    return schedule_response
+
+
+async def get_schedules_s(session: AsyncSession) -> list[TaskScheduleResponse]:
+    '''
+    Возвращает все расписания
+    '''
+
+    schedules = (await session.execute(
+        select(TaskSchedule).order_by(TaskSchedule.created_at)
+    )).scalars().all()
+    return [TaskScheduleResponse.model_validate(schedule) for schedule in schedules]
+
+
+async def delete_schedule_s(schedule_id: UUID, session: AsyncSession) -> None:
+    '''
+    Удаляет расписание. Уже созданные из него задачи остаются,
+    их можно отменить как обычные
+    '''
+
+    deleted = (await session.execute(
+        delete(TaskSchedule)
+        .where(TaskSchedule.id == schedule_id)
+        .returning(TaskSchedule.id)
+    )).scalar_one_or_none()
+    if deleted is None:
+        raise HTTPException(status_code=404, detail='Такого расписания нет')
+    await session.commit()
+    logger.info(f'Расписание {schedule_id} удалено')
@@ -1,56 +1,383 @@
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, desc, insert, update, tuple_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import RowMapping
 
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime
+import base64
+import hashlib
+import json
 
 from app.schemas.task import (TaskCreate, TaskResponse, TaskStatus,
-                              TaskPriority, PaginatedTasksResponse, TaskStatusResponse)
+                              TaskPriority, PaginatedTasksResponse, TaskStatusResponse,
+                              TaskBatchResponse, TaskBatchItemResponse, TotalMode,
+                              TaskField, TaskListItem, get_result_url)
 from app.models.task import Task
+from app.models.task_archive import TaskArchive
+from app.models.outbox import OutboxMessage
+from app.models.task_dependency import TaskDependency
+from app.models.task_idempotency_key import TaskIdempotencyKey
 from app.queue.producer import RabbitMQProducer
-from app.core.config import logger
+from app.queue.outbox import OutboxRelay
+from app.servisec.counts import get_tasks_total_s
+from app.servisec.cache import (task_cache, task_status_cache, idempotency_cache,
+                                invalidate_task_cache)
+from app.servisec.scheduler import TaskScheduler
+from app.servisec.admission import admit_tasks_s
+from app.servisec_worker.handlers import is_registered
+from app.servisec_worker.dependencies import fail_descendants
+
+
+TASK_FIELDS = [field.value for field in TaskField]
+
+
+def _check_task_types(tasks_in: list[TaskCreate]):
+    unknown = sorted({task_in.type for task_in in tasks_in
+                      if not is_registered(task_in.type)})
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f'Неизвестный тип задачи: {", ".join(unknown)}'
+        )
+
+
+async def _lock_parents(session: AsyncSession, parent_ids: set[UUID]) -> set[UUID]:
+    '''
+    Блокирует зависимости FOR SHARE до коммита, чтобы worker не завершил
+    их между проверкой и записью ребер. Возвращает еще не завершенные
+    '''
+
+    if not parent_ids:
+        return set()
+    statuses = dict((await session.execute(
+        select(Task.id, Task.status)
+        .where(Task.id.in_(parent_ids))
+        .order_by(Task.id)
+        .with_for_update(read=True)
+    )).all())
+    if len(statuses) < len(parent_ids):
+        statuses.update((await session.execute(
+            select(TaskArchive.id, TaskArchive.status)
+            .where(TaskArchive.id.in_(parent_ids - statuses.keys()))
+        )).all())
+
+    missing = sorted(str(task_id) for task_id in parent_ids - statuses.keys())
+    if missing:
+        raise HTTPException(
+            status_code=422,
+            detail=f'Нет задач из depends_on: {", ".join(missing)}'
+        )
+    failed = sorted(str(task_id) for task_id, status in statuses.items()
+                    if status in (TaskStatus.FAILED, TaskStatus.CANCELLED))
+    if failed:
+        raise HTTPException(
+            status_code=422,
+            detail=f'Задачи из depends_on завершились неуспешно: {", ".join(failed)}'
+        )
+    return {task_id for task_id, status in statuses.items()
+            if status != TaskStatus.COMPLETED}
+
+
+def _fingerprint(task_in: TaskCreate) -> str:
+    return hashlib.sha256(
+        task_in.model_dump_json(exclude={'dedup_key'}).encode()
+    ).hexdigest()
+
+
+def _check_fingerprint(key: str, fingerprint: str, expected: str):
+    if fingerprint != expected:
+        raise HTTPException(
+            status_code=422,
+            detail=f'Ключ идемпотентности {key!r} уже использован для другой задачи'
+        )
+
+
+async def _find_idempotency_keys(
+        session: AsyncSession,
+        fingerprints: dict[str, str]
+) -> dict[str, tuple[UUID, TaskStatus | None]]:
+    '''
+    Возвращает исходные задачи и их статусы для уже занятых ключей.
+    Ключ, занятый запросом с другим телом, - ошибка 422
+    '''
+
+    if not fingerprints:
+        return {}
+    rows = (await session.execute(
+        select(TaskIdempotencyKey.key, TaskIdempotencyKey.task_id,
+               TaskIdempotencyKey.fingerprint,
+               func.coalesce(Task.status, TaskArchive.status))
+        .outerjoin(Task, Task.id == TaskIdempotencyKey.task_id)
+        .outerjoin(TaskArchive, TaskArchive.id == TaskIdempotencyKey.task_id)
+        .where(TaskIdempotencyKey.key.in_(fingerprints))
+    )).all()
+    for key, _, fingerprint, _ in rows:
+        _check_fingerprint(key, fingerprint, fingerprints[key])
+    return {key: (task_id, status) for key, task_id, _, status in rows}
+
+
+async def _replay_task(
+        session: AsyncSession,
+        key: str,
+        fingerprint: str,
+        task_id: UUID
+) -> TaskResponse:
+    # Черновик новой задачи и блокировки depends_on не нужны
+    await session.rollback()
+    idempotency_cache.set(key, (fingerprint, task_id))
+    return await get_task_s(task_id, session)
+
+
+async def _claim_idempotency_keys(
+        session: AsyncSession,
+        claims: dict[str, tuple[UUID, str]],
+        created_at: datetime
+) -> dict[str, tuple[UUID, TaskStatus | None]]:
+    '''
+    Записывает ключи идемпотентности в транзакции создания задач.
+    claims - ключ -> (id новой задачи, fingerprint). Занятый ключ
+    не перезаписывается, для него возвращается исходная задача и ее статус.
+    Параллельный запрос с тем же ключом ждет на первичном ключе,
+    пока первый не завершит транзакцию
+    '''
+
+    if not claims:
+        return {}
+    # Ключи пишутся в одном порядке, чтобы пачки не блокировали друг друга
+    claimed = set((await session.execute(
+        pg_insert(TaskIdempotencyKey)
+        .values([
+            {'key': key, 'task_id': task_id, 'fingerprint': fingerprint,
+             'created_at': created_at}
+            for key, (task_id, fingerprint) in sorted(claims.items())
+        ])
+        .on_conflict_do_nothing()
+        .returning(TaskIdempotencyKey.key)
+    )).scalars())
+    return await _find_idempotency_keys(session, {
+        key: fingerprint for key, (_, fingerprint) in claims.items() if key not in claimed
+    })
 
 
 async def create_task_s(
         task_in: TaskCreate,
-        session: AsyncSession
+        session: AsyncSession,
+        client_id: str,
+        idempotency_key: str | None = None
 ) -> TaskResponse:
     '''
-    Создает новую задачу и отправляет на обработку
+    Создает новую задачу и отправляет на обработку.
+    Задача и сообщение в outbox пишутся одним коммитом,
+    в RabbitMQ сообщение публикует OutboxRelay.
+    Задача с run_at в будущем остается NEW, ее запустит TaskScheduler.
+    Задача с незавершенными depends_on остается NEW, ее запустит worker,
+    который завершит последнюю зависимость.
+    Повтор с тем же ключом идемпотентности возвращает исходную задачу:
+    из кэша процесса, а при промахе - из БД, ничего не создавая
+    и не расходуя лимит клиента
     '''
+
+    key = idempotency_key or task_in.dedup_key
+    if idempotency_key and task_in.dedup_key and idempotency_key != task_in.dedup_key:
+        raise HTTPException(
+            status_code=422,
+            detail='Заголовок Idempotency-Key не совпадает с dedup_key'
+        )
+    if key:
+        fingerprint = _fingerprint(task_in)
+        cached = idempotency_cache.get(key)
+        if cached is not None:
+            _check_fingerprint(key, fingerprint, cached[0])
+            return await get_task_s(cached[1], session)
+        replayed = await _find_idempotency_keys(session, {key: fingerprint})
+        if replayed:
+            return await _replay_task(session, key, fingerprint, replayed[key][0])
+
+    admit_tasks_s(client_id, [task_in])
+    _check_task_types([task_in])
+    parent_ids = set(task_in.depends_on or ())
+    pending = await _lock_parents(session, parent_ids)
+    created_at = datetime.utcnow()
+    scheduled = task_in.run_at is not None and task_in.run_at > created_at
     database_task = Task(
+        id=uuid4(),
         title=task_in.title,
         description=task_in.description,
         priority=task_in.priority,
-        status=TaskStatus.NEW
+        type=task_in.type,
+        payload=task_in.payload,
+        status=TaskStatus.NEW if scheduled or pending else TaskStatus.PENDING,
+        created_at=created_at,
+        run_at=task_in.run_at,
+        queued_at=None if scheduled or pending else created_at,
+        attempts=0,
+        pending_parents=len(pending)
     )
-
+    if key:
+        replayed = await _claim_idempotency_keys(
+            session, {key: (database_task.id, fingerprint)}, created_at
+        )
+        if replayed:
+            return await _replay_task(session, key, fingerprint, replayed[key][0])
     session.add(database_task)
+    session.add_all(
+        TaskDependency(parent_id=parent_id, child_id=database_task.id)
+        for parent_id in parent_ids
+    )
+    if not scheduled and not pending:
+        session.add(OutboxMessage(task_id=database_task.id, priority=database_task.priority))
+    task_response = TaskResponse.model_validate(database_task)
     await session.commit()
-    await session.refresh(database_task)
+    if key:
+        idempotency_cache.set(key, (fingerprint, database_task.id))
 
-    try:
-        await RabbitMQProducer.publish_task_message(
-            str(database_task.id),
-            database_task.priority
+    if pending:
+        return task_response
+    if scheduled:
+        TaskScheduler.schedule(database_task.id, database_task.run_at)
+    else:
+        OutboxRelay.notify()
+    return task_response
+
+
+async def create_tasks_batch_s(
+        tasks_in: list[TaskCreate],
+        session: AsyncSession,
+        client_id: str
+) -> TaskBatchResponse:
+    '''
+    Создает пачку задач одним INSERT вместе с сообщениями в outbox,
+    в RabbitMQ их пачками публикует OutboxRelay.
+    Задачи с run_at в будущем или незавершенными depends_on
+    остаются NEW. Задачи, чей dedup_key уже занят,
+    не создаются и не расходуют лимит клиента: в ответе возвращаются исходные
+    '''
+
+    _check_task_types(tasks_in)
+    fingerprints = {task_in.dedup_key: _fingerprint(task_in)
+                    for task_in in tasks_in if task_in.dedup_key}
+    if len(fingerprints) < sum(1 for task_in in tasks_in if task_in.dedup_key):
+        raise HTTPException(status_code=422, detail='dedup_key повторяется в пачке')
+    known = await _find_idempotency_keys(session, fingerprints)
+    admit_tasks_s(client_id, [
+        task_in for task_in in tasks_in if task_in.dedup_key not in known
+    ])
+    pending = await _lock_parents(session, {
+        parent_id for task_in in tasks_in for parent_id in task_in.depends_on or ()
+    })
+    created_at = datetime.utcnow()
+    ids = [uuid4() for _ in tasks_in]
+    # Ключ, занятый параллельным запросом после проверки, находит вставка
+    replayed = known | await _claim_idempotency_keys(session, {
+        task_in.dedup_key: (task_id, fingerprints[task_in.dedup_key])
+        for task_id, task_in in zip(ids, tasks_in)
+        if task_in.dedup_key and task_in.dedup_key not in known
+    }, created_at)
+    new = [(index, task_id, task_in)
+           for index, (task_id, task_in) in enumerate(zip(ids, tasks_in))
+           if task_in.dedup_key not in replayed]
+    rows = []
+    for _, task_id, task_in in new:
+        pending_parents = len(pending.intersection(task_in.depends_on or ()))
+        runnable = pending_parents == 0 and (
+            task_in.run_at is None or task_in.run_at <= created_at
         )
-        database_task.status = TaskStatus.PENDING
-        await session.commit()
-        await session.refresh(database_task)
+        rows.append({
+            'id': task_id,
+            'title': task_in.title,
+            'description': task_in.description,
+            'priority': task_in.priority,
+            'type': task_in.type,
+            'payload': task_in.payload,
+            'status': TaskStatus.PENDING if runnable else TaskStatus.NEW,
+            'created_at': created_at,
+            'run_at': task_in.run_at,
+            'queued_at': created_at if runnable else None,
+            'pending_parents': pending_parents
+        })
+    if rows:
+        await session.execute(insert(Task), rows)
+    edges = [
+        {'parent_id': parent_id, 'child_id': task_id}
+        for _, task_id, task_in in new
+        for parent_id in set(task_in.depends_on or ())
+    ]
+    if edges:
+        await session.execute(insert(TaskDependency), edges)
+    queued = [row for row in rows if row['status'] == TaskStatus.PENDING]
+    if queued:
+        await session.execute(insert(OutboxMessage), [
+            {'task_id': row['id'], 'priority': row['priority'], 'attempts': 0,
+             'created_at': created_at}
+            for row in queued
+        ])
+    await session.commit()
 
-    except Exception as err:
-        logger.error('Не удалось опубликовать задачу '
-                     f'{database_task.id} в RabbitMQ: {err}')
-        database_task.status = TaskStatus.FAILED
-        database_task.error_info = f'Не удалось поставить задачу в очередь: {err}'
-        await session.commit()
-        await session.refresh(database_task)
+    if queued:
+        OutboxRelay.notify()
+    for row in rows:
+        if row['status'] == TaskStatus.NEW and row['pending_parents'] == 0:
+            TaskScheduler.schedule(row['id'], row['run_at'])
+
+    items = [
+        TaskBatchItemResponse(index=index, id=row['id'], status=row['status'])
+        for (index, _, _), row in zip(new, rows)
+    ]
+    items.extend(
+        TaskBatchItemResponse(
+            index=index,
+            id=replayed[task_in.dedup_key][0],
+            status=replayed[task_in.dedup_key][1],
+            deduplicated=True
+        )
+        for index, task_in in enumerate(tasks_in) if task_in.dedup_key in replayed
+    )
+    items.sort(key=lambda item: item.index)
+    return TaskBatchResponse(
+        total=len(items),
+        queued=len(queued),
+        failed=0,
+        scheduled=len(rows) - len(queued),
+        deduplicated=len(replayed),
+        items=items
+    )
+
+
+def _encode_cursor(created_at: datetime, task_id: UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(task_id)]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, task_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(task_id)
+    except (ValueError, TypeError) as err:
+        raise HTTPException(status_code=400, detail=f'Некорректный cursor: {err}')
+
+
+def _parse_fields(fields: str | None) -> list[str]:
+    if not fields:
+        return TASK_FIELDS
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(TASK_FIELDS))
+    if unknown:
         raise HTTPException(
-            status_code=500,
-            detail=f'Не удалось поставить задачу в очередь {err}'
+            status_code=422,
+            detail=f'Неизвестные поля: {", ".join(unknown)}'
         )
-    return database_task
+    return list(dict.fromkeys(names))
+
+
+def _task_list_item(row: RowMapping, fields: list[str]) -> TaskListItem:
+    # Значения из БД уже нужных типов, валидация строки не нужна
+    item = {name: row[name] for name in fields}
+    if 'result_size' in item:
+        item['result_url'] = get_result_url(row['id'], row['result_size'])
+    return TaskListItem.model_construct(**item)
 
 
 async def get_tasks_s(
@@ -58,79 +385,138 @@ async def get_tasks_s(
         status: TaskStatus,
         priority: TaskPriority,
         page: int,
-        page_size: int
+        page_size: int,
+        cursor: str | None = None,
+        total: TotalMode = TotalMode.COUNTED,
+        fields: str | None = None
 ) -> PaginatedTasksResponse:
     '''
-    Возвращает список задач с учетом заданных фильтров
+    Возвращает список задач с учетом заданных фильтров.
+    Если передан cursor, страница выбирается по ключу (created_at, id)
+    без OFFSET, и ее стоимость не зависит от глубины.
+    total берется из счетчиков task_counts, а не из COUNT(*).
+    Выбираются только колонки из fields (через запятую, по умолчанию все),
+    строки идут в ответ без ORM-объектов
     '''
 
-    statement = select(Task)
-    count_statement = select(func.count(Task.id))
+    field_names = _parse_fields(fields)
+    # created_at и id нужны для курсора, даже если их не просили
+    columns = list(dict.fromkeys([*field_names, 'created_at', 'id']))
+    statement = select(*(getattr(Task, name) for name in columns))
 
     if status:
         statement = statement.where(Task.status == status)
-        count_statement = count_statement.where(Task.status == status)
     if priority:
         statement = statement.where(Task.priority == priority)
-        count_statement = count_statement.where(Task.priority == priority)
 
-    statement = (statement.order_by(desc(Task.created_at))
-                 .offset((page - 1) * page_size)
-                 .limit(page_size)
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(Task.created_at, Task.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    else:
+        statement = statement.offset((page - 1) * page_size)
+
+    statement = (statement.order_by(desc(Task.created_at), desc(Task.id))
+                 .limit(page_size + 1)
                  )
-    tasks = (await session.execute(statement)).scalars().all()
-    total_tasks = (await session.execute(count_statement)).scalar_one()
+    rows = (await session.execute(statement)).all()
+    total_tasks = await get_tasks_total_s(session, status, priority, total)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
 
     return PaginatedTasksResponse(
         total=total_tasks,
         page=page,
         page_size=page_size,
-        items=[TaskResponse.model_validate(task) for task in tasks]
+        next_cursor=next_cursor,
+        items=[_task_list_item(row._mapping, field_names) for row in rows]
     )
 
 
 async def get_task_s(task_id: UUID, session: AsyncSession) -> TaskResponse:
     '''
-    Возвращает информацию о конкретной задаче
+    Возвращает информацию о конкретной задаче.
+    Если в tasks ее нет, ищет в архиве
     '''
 
-    task = await session.execute(select(Task).where(Task.id == task_id))
-    task = task.scalar_one_or_none()
+    cached = task_cache.get(task_id)
+    if cached is not None:
+        return cached
+    token = task_cache.token()
+
+    task = None
+    for model in (Task, TaskArchive):
+        task = (await session.execute(
+            select(*(getattr(model, name) for name in TASK_FIELDS))
+            .where(model.id == task_id)
+        )).one_or_none()
+        if task is not None:
+            break
 
     if task is None:
         raise HTTPException(status_code=404, detail='Такой задачи нет')
 
-    return task
+    task_response = TaskResponse.model_validate(task._mapping)
+    task_cache.set(task_id, task_response, token)
+    return task_response
 
 
 async def cancel_task_s(task_id: UUID, session: AsyncSession) -> None:
     '''
-    Удаляет задачу, если она находится в статусе NEW или PENDING
+    Отменяет задачу в статусе NEW, PENDING или IN_PROGRESS.
+    Проверка статуса и отмена - один условный UPDATE, поэтому отмена
+    не может разойтись с захватом задачи workerом. Worker, который
+    выполняет задачу, получает сигнал и прерывает ее
     '''
 
-    task = await session.execute(select(Task).where(Task.id == task_id))
-    task = task.scalar_one_or_none()
+    now = datetime.utcnow()
+    cancelled = (await session.execute(
+        update(Task)
+        .where(
+            Task.id == task_id,
+            Task.status.in_((TaskStatus.NEW, TaskStatus.PENDING, TaskStatus.IN_PROGRESS))
+        )
+        .values(
+            status=TaskStatus.CANCELLED,
+            completed_at=now,
+            error_info='Задание было отменено пользователем'
+        )
+        .returning(Task.id)
+    )).scalar_one_or_none()
 
-    if task is None:
+    if cancelled is not None:
+        # Ожидающие потомки отмененной задачи уже не запустятся
+        blocked = await fail_descendants(session, [task_id], TaskStatus.CANCELLED, now)
+        await session.commit()
+        invalidate_task_cache(task_id)
+        await RabbitMQProducer.publish_task_cancel(str(task_id))
+        await RabbitMQProducer.publish_task_event(str(task_id), TaskStatus.CANCELLED)
+        for child_id in blocked:
+            invalidate_task_cache(child_id)
+            await RabbitMQProducer.publish_task_event(str(child_id), TaskStatus.CANCELLED)
+        return
+
+    task_status = (await session.execute(
+        select(Task.status).where(Task.id == task_id)
+    )).scalar_one_or_none()
+    if task_status is None:
+        task_status = (await session.execute(
+            select(TaskArchive.status).where(TaskArchive.id == task_id)
+        )).scalar_one_or_none()
+
+    if task_status is None:
         raise HTTPException(status_code=404, detail='Такой задачи нет')
 
-    if task.status in (TaskStatus.NEW, TaskStatus.PENDING):
-        task.status = TaskStatus.CANCELLED
-        task.completed_at = datetime.utcnow()
-        task.error_info = 'Задание было отменено пользователем'
-        await session.commit()
-    elif task.status == TaskStatus.IN_PROGRESS:
-        raise HTTPException(
-            status_code=400,
-            detail='Задача в данный момент выполняется и не может быть отменена'
-        )
-    else:
-        raise HTTPException(
-            status_code=400,
-            detail=(
-                f'Задача со статусом {task.status.value} не может быть отменена'
-            )
+    raise HTTPException(
+        status_code=400,
+        detail=(
+            f'Задача со статусом {task_status.value} не может быть отменена'
         )
+    )
 
 
 async def get_task_status_s(
@@ -141,10 +527,23 @@ async def get_task_status_s(
     Возвращает текущий статус задачи по ID 
     '''
 
-    task = await session.execute(select(Task).where(Task.id == task_id))
-    task = task.scalar_one_or_none()
+    cached = task_status_cache.get(task_id)
+    if cached is not None:
+        return cached
+    token = task_status_cache.token()
+
+    task = await session.execute(
+        select(Task.id, Task.status).where(Task.id == task_id)
+    )
+    task = task.one_or_none()
+    if task is None:
+        task = (await session.execute(
+            select(TaskArchive.id, TaskArchive.status).where(TaskArchive.id == task_id)
+        )).one_or_none()
 
     if task is None:
         raise HTTPException(status_code=404, detail='Такой задачи нет')
 
-    return task
+    status_response = TaskStatusResponse.model_validate(task._mapping)
+    task_status_cache.set(task_id, status_response, token)
+    return status_response
@@ -0,0 +1,93 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from datetime import datetime
+from uuid import UUID
+
+from app.models.task import TaskStatus
+
+# Каждый завершенный parent уменьшает pending_parents своих child.
+# Child, у которых счетчик дошел до нуля, переходят в PENDING и получают
+# сообщение в outbox. Child с run_at в будущем остаются NEW для TaskScheduler.
+# Работа пропорциональна числу ребер завершенных задач
+RELEASE_CHILDREN_STATEMENT = text('''
+WITH counts AS (
+    SELECT child_id, count(*) AS n
+    FROM task_dependencies
+    WHERE parent_id = ANY(CAST(:ids AS uuid[]))
+    GROUP BY child_id
+), updated AS (
+    UPDATE tasks AS t
+    SET pending_parents = t.pending_parents - c.n,
+        status = CASE
+            WHEN t.pending_parents - c.n <= 0 AND (t.run_at IS NULL OR t.run_at <= :now)
+            THEN CAST('PENDING' AS task_status)
+            ELSE t.status
+        END,
+        queued_at = CASE
+            WHEN t.pending_parents - c.n <= 0 AND (t.run_at IS NULL OR t.run_at <= :now)
+            THEN :now
+            ELSE t.queued_at
+        END
+    FROM counts AS c
+    WHERE t.id = c.child_id AND t.status = 'NEW'
+    RETURNING t.id, t.priority, t.status
+)
+INSERT INTO task_outbox (task_id, priority, attempts, created_at)
+SELECT id, priority, 0, :now FROM updated WHERE status = 'PENDING'
+RETURNING task_id
+''')
+
+# Потомки неуспешной задачи никогда не запустятся, они завершаются сразу
+FAIL_DESCENDANTS_STATEMENT = text('''
+WITH RECURSIVE descendants AS (
+    SELECT child_id FROM task_dependencies WHERE parent_id = ANY(CAST(:ids AS uuid[]))
+    UNION
+    SELECT d.child_id
+    FROM task_dependencies AS d
+    JOIN descendants ON d.parent_id = descendants.child_id
+)
+UPDATE tasks
+SET status = CAST(:status AS task_status), completed_at = :now, error_info = :error_info
+WHERE id IN (SELECT child_id FROM descendants) AND status = 'NEW'
+RETURNING id
+''')
+
+
+async def release_children(
+        session: AsyncSession,
+        parent_ids: list[UUID],
+        now: datetime
+) -> list[UUID]:
+    '''
+    Учитывает завершение parent_ids и возвращает child, ставшие PENDING.
+    Вызывается в транзакции, которая записала COMPLETED
+    '''
+
+    if not parent_ids:
+        return []
+    return list((await session.execute(RELEASE_CHILDREN_STATEMENT, {
+        'ids': parent_ids,
+        'now': now
+    })).scalars())
+
+
+async def fail_descendants(
+        session: AsyncSession,
+        parent_ids: list[UUID],
+        status: TaskStatus,
+        now: datetime
+) -> list[UUID]:
+    '''
+    Завершает всех ожидающих потомков parent_ids со статусом status
+    и возвращает их id
+    '''
+
+    if not parent_ids:
+        return []
+    return list((await session.execute(FAIL_DESCENDANTS_STATEMENT, {
+        'ids': parent_ids,
+        'status': status.value,
+        'now': now,
+        'error_info': 'Не выполнена задача, от которой зависит эта'
+    })).scalars())
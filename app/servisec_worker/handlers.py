@@ -0,0 +1,91 @@
+from enum import Enum
+from typing import Any, Callable
+
+import asyncio
+import hashlib
+import random
+
+from app.core.config import logger
+
+DEFAULT_TASK_TYPE = 'default'
+
+
+class HandlerKind(str, Enum):
+    ASYNC = 'async'        # корутина, выполняется в цикле событий
+    THREAD = 'thread'      # блокирующий ввод-вывод, пул потоков
+    PROCESS = 'process'    # CPU-bound, пул процессов
+
+
+_handlers: dict[str, tuple[Callable[..., Any], HandlerKind]] = {}
+
+
+def task_handler(task_type: str, kind: HandlerKind = HandlerKind.ASYNC):
+    '''
+    Регистрирует обработчик задач типа task_type.
+    Обработчик принимает task_id и payload, возвращает (успех, результат).
+    Обработчик PROCESS должен быть функцией верхнего уровня модуля,
+    он передается в другой процесс через pickle
+    '''
+
+    def register(handler: Callable[..., Any]) -> Callable[..., Any]:
+        if task_type in _handlers:
+            raise ValueError(f'Обработчик задач {task_type} уже зарегистрирован')
+        _handlers[task_type] = (handler, kind)
+        return handler
+    return register
+
+
+def get_handler(task_type: str) -> tuple[Callable[..., Any], HandlerKind]:
+    try:
+        return _handlers[task_type]
+    except KeyError:
+        raise LookupError(f'Нет обработчика задач типа {task_type}') from None
+
+
+def is_registered(task_type: str) -> bool:
+    return task_type in _handlers
+
+
+@task_handler(DEFAULT_TASK_TYPE)
+async def simulate_task(task_id: str, payload: dict | None) -> tuple[bool, str]:
+    '''
+    Имимтирую асинхронную обработку задач
+    '''
+
+    logger.info(f'Worker: выпоняю {task_id} задачу')
+    await asyncio.sleep(work_duration := random.randint(3, 20))
+
+    if random.random() < 0.8:
+        result = f'Задача завершена за {work_duration} сек.'
+        logger.info(result)
+        return True, result
+    else:
+        error_message = f'Задача не завершилась за {work_duration}'
+        logger.error(error_message)
+        return False, error_message
+
+
+@task_handler('noop')
+async def noop_task(task_id: str, payload: dict | None) -> tuple[bool, str]:
+    '''
+    Завершается сразу, для нагрузочных тестов конвейера без времени работы
+    '''
+
+    return True, 'noop'
+
+
+@task_handler('sha256', HandlerKind.PROCESS)
+def hash_payload(task_id: str, payload: dict | None) -> tuple[bool, str]:
+    '''
+    Многократно хэширует payload['data'], payload['rounds'] раз
+    '''
+
+    payload = payload or {}
+    rounds = payload.get('rounds', 1)
+    if not isinstance(rounds, int) or not 1 <= rounds <= 10_000_000:
+        return False, 'rounds должен быть целым числом от 1 до 10000000'
+
+    digest = str(payload.get('data', '')).encode('utf-8')
+    for _ in range(rounds):
+        digest = hashlib.sha256(digest).digest()
+    return True, digest.hex()
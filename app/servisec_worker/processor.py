@@ -1,22 +1,73 @@
-from app.core.config import logger
+from concurrent.futures import ProcessPoolExecutor
 
 import asyncio
-import random
+import multiprocessing
+import os
+import signal
 
+from app.core.config import logger, settings
+from app.servisec_worker.handlers import get_handler, HandlerKind, DEFAULT_TASK_TYPE
 
-async def process_task_logic(task_id: str) -> tuple[bool, str]:
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _ignore_signals():
+    # Остановкой пула управляет worker, Ctrl+C не должен ронять процессы пула
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def get_process_pool_size() -> int:
+    '''
+    По умолчанию ядра делятся между процессами workerа,
+    чтобы вместе они занимали все ядра, но не больше
+    '''
+
+    if settings.WORKER_CPU_POOL_SIZE:
+        return settings.WORKER_CPU_POOL_SIZE
+    cpus = os.cpu_count() or 1
+    return max(1, cpus // (settings.WORKER_PROCESSES or cpus))
+
+
+def start_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        size = get_process_pool_size()
+        _process_pool = ProcessPoolExecutor(
+            max_workers=size,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_ignore_signals
+        )
+        logger.info(f'Пул процессов для CPU-задач запущен, процессов: {size}')
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+        logger.info('Пул процессов для CPU-задач остановлен')
+
+
+async def process_task_logic(
+        task_id: str,
+        task_type: str = DEFAULT_TASK_TYPE,
+        payload: dict | None = None
+) -> tuple[bool, str]:
     '''
-    Имимтирую асинхронную обработку задач
+    Выполняет задачу обработчиком ее типа. Блокирующие обработчики
+    уходят в пул потоков, CPU-bound - в пул процессов, поэтому цикл
+    событий продолжает подтверждать сообщения и слать heartbeat.
+    Отмена и таймаут освобождают слот сразу, но уже запущенный
+    в пуле обработчик дорабатывает до конца
     '''
 
-    logger.info(f'Worker: выпоняю {task_id} задачу')
-    await asyncio.sleep(work_duration := random.randint(3, 20))
-
-    if random.random() < 0.8:
-        result = f'Задача завершена за {work_duration} сек.'
-        logger.info(result)
-        return True, result
-    else:
-        error_message = f'Задача не завершилась за {work_duration}'
-        logger.error(error_message)
-        return False, error_message
+    handler, kind = get_handler(task_type)
+    if kind == HandlerKind.ASYNC:
+        return await handler(task_id, payload)
+    if kind == HandlerKind.THREAD:
+        return await asyncio.to_thread(handler, task_id, payload)
+
+    if _process_pool is None:
+        raise RuntimeError('Пул процессов для CPU-задач не запущен')
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_process_pool, handler, task_id, payload)
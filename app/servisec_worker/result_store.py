@@ -0,0 +1,68 @@
+from sqlalchemy import text
+
+from typing import NamedTuple
+
+import asyncio
+import hashlib
+import zlib
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+
+INSERT_RESULT_STATEMENT = text('''
+INSERT INTO task_results (digest, size, created_at)
+VALUES (:digest, :size, now() AT TIME ZONE 'utc')
+ON CONFLICT (digest) DO NOTHING
+RETURNING digest
+''')
+
+INSERT_CHUNK_STATEMENT = text('''
+INSERT INTO task_result_chunks (digest, seq, data) VALUES (:digest, :seq, :data)
+''')
+
+
+class InlineResult(NamedTuple):
+    result: str | None
+    result_ref: str | None
+    result_size: int | None
+
+
+def compress_chunks(data: bytes, chunk_size: int) -> list[bytes]:
+    return [zlib.compress(data[start:start + chunk_size])
+            for start in range(0, len(data), chunk_size)]
+
+
+async def store_result(data: bytes) -> str:
+    '''
+    Сохраняет результат в task_results и возвращает его sha256.
+    Такой же результат, сохраненный раньше, не пишется повторно
+    '''
+
+    digest = hashlib.sha256(data).hexdigest()
+    chunks = await asyncio.to_thread(compress_chunks, data, settings.TASK_RESULT_CHUNK_SIZE)
+    async with SessionLocal() as session:
+        inserted = (await session.execute(INSERT_RESULT_STATEMENT, {
+            'digest': digest,
+            'size': len(data)
+        })).scalar_one_or_none()
+        if inserted is not None and chunks:
+            await session.execute(INSERT_CHUNK_STATEMENT, [
+                {'digest': digest, 'seq': seq, 'data': chunk}
+                for seq, chunk in enumerate(chunks)
+            ])
+        await session.commit()
+    return digest
+
+
+async def offload_result(result: str | None) -> InlineResult:
+    '''
+    Результат длиннее TASK_RESULT_INLINE_LIMIT байт уходит в task_results,
+    в строке задачи остаются только ссылка и размер
+    '''
+
+    if result is None:
+        return InlineResult(None, None, None)
+    data = result.encode()
+    if len(data) <= settings.TASK_RESULT_INLINE_LIMIT:
+        return InlineResult(result, None, None)
+    return InlineResult(None, await store_result(data), len(data))
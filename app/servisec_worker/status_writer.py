@@ -0,0 +1,276 @@
+from sqlalchemy import text
+
+from datetime import datetime
+from typing import NamedTuple
+from uuid import UUID
+
+import asyncio
+import time
+
+from app.core.config import logger, settings
+from app.db.database import SessionLocal
+from app.models.task import TaskStatus, TaskPriority
+from app.queue.outbox import OutboxRelay
+from app.queue.producer import RabbitMQProducer
+from app.servisec_worker.dependencies import release_children, fail_descendants
+
+CLAIM_STATEMENT = text('''
+UPDATE tasks AS t
+SET status = 'IN_PROGRESS', started_at = v.started_at, attempts = t.attempts + 1
+FROM unnest(CAST(:ids AS uuid[]), CAST(:started_at AS timestamp[]))
+    AS v(id, started_at)
+WHERE t.id = v.id AND t.status IN ('NEW', 'PENDING')
+RETURNING t.id, t.priority, t.attempts, t.type, t.payload,
+    COALESCE(t.queued_at, t.run_at, t.created_at)
+''')
+
+FINISH_STATEMENT = text('''
+UPDATE tasks AS t
+SET status = v.status,
+    completed_at = v.completed_at,
+    result = v.result,
+    result_ref = v.result_ref,
+    result_size = v.result_size,
+    error_info = v.error_info
+FROM unnest(
+    CAST(:ids AS uuid[]),
+    CAST(:statuses AS task_status[]),
+    CAST(:completed_at AS timestamp[]),
+    CAST(:results AS text[]),
+    CAST(:result_refs AS text[]),
+    CAST(:result_sizes AS bigint[]),
+    CAST(:errors AS text[])
+) AS v(id, status, completed_at, result, result_ref, result_size, error_info)
+WHERE t.id = v.id AND t.status = 'IN_PROGRESS'
+RETURNING t.id
+''')
+
+
+class ClaimedTask(NamedTuple):
+    priority: TaskPriority
+    attempts: int
+    type: str
+    payload: dict | None
+    # Когда задача стала PENDING, для старых строк - run_at или created_at
+    queued_at: datetime
+
+
+class TaskStatusWriter:
+    '''
+    Копит изменения статусов задач и пишет их пачкой: один UPDATE на все
+    захваты задач и один на все завершенные, в одной транзакции.
+    Захват - условный UPDATE: задача переходит в IN_PROGRESS, только если
+    она еще NEW или PENDING, поэтому повторно доставленное сообщение
+    или дубль задачи не будут выполнены дважды. Захват увеличивает
+    счетчик попыток задачи.
+    Итоговый статус пишется, только пока задача IN_PROGRESS, поэтому
+    отмененная во время выполнения задача не станет COMPLETED.
+    Пачка пишется, когда набралось WORKER_STATUS_BATCH_SIZE изменений
+    или прошло WORKER_STATUS_FLUSH_INTERVAL с первого изменения.
+    claim и mark_finished возвращаются только после коммита пачки,
+    поэтому сообщение подтверждается уже после записи статуса.
+    В той же транзакции завершенные задачи запускают зависимые от них
+    (task_dependencies), а неуспешные завершают своих потомков
+    '''
+
+    _claims: dict[UUID, tuple[datetime, list[asyncio.Future]]] = {}
+    _finished: dict[
+        UUID,
+        tuple[tuple[TaskStatus, datetime | None, str | None, str | None,
+                    int | None, str | None],
+              list[asyncio.Future]]
+    ] = {}
+    _waiters: list[asyncio.Future] = []
+    _has_pending: asyncio.Event | None = None
+    _batch_full: asyncio.Event | None = None
+    _task: asyncio.Task | None = None
+    _event_tasks: set[asyncio.Task] = set()
+    _flushes: int = 0
+
+    @classmethod
+    def _pending(cls) -> int:
+        return len(cls._claims) + len(cls._finished)
+
+    @classmethod
+    async def start(cls):
+        if cls._task is None:
+            cls._has_pending = asyncio.Event()
+            cls._batch_full = asyncio.Event()
+            cls._task = asyncio.create_task(cls._run())
+            logger.info('Запись статусов пачками запущена')
+
+    @classmethod
+    async def stop(cls):
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
+            await cls._flush()
+            await asyncio.gather(*cls._event_tasks, return_exceptions=True)
+            logger.info(f'Запись статусов остановлена, пачек записано: {cls._flushes}')
+
+    @classmethod
+    def _enqueue(cls) -> asyncio.Future:
+        if cls._task is None:
+            raise RuntimeError('TaskStatusWriter не запущен')
+        future = asyncio.get_running_loop().create_future()
+        cls._waiters.append(future)
+        cls._has_pending.set()
+        if cls._pending() >= settings.WORKER_STATUS_BATCH_SIZE:
+            cls._batch_full.set()
+        return future
+
+    @classmethod
+    async def claim(
+            cls,
+            task_id: UUID,
+            started_at: datetime
+    ) -> ClaimedTask | None:
+        '''
+        Переводит задачу в IN_PROGRESS, если она NEW или PENDING.
+        Возвращает то, что нужно для выполнения: приоритет, номер
+        попытки, тип, payload и время постановки задачи в очередь.
+        None - задачу уже взял кто-то другой, ее нет или она отменена
+        '''
+
+        future = cls._enqueue()
+        if task_id in cls._claims:
+            cls._claims[task_id][1].append(future)
+        else:
+            cls._claims[task_id] = (started_at, [future])
+        return await future
+
+    @classmethod
+    async def mark_finished(
+            cls,
+            task_id: UUID,
+            status: TaskStatus,
+            completed_at: datetime | None,
+            result: str | None = None,
+            error_info: str | None = None,
+            result_ref: str | None = None,
+            result_size: int | None = None
+    ) -> bool:
+        '''
+        Записывает итоговый статус задачи. Большой результат передается
+        ссылкой result_ref на task_results вместо result.
+        False - задача уже не IN_PROGRESS, например ее отменили
+        '''
+
+        future = cls._enqueue()
+        futures = cls._finished[task_id][1] if task_id in cls._finished else []
+        futures.append(future)
+        cls._finished[task_id] = (
+            (status, completed_at, result, result_ref, result_size, error_info),
+            futures
+        )
+        return await future
+
+    @classmethod
+    async def release(cls, task_id: UUID, error_info: str) -> bool:
+        '''
+        Возвращает неудавшуюся задачу в PENDING перед повтором.
+        False - задача уже не IN_PROGRESS, например ее отменили
+        '''
+
+        return await cls.mark_finished(task_id, TaskStatus.PENDING, None,
+                                       error_info=error_info)
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            await cls._has_pending.wait()
+            deadline = time.monotonic() + settings.WORKER_STATUS_FLUSH_INTERVAL
+            while cls._pending() < settings.WORKER_STATUS_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                cls._batch_full.clear()
+                try:
+                    await asyncio.wait_for(cls._batch_full.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            cls._has_pending.clear()
+            cls._batch_full.clear()
+            await cls._flush()
+
+    @classmethod
+    async def _flush(cls):
+        claims, finished, waiters = cls._claims, cls._finished, cls._waiters
+        if not waiters:
+            return
+        cls._claims, cls._finished, cls._waiters = {}, {}, []
+
+        claimed: dict[UUID, ClaimedTask] = {}
+        finished_ids: set[UUID] = set()
+        released: list[UUID] = []
+        blocked: list[UUID] = []
+        try:
+            async with SessionLocal() as session:
+                if claims:
+                    rows = (await session.execute(CLAIM_STATEMENT, {
+                        'ids': list(claims),
+                        'started_at': [started_at for started_at, _ in claims.values()]
+                    })).all()
+                    claimed = {
+                        task_id: ClaimedTask(TaskPriority(priority), *row)
+                        for task_id, priority, *row in rows
+                    }
+                if finished:
+                    statuses, completed_at, results, refs, sizes, errors = zip(
+                        *(values for values, _ in finished.values())
+                    )
+                    finished_ids = set((await session.execute(FINISH_STATEMENT, {
+                        'ids': list(finished),
+                        'statuses': [status.value for status in statuses],
+                        'completed_at': list(completed_at),
+                        'results': list(results),
+                        'result_refs': list(refs),
+                        'result_sizes': list(sizes),
+                        'errors': list(errors)
+                    })).scalars())
+                    now = datetime.utcnow()
+                    released = await release_children(session, [
+                        task_id for task_id in finished_ids
+                        if finished[task_id][0][0] == TaskStatus.COMPLETED
+                    ], now)
+                    blocked = await fail_descendants(session, [
+                        task_id for task_id in finished_ids
+                        if finished[task_id][0][0] == TaskStatus.FAILED
+                    ], TaskStatus.FAILED, now)
+                await session.commit()
+        except Exception as err:
+            logger.error(f'Не удалось записать пачку статусов ({len(waiters)}): {err}')
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(err)
+            return
+
+        cls._flushes += 1
+        for task_id, (_, futures) in claims.items():
+            # Из дублей одной пачки задачу получает только первый
+            for index, future in enumerate(futures):
+                if not future.done():
+                    future.set_result(claimed.get(task_id) if index == 0 else None)
+        for task_id, (_, futures) in finished.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(task_id in finished_ids)
+
+        if released:
+            OutboxRelay.notify()
+            logger.info(f'Запущено зависимых задач: {len(released)}')
+        events = ([(task_id, TaskStatus.PENDING) for task_id in released]
+                  + [(task_id, TaskStatus.FAILED) for task_id in blocked])
+        if events:
+            # Следующая пачка не ждет публикации событий большого fan-out
+            task = asyncio.create_task(cls._publish_events(events))
+            cls._event_tasks.add(task)
+            task.add_done_callback(cls._event_tasks.discard)
+
+    @classmethod
+    async def _publish_events(cls, events: list[tuple[UUID, TaskStatus]]):
+        await asyncio.gather(*(
+            RabbitMQProducer.publish_task_event(str(task_id), status)
+            for task_id, status in events
+        ), return_exceptions=True)
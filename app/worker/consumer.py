@@ -1,21 +1,63 @@
 from aio_pika import Connection, Channel, connect_robust, IncomingMessage
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from aio_pika.abc import AbstractQueue, AbstractExchange
+from uuid import UUID
 
 import asyncio
 import datetime
 import json
+import time
 
 from app.core.config import logger, settings
-from app.models.task import TaskPriority, TaskStatus, Task
-from app.db.database import SessionLocal
-from app.servisec_worker.processor import process_task_logic
+from app.models.task import TaskPriority, TaskStatus
+from app.servisec_worker.processor import (process_task_logic, start_process_pool,
+                                           shutdown_process_pool)
+from app.servisec_worker.status_writer import TaskStatusWriter
+from app.servisec_worker.result_store import offload_result
+from app.queue.outbox import OutboxRelay
+from app.queue.producer import RabbitMQProducer
+from app.queue.routing import (get_queue_name, get_queue_arguments,
+                               is_priority_mode, PRIORITY_QUEUE_NAME)
+from app.worker.scheduler import PriorityScheduler
+from app.queue.events import (build_task_event, declare_task_events_exchange,
+                              declare_task_cancel_exchange)
+from app.queue.retry import (declare_retry_topology, declare_dead_letter_queue,
+                             get_retry_delay, build_retry_message, build_dead_letter,
+                             DEAD_LETTER_QUEUE)
+from app.core.cache import TTLCache
+from app.db.database import report_pool_stats
+from app.core.metrics import (TASK_QUEUE_WAIT, TASK_RUN_DURATION, WORKER_TASKS,
+                              gauge_from)
+
+TASK_OUTCOMES = {outcome: WORKER_TASKS.labels(outcome) for outcome in (
+    'completed', 'retried', 'dead_lettered', 'cancelled', 'skipped', 'error'
+)}
+
+
+def get_task_timeout(priority: TaskPriority) -> float:
+    return {
+        TaskPriority.HIGH: settings.TASK_TIMEOUT_HIGH,
+        TaskPriority.MEDIUM: settings.TASK_TIMEOUT_MEDIUM,
+        TaskPriority.LOW: settings.TASK_TIMEOUT_LOW
+    }[priority]
 
 
 class RabbitMQConsumer:
     _connection: Connection | None = None
     _channel: Channel | None = None
     _consumers: list[asyncio.Task] = []
+    _in_flight: set[asyncio.Task] = set()
+    _semaphore: asyncio.Semaphore | None = None
+    _scheduler: PriorityScheduler | None = None
+    _events_exchange: AbstractExchange | None = None
+    _retry_exchange: AbstractExchange | None = None
+    _processed: int = 0
+    _lost_claims: int = 0
+    _cancelled: int = 0
+    _retried: int = 0
+    _dead_lettered: int = 0
+    _running: dict[str, asyncio.Task] = {}
+    # Отмена может прийти раньше, чем задача начнет выполняться
+    _early_cancels: TTLCache = TTLCache(maxsize=10000, ttl=300)
 
     @classmethod
     def isconnection(cls) -> bool:
@@ -27,7 +69,15 @@ class RabbitMQConsumer:
             try:
                 cls._connection = await connect_robust(settings.AMQP_URL)
                 cls._channel = await cls._connection.channel()
-                logger.info('RabbitMQC подключен')
+                await cls._channel.set_qos(
+                    prefetch_count=settings.WORKER_PREFETCH_COUNT
+                )
+                cls._events_exchange = await declare_task_events_exchange(cls._channel)
+                cls._retry_exchange = await declare_retry_topology(cls._channel)
+                await declare_dead_letter_queue(cls._channel)
+                await cls._subscribe_cancellations()
+                logger.info('RabbitMQC подключен, '
+                            f'prefetch={settings.WORKER_PREFETCH_COUNT}')
             except Exception as err:
                 logger.error(f'Не удалось подключиться к RabbitMQC: {err}')
                 cls._connection = None
@@ -40,14 +90,70 @@ class RabbitMQConsumer:
             for consumer_task in cls._consumers:
                 consumer_task.cancel()
             await asyncio.gather(*cls._consumers, return_exceptions=True)
+            cls._consumers.clear()
+            await cls.drain()
             await cls._connection.close()
             cls._connection = None
             cls._channel = None
             logger.info('RabbitMQC отключен')
 
-    @staticmethod
-    def _get_queue_name(priority: TaskPriority) -> str:
-        return f'task_queue_{priority.value.lower()}'
+    @classmethod
+    async def drain(cls):
+        '''
+        Дожидается завершения всех задач, которые уже взяты в работу
+        '''
+
+        if cls._in_flight:
+            logger.info(f'RabbitMQC: ожидаю завершения {len(cls._in_flight)} задач')
+            await asyncio.gather(*cls._in_flight, return_exceptions=True)
+
+    @classmethod
+    def _on_task_done(cls, task: asyncio.Task):
+        cls._in_flight.discard(task)
+        cls._processed += 1
+        cls._semaphore.release()
+
+    @classmethod
+    def _spawn(cls, message: IncomingMessage):
+        task = asyncio.create_task(cls._process_message(message))
+        cls._in_flight.add(task)
+        task.add_done_callback(cls._on_task_done)
+
+    @classmethod
+    async def _consume_queue(
+            cls,
+            queue: AbstractQueue,
+            priority: TaskPriority | None = None
+    ):
+        '''
+        Забирает сообщения из очереди не быстрее, чем освобождаются слоты.
+        Пока пул занят, сообщение не берется из буфера, неподтвержденные
+        сообщения упираются в prefetch и брокер перестает их присылать.
+        Если задан приоритет, сообщение передается планировщику
+        '''
+
+        async with queue.iterator() as queue_iter:
+            async for message in queue_iter:
+                if priority is not None:
+                    await cls._scheduler.put(priority, message)
+                    continue
+                await cls._semaphore.acquire()
+                cls._spawn(message)
+
+    @classmethod
+    async def _dispatch(cls):
+        '''
+        Заполняет освободившиеся слоты сообщениями, выбранными планировщиком
+        '''
+
+        while True:
+            await cls._semaphore.acquire()
+            try:
+                message = await cls._scheduler.get()
+            except BaseException:
+                cls._semaphore.release()
+                raise
+            cls._spawn(message)
 
     @classmethod
     async def start_consuming(cls):
@@ -59,25 +165,163 @@ class RabbitMQConsumer:
             logger.error('Не удалось получить сообщение: '
                          'канал RabbitMQP недоступен.')
 
+        cls._semaphore = asyncio.Semaphore(settings.WORKER_MAX_CONCURRENT_TASKS)
+        logger.info('RabbitMQC: максимум одновременных задач '
+                    f'{settings.WORKER_MAX_CONCURRENT_TASKS}')
+
+        if is_priority_mode():
+            queue = await cls._channel.declare_queue(
+                PRIORITY_QUEUE_NAME,
+                durable=True,
+                arguments=get_queue_arguments()
+            )
+            logger.info(f'Принимаем {PRIORITY_QUEUE_NAME}')
+            cls._consumers.append(asyncio.create_task(cls._consume_queue(queue)))
+        else:
+            await cls._start_weighted_consumers()
+        await asyncio.Future()
+
+    @classmethod
+    async def _start_weighted_consumers(cls):
+        cls._scheduler = PriorityScheduler(
+            weights={
+                TaskPriority.HIGH: settings.WORKER_WEIGHT_HIGH,
+                TaskPriority.MEDIUM: settings.WORKER_WEIGHT_MEDIUM,
+                TaskPriority.LOW: settings.WORKER_WEIGHT_LOW
+            },
+            max_wait=settings.WORKER_PRIORITY_MAX_WAIT
+        )
         for priority_enum in (
             TaskPriority.HIGH,
             TaskPriority.MEDIUM,
             TaskPriority.LOW
         ):
-            queue_name = cls._get_queue_name(priority_enum)
+            queue_name = get_queue_name(priority_enum)
             queue = await cls._channel.declare_queue(queue_name, durable=True)
             logger.info(f'Принимаем {queue_name}')
             consumer_task = asyncio.create_task(
-                queue.consume(cls._process_message, no_ack=False)
+                cls._consume_queue(queue, priority_enum)
             )
             cls._consumers.append(consumer_task)
-        await asyncio.Future()
+        cls._consumers.append(asyncio.create_task(cls._dispatch()))
+
+    @classmethod
+    async def _subscribe_cancellations(cls):
+        exchange = await declare_task_cancel_exchange(cls._channel)
+        queue = await cls._channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(exchange)
+        await queue.consume(cls._on_cancel, no_ack=True)
+
+    @classmethod
+    async def _on_cancel(cls, message: IncomingMessage):
+        try:
+            task_id = json.loads(message.body)['task_id']
+        except (ValueError, KeyError, TypeError) as err:
+            logger.warning(f'RabbitMQC: некорректная отмена {message.body}: {err}')
+            return
+
+        work = cls._running.get(task_id)
+        if work is None:
+            cls._early_cancels.set(task_id, True)
+            return
+        logger.info(f'RabbitMQC: прерываю задачу {task_id} по запросу отмены')
+        work.cancel()
+
+    @classmethod
+    async def _publish_status_event(cls, task_id: str, status: TaskStatus):
+        try:
+            await cls._events_exchange.publish(
+                build_task_event(task_id, status),
+                routing_key=''
+            )
+        except Exception as err:
+            logger.warning(f'RabbitMQC: не удалось опубликовать событие '
+                           f'задачи {task_id}: {err}')
+
+    @staticmethod
+    async def _execute(
+            task_id: str,
+            task_type: str,
+            payload: dict | None,
+            timeout: float
+    ) -> tuple[bool, str]:
+        '''
+        Выполняет задачу не дольше timeout. Таймаут и исключение
+        обработчика считаются неудачной попыткой, а не ошибкой workerа
+        '''
+
+        try:
+            return await asyncio.wait_for(
+                process_task_logic(task_id, task_type, payload),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            return False, f'Задача не уложилась в {timeout} сек. и была прервана'
+        except Exception as err:
+            return False, f'Ошибка при выполнении задачи: {err}'
+
+    @classmethod
+    async def _handle_failure(
+            cls,
+            message: IncomingMessage,
+            task_id: str,
+            priority: TaskPriority,
+            attempt: int,
+            error_info: str
+    ):
+        '''
+        Неудачная попытка возвращает задачу в PENDING и кладет сообщение
+        в очередь повторов с задержкой по номеру попытки. После
+        TASK_MAX_ATTEMPTS задача становится FAILED и попадает в DLQ
+        '''
+
+        if attempt < settings.TASK_MAX_ATTEMPTS:
+            if not await TaskStatusWriter.release(UUID(task_id), error_info):
+                logger.info(f'Задачу {task_id} отменили до повтора')
+                return
+            delay = get_retry_delay(attempt)
+            try:
+                await cls._retry_exchange.publish(
+                    build_retry_message(task_id, priority, delay),
+                    routing_key=get_queue_name(priority)
+                )
+            except Exception as err:
+                # Задача уже PENDING, сообщение вернется в очередь без задержки
+                logger.error(f'RabbitMQC: не удалось отложить повтор {task_id}: {err}')
+                await message.nack(requeue=True)
+                return
+            cls._retried += 1
+            TASK_OUTCOMES['retried'].inc()
+            await cls._publish_status_event(task_id, TaskStatus.PENDING)
+            logger.warning(f'Задача {task_id}: попытка {attempt} не удалась '
+                           f'({error_info}), повтор через {delay} мс')
+            return
+
+        if not await TaskStatusWriter.mark_finished(
+            UUID(task_id),
+            TaskStatus.FAILED,
+            datetime.datetime.utcnow(),
+            error_info=error_info
+        ):
+            logger.info(f'Задачу {task_id} отменили до записи результата')
+            return
+        try:
+            await cls._channel.default_exchange.publish(
+                build_dead_letter(task_id, priority, attempt, error_info),
+                routing_key=DEAD_LETTER_QUEUE
+            )
+            cls._dead_lettered += 1
+            TASK_OUTCOMES['dead_lettered'].inc()
+        except Exception as err:
+            logger.error(f'RabbitMQC: не удалось положить {task_id} в DLQ: {err}')
+        await cls._publish_status_event(task_id, TaskStatus.FAILED)
+        logger.error(f'Задача {task_id} не выполнена за {attempt} попыток: {error_info}')
 
     @classmethod
     async def _process_message(cls, message: IncomingMessage):
-        async with message.process():
-            session: AsyncSession = SessionLocal()
-            task = None
+        async with message.process(ignore_processed=True):
+            task_id = None
+            task_status = None
             try:
                 payload = json.loads(message.body.decode())
                 task_id = payload.get('task_id')
@@ -87,40 +331,84 @@ class RabbitMQConsumer:
                     return
                 logger.info(f'Принял задачу {task_id} из {message.routing_key}')
 
-                task = await session.execute(select(Task).where(Task.id == task_id))
-                task = task.scalar_one_or_none()
+                started_at = datetime.datetime.utcnow()
+                try:
+                    claimed = await TaskStatusWriter.claim(UUID(task_id), started_at)
+                except Exception as err:
+                    # Захват не записан, задача все еще PENDING: сообщение
+                    # возвращается в очередь, а не подтверждается
+                    logger.error(f'RabbitMQC: не удалось захватить {task_id}, '
+                                 f'сообщение вернется в очередь: {err}')
+                    TASK_OUTCOMES['error'].inc()
+                    await message.nack(requeue=True)
+                    return
+                if claimed is None:
+                    cls._lost_claims += 1
+                    TASK_OUTCOMES['skipped'].inc()
+                    logger.info(f'Задача {task_id} не захвачена: ее нет, она уже '
+                                'выполняется или завершена. Пропускаю '
+                                f'(всего пропущено {cls._lost_claims})')
+                    return
+                task_status = TaskStatus.IN_PROGRESS
+                priority, attempt = claimed.priority, claimed.attempts
+                if attempt == 1:
+                    TASK_QUEUE_WAIT.labels(priority.value).observe(
+                        (started_at - claimed.queued_at).total_seconds()
+                    )
 
-                if not task:
-                    logger.warning(f'Задачи {task_id} нет в БД. Пропускаю')
+                run_started = time.perf_counter()
+                work = asyncio.create_task(cls._execute(
+                    task_id,
+                    claimed.type,
+                    claimed.payload,
+                    get_task_timeout(priority)
+                ))
+                cls._running[task_id] = work
+                if cls._early_cancels.get(task_id):
+                    work.cancel()
+                await cls._publish_status_event(task_id, TaskStatus.IN_PROGRESS)
+                try:
+                    await asyncio.wait((work,))
+                except asyncio.CancelledError:
+                    work.cancel()
+                    raise
+                finally:
+                    cls._running.pop(task_id, None)
+
+                run_time = time.perf_counter() - run_started
+                if work.cancelled():
+                    # CANCELLED уже записан API, слот освобождается сразу
+                    TASK_RUN_DURATION.labels(claimed.type, 'cancelled').observe(run_time)
+                    TASK_OUTCOMES['cancelled'].inc()
+                    cls._cancelled += 1
+                    logger.info(f'Задача {task_id} отменена во время выполнения')
                     return
-                if task.status in (
-                    TaskStatus.COMPLETED,
-                    TaskStatus.FAILED,
-                    TaskStatus.CANCELLED
-                ):
-                    logger.info(f'Задача {task_id} не проходит по статусу: '
-                                f'{task.status.value}. Проуспкаю')
+                success, result_or_error = work.result()
+                TASK_RUN_DURATION.labels(
+                    claimed.type,
+                    'completed' if success else 'failed'
+                ).observe(run_time)
+
+                if not success:
+                    await cls._handle_failure(message, task_id, priority,
+                                              attempt, result_or_error)
                     return
 
-                task.status = TaskStatus.IN_PROGRESS
-                task.started_at = datetime.datetime.utcnow()
-                await session.commit()
-                await session.refresh(task)
-                success, result_or_error = await process_task_logic(task_id)
-                task.completed_at = datetime.datetime.utcnow()
-
-                if success:
-                    task.status = TaskStatus.COMPLETED
-                    task.result = result_or_error
-                    task.error_info = None
-                else:
-                    task.status = TaskStatus.FAILED
-                    task.result = result_or_error
-                    task.result = None
-
-                await session.commit()
-                await session.refresh(task)
-                logger.info(f'Статус задачи {task_id} обновлен до {task.status.value}')
+                task_status = TaskStatus.COMPLETED
+                result, result_ref, result_size = await offload_result(result_or_error)
+                if not await TaskStatusWriter.mark_finished(
+                    UUID(task_id),
+                    task_status,
+                    datetime.datetime.utcnow(),
+                    result=result,
+                    result_ref=result_ref,
+                    result_size=result_size
+                ):
+                    logger.info(f'Задачу {task_id} отменили до записи результата')
+                    return
+                TASK_OUTCOMES['completed'].inc()
+                await cls._publish_status_event(task_id, task_status)
+                logger.info(f'Статус задачи {task_id} обновлен до {task_status.value}')
 
             except json.JSONDecodeError as json_err:
                 logger.error('RabbirMQC: Не удалось расшифровать '
@@ -128,18 +416,42 @@ class RabbitMQConsumer:
             except Exception as err:
                 logger.error(f'RabbirMQC: В процессе {task_id} произошла '
                              f'ошибка: {err}', exc_info=True)
-                if task:
-                    task.status = TaskStatus.FAILED
-                    task.error_info = f'RabbitMQC: внутренняя ошибка {err}'
-                    task.completed_at = datetime.datetime.utcnow()
-                    await session.commit()
-                    await session.refresh(task)
-            finally:
-                await session.close()
+                TASK_OUTCOMES['error'].inc()
+                if task_status is None:
+                    return
+                try:
+                    written = await TaskStatusWriter.mark_finished(
+                        UUID(task_id),
+                        TaskStatus.FAILED,
+                        datetime.datetime.utcnow(),
+                        error_info=f'RabbitMQC: внутренняя ошибка {err}'
+                    )
+                except Exception as write_err:
+                    logger.error(f'RabbitMQC: не удалось записать FAILED для {task_id}, '
+                                 f'сообщение вернется в очередь: {write_err}')
+                    await message.nack(requeue=True)
+                    return
+                if written:
+                    await cls._publish_status_event(task_id, TaskStatus.FAILED)
+
+gauge_from(
+    'worker_tasks_in_flight',
+    'Задачи, которые worker выполняет прямо сейчас',
+    lambda: len(RabbitMQConsumer._in_flight)
+)
 
 
 async def run_worker():
     await RabbitMQConsumer.connect()
+    # Зависимые задачи worker публикует сам, не дожидаясь опроса outbox в API
+    try:
+        await RabbitMQProducer.connect()
+    except Exception as err:
+        logger.error(f'Не удалось подключиться к RabbitMQ для публикации: {err}')
+    await OutboxRelay.start()
+    await TaskStatusWriter.start()
+    start_process_pool()
+    pool_reporter = asyncio.create_task(report_pool_stats())
     try:
         await RabbitMQConsumer.start_consuming()
     except asyncio.CancelledError:
@@ -147,5 +459,10 @@ async def run_worker():
     except Exception as err:
         logger.error(f'RabbitMQC произошла ошибка: {err}')
     finally:
+        pool_reporter.cancel()
         await RabbitMQConsumer.disconnect()
+        await TaskStatusWriter.stop()
+        await OutboxRelay.stop()
+        await RabbitMQProducer.disconnect()
+        shutdown_process_pool()
         logger.info('RabbitMQC завершился')
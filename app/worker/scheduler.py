@@ -0,0 +1,80 @@
+from aio_pika import IncomingMessage
+
+from collections import deque
+import asyncio
+import time
+
+from app.models.task import TaskPriority
+
+
+class PriorityScheduler:
+    '''
+    Решает, из какой очереди приоритета взять сообщение в свободный слот.
+    Используется плавный взвешенный round-robin: при весах 6:3:1 и полных
+    очередях из 10 слотов HIGH получает 6, MEDIUM 3, LOW 1.
+    Сообщение, которое ждет дольше max_wait, выбирается вне очереди
+    '''
+
+    def __init__(
+            self,
+            weights: dict[TaskPriority, int],
+            max_wait: float,
+            buffer_size: int = 1
+    ):
+        if any(weight < 1 for weight in weights.values()):
+            raise ValueError('Вес приоритета должен быть не меньше 1')
+
+        self._weights = weights
+        self._max_wait = max_wait
+        self._buffer_size = buffer_size
+        self._current = {priority: 0 for priority in weights}
+        self._buffers: dict[TaskPriority, deque[tuple[float, IncomingMessage]]] = {
+            priority: deque() for priority in weights
+        }
+        self._condition = asyncio.Condition()
+
+    def _has_messages(self) -> bool:
+        return any(self._buffers.values())
+
+    def _select(self, now: float) -> TaskPriority:
+        candidates = [priority for priority, buffer in self._buffers.items() if buffer]
+        total = sum(self._weights[priority] for priority in candidates)
+        for priority in candidates:
+            self._current[priority] += self._weights[priority]
+
+        overdue = [
+            priority for priority in candidates
+            if now - self._buffers[priority][0][0] >= self._max_wait
+        ]
+        if overdue:
+            chosen = min(overdue, key=lambda priority: self._buffers[priority][0][0])
+        else:
+            chosen = max(candidates, key=lambda priority: self._current[priority])
+
+        self._current[chosen] -= total
+        return chosen
+
+    async def put(self, priority: TaskPriority, message: IncomingMessage):
+        '''
+        Кладет сообщение в буфер приоритета. Пока буфер полон, ждет,
+        из-за чего перестает читаться очередь RabbitMQ
+        '''
+
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: len(self._buffers[priority]) < self._buffer_size
+            )
+            self._buffers[priority].append((time.monotonic(), message))
+            self._condition.notify_all()
+
+    async def get(self) -> IncomingMessage:
+        '''
+        Возвращает следующее сообщение согласно весам приоритетов
+        '''
+
+        async with self._condition:
+            await self._condition.wait_for(self._has_messages)
+            priority = self._select(time.monotonic())
+            _, message = self._buffers[priority].popleft()
+            self._condition.notify_all()
+            return message
@@ -0,0 +1,106 @@
+from multiprocessing.context import SpawnProcess
+from multiprocessing.sharedctypes import Synchronized
+
+import multiprocessing
+import os
+import signal
+import time
+
+from app.core.config import logger, settings
+from app.worker.worker import run
+
+
+class WorkerSupervisor:
+    '''
+    Запускает несколько процессов workerа и следит за ними.
+    Каждый процесс создается через spawn, поэтому у него свое
+    подключение к RabbitMQ и свой engine SQLAlchemy
+    '''
+
+    RESTART_DELAY: float = 1.0
+
+    def __init__(self, processes: int | None = None):
+        self._context = multiprocessing.get_context('spawn')
+        self._size = processes or settings.WORKER_PROCESSES or os.cpu_count() or 1
+        self._processes: list[SpawnProcess | None] = [None] * self._size
+        self._counters: list[Synchronized] = [
+            self._context.Value('Q', 0, lock=False) for _ in range(self._size)
+        ]
+        self._stopping = False
+
+    def _start(self, slot: int):
+        process = self._context.Process(
+            target=run,
+            args=(self._counters[slot], slot),
+            name=f'task-worker-{slot}',
+            daemon=False
+        )
+        process.start()
+        self._processes[slot] = process
+        logger.info(f'Supervisor: запущен {process.name} (pid {process.pid})')
+
+    def _handle_signal(self, signum, frame):
+        logger.info(f'Supervisor: получен сигнал {signal.Signals(signum).name}, '
+                    'останавливаю workerы')
+        self._stopping = True
+
+    def _restart_dead(self):
+        for slot, process in enumerate(self._processes):
+            if process is not None and not process.is_alive():
+                logger.error(f'Supervisor: {process.name} завершился '
+                             f'с кодом {process.exitcode}, перезапускаю')
+                process.close()
+                self._start(slot)
+
+    def _report(self, started_at: float, last_total: int, last_at: float) -> int:
+        now = time.monotonic()
+        total = sum(counter.value for counter in self._counters)
+        rate = (total - last_total) / max(now - last_at, 1e-9)
+        average = total / max(now - started_at, 1e-9)
+        logger.info(f'Supervisor: обработано {total} задач, '
+                    f'{rate:.2f} задач/сек (в среднем {average:.2f})')
+        return total
+
+    def _shutdown(self):
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + settings.WORKER_SHUTDOWN_TIMEOUT
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(f'Supervisor: {process.name} не завершился '
+                               f'за {settings.WORKER_SHUTDOWN_TIMEOUT} сек., kill')
+                process.kill()
+                process.join()
+
+    def serve(self):
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        logger.info(f'Supervisor: запускаю {self._size} процессов workerа')
+        for slot in range(self._size):
+            self._start(slot)
+
+        started_at = last_at = time.monotonic()
+        last_total = 0
+        try:
+            while not self._stopping:
+                time.sleep(self.RESTART_DELAY)
+                if self._stopping:
+                    break
+                self._restart_dead()
+                if time.monotonic() - last_at >= settings.WORKER_STATS_INTERVAL:
+                    last_total = self._report(started_at, last_total, last_at)
+                    last_at = time.monotonic()
+        finally:
+            self._shutdown()
+            self._report(started_at, last_total, last_at)
+            logger.info('Supervisor: все workerы остановлены')
+
+
+if __name__ == '__main__':
+    WorkerSupervisor().serve()
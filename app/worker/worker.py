@@ -1,17 +1,69 @@
+from multiprocessing.sharedctypes import Synchronized
+
+from prometheus_client import start_http_server
+
 import asyncio
+import signal
+
+from app.core.config import logger, settings
+from app.worker.consumer import RabbitMQConsumer, run_worker
 
-from app.core.config import logger
-from app.worker.consumer import run_worker
+SHUTDOWN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
 
 
-async def main():
+async def _report_processed(counter: Synchronized):
+    while True:
+        counter.value = RabbitMQConsumer._processed
+        await asyncio.sleep(1)
+
+
+async def main(counter: Synchronized | None = None):
     logger.info('Запуск RabbitMQC')
-    await run_worker()
+    loop = asyncio.get_running_loop()
+    current_task = asyncio.current_task()
+
+    def _stop():
+        # Повторный сигнал не должен прерывать дренирование задач
+        for sig in SHUTDOWN_SIGNALS:
+            loop.remove_signal_handler(sig)
+            signal.signal(sig, signal.SIG_IGN)
+        logger.info('RabbitMQC: получен сигнал остановки')
+        current_task.cancel()
+
+    for sig in SHUTDOWN_SIGNALS:
+        loop.add_signal_handler(sig, _stop)
+
+    reporter = None
+    if counter is not None:
+        RabbitMQConsumer._processed = counter.value
+        reporter = asyncio.create_task(_report_processed(counter))
+    try:
+        await run_worker()
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+            counter.value = RabbitMQConsumer._processed
+
+
+def run(counter: Synchronized | None = None, slot: int = 0):
+    '''
+    Точка входа одного процесса workerа
+    '''
+
+    if settings.WORKER_METRICS_PORT:
+        port = settings.WORKER_METRICS_PORT + slot
+        try:
+            start_http_server(port)
+            logger.info(f'RabbitMQC: метрики на порту {port}')
+        except OSError as err:
+            logger.warning(f'RabbitMQC: метрики недоступны, порт {port}: {err}')
+    try:
+        asyncio.run(main(counter))
+    except KeyboardInterrupt:
+        logger.info('RabbitMQC: Получено прерывание, RabbitMQC завершен')
+    except Exception as err:
+        logger.error(f'RabbitMQC: Ошибка при заупске: {err}', exc_info=True)
 
 
-try:
-    asyncio.run(main())
-except KeyboardInterrupt:
-    logger.info('RabbitMQC: Получено прерывание, RabbitMQC завершен')
-except Exception as err:
-    logger.error(f'RabbitMQC: Ошибка при заупске: {err}', exc_info=True)
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,67 @@
+'''
+Сравнивает два результата benchmarks.run и завершается с кодом 1,
+если какая-то метрика ухудшилась больше чем на --threshold.
+
+    python -m benchmarks.compare benchmarks/results/main.json benchmarks/results/branch.json
+'''
+import argparse
+import json
+import sys
+
+# Для задержек хуже больше, для пропускной способности - меньше
+LOWER_IS_BETTER = ('latency_ms.p50', 'latency_ms.p95', 'latency_ms.p99')
+HIGHER_IS_BETTER = ('throughput_per_s',)
+
+
+def flatten(results: dict, prefix: str = '') -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{path}.'))
+        elif isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[str]:
+    '''
+    Возвращает описания регрессий
+    '''
+
+    base, new = flatten(baseline['results']), flatten(candidate['results'])
+    regressions = []
+    for path in sorted(base.keys() & new.keys()):
+        if path.endswith(LOWER_IS_BETTER):
+            worse = new[path] > base[path] * (1 + threshold)
+        elif path.endswith(HIGHER_IS_BETTER):
+            worse = new[path] < base[path] * (1 - threshold)
+        else:
+            continue
+        change = (new[path] - base[path]) / base[path] if base[path] else 0.0
+        line = f'{path}: {base[path]} -> {new[path]} ({change:+.1%})'
+        print(('РЕГРЕССИЯ ' if worse else '') + line)
+        if worse:
+            regressions.append(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение результатов нагрузочных тестов')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Допустимое ухудшение, доля (0.1 = 10%%)')
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    with open(args.candidate, encoding='utf-8') as file:
+        candidate = json.load(file)
+
+    if compare(baseline, candidate, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
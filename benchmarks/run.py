@@ -0,0 +1,111 @@
+'''
+Нагрузочный тест API и workerа.
+
+    python -m benchmarks.run --scenario create status list pipeline \
+        --count 2000 --concurrency 50 --output benchmarks/results/main.json
+
+По умолчанию запросы идут на --base-url (docker-compose up).
+С --in-process API и worker запускаются в этом же процессе, нужны
+только Postgres и RabbitMQ из .env
+'''
+from httpx import AsyncClient, ASGITransport, Limits
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from benchmarks.scenarios import SCENARIOS
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@asynccontextmanager
+async def remote_client(base_url: str, concurrency: int) -> AsyncIterator[AsyncClient]:
+    limits = Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        yield client
+
+
+@asynccontextmanager
+async def in_process_client() -> AsyncIterator[AsyncClient]:
+    from app.main import app
+    from app.worker.consumer import run_worker
+
+    async with app.router.lifespan_context(app):
+        worker = asyncio.create_task(run_worker())
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app),
+                                   base_url='http://benchmark', timeout=30.0) as client:
+                yield client
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    client_context = (in_process_client() if args.in_process
+                      else remote_client(args.base_url, args.concurrency))
+    results = {}
+    async with client_context as client:
+        for name in args.scenario:
+            print(f'{name}: {args.count} запросов, {args.concurrency} одновременно',
+                  file=sys.stderr)
+            results[name] = await SCENARIOS[name](
+                client, args.count, args.concurrency, args.task_type
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест сервиса задач')
+    parser.add_argument('--scenario', nargs='+', choices=sorted(SCENARIOS),
+                        default=['create', 'status', 'list', 'pipeline'])
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--task-type', default='noop',
+                        help='Тип задач, noop завершается без задержки')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--in-process', action='store_true')
+    parser.add_argument('--output', help='Куда записать результаты в JSON')
+    args = parser.parse_args()
+
+    report = {
+        'revision': git_revision(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'params': {
+            'count': args.count,
+            'concurrency': args.concurrency,
+            'task_type': args.task_type,
+            'target': 'in-process' if args.in_process else args.base_url
+        },
+        'results': asyncio.run(run(args))
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+from httpx import AsyncClient
+
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import asyncio
+import time
+
+from benchmarks.stats import summarize
+
+TASKS_URL = '/api/v1/tasks/'
+PRIORITIES = ('LOW', 'MEDIUM', 'HIGH')
+TERMINAL = {'COMPLETED', 'FAILED', 'CANCELLED'}
+
+
+async def run_requests(
+        request: Callable[[int], Awaitable[None]],
+        count: int,
+        concurrency: int
+) -> tuple[list[float], int, float]:
+    '''
+    Выполняет count запросов, не больше concurrency одновременно.
+    Возвращает задержки успешных запросов, число ошибок и общее время
+    '''
+
+    latencies: list[float] = []
+    errors = 0
+    next_index = 0
+
+    async def runner():
+        nonlocal next_index, errors
+        while next_index < count:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                await request(index)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(runner() for _ in range(min(concurrency, count))))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def create_tasks(
+        client: AsyncClient,
+        count: int,
+        concurrency: int,
+        task_type: str
+) -> tuple[dict, list[str]]:
+    task_ids: list[str] = []
+
+    async def request(index: int):
+        response = await client.post(TASKS_URL, json={
+            'title': f'benchmark {index}',
+            'priority': PRIORITIES[index % len(PRIORITIES)],
+            'type': task_type
+        })
+        response.raise_for_status()
+        task_ids.append(response.json()['id'])
+
+    latencies, errors, duration = await run_requests(request, count, concurrency)
+    return summarize(latencies, duration, errors), task_ids
+
+
+async def bench_create(client: AsyncClient, count: int, concurrency: int,
+                       task_type: str) -> dict:
+    summary, _ = await create_tasks(client, count, concurrency, task_type)
+    return summary
+
+
+async def bench_status(client: AsyncClient, count: int, concurrency: int,
+                       task_type: str) -> dict:
+    _, task_ids = await create_tasks(client, min(count, 100), concurrency, task_type)
+
+    async def request(index: int):
+        response = await client.get(f'{TASKS_URL}{task_ids[index % len(task_ids)]}/status')
+        response.raise_for_status()
+
+    latencies, errors, duration = await run_requests(request, count, concurrency)
+    return summarize(latencies, duration, errors)
+
+
+async def bench_list(client: AsyncClient, count: int, concurrency: int,
+                     task_type: str) -> dict:
+    async def request(index: int):
+        params = {'page_size': 50}
+        if index % 2:
+            params['status'] = 'PENDING'
+        response = await client.get(TASKS_URL, params=params)
+        response.raise_for_status()
+
+    latencies, errors, duration = await run_requests(request, count, concurrency)
+    return summarize(latencies, duration, errors)
+
+
+async def wait_terminal(
+        client: AsyncClient,
+        task_ids: list[str],
+        concurrency: int,
+        timeout: float,
+        poll_interval: float = 0.5
+) -> list[str]:
+    '''
+    Опрашивает статусы, пока все задачи не завершатся или не выйдет timeout.
+    Возвращает задачи, которые не успели завершиться
+    '''
+
+    pending = list(task_ids)
+    deadline = time.monotonic() + timeout
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def is_pending(task_id: str) -> bool:
+        async with semaphore:
+            response = await client.get(f'{TASKS_URL}{task_id}/status')
+        return response.status_code != 200 or response.json()['status'] not in TERMINAL
+
+    while pending and time.monotonic() < deadline:
+        still = await asyncio.gather(*(is_pending(task_id) for task_id in pending))
+        pending = [task_id for task_id, flag in zip(pending, still) if flag]
+        if pending:
+            await asyncio.sleep(poll_interval)
+    return pending
+
+
+async def bench_pipeline(client: AsyncClient, count: int, concurrency: int,
+                         task_type: str, timeout: float = 300.0) -> dict:
+    '''
+    Создание -> выполнение workerом -> завершение. Задержки считаются
+    по времени сервера: created_at, started_at и completed_at задачи
+    '''
+
+    create_summary, task_ids = await create_tasks(client, count, concurrency, task_type)
+    unfinished = await wait_terminal(client, task_ids, concurrency, timeout)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(task_id: str) -> dict:
+        async with semaphore:
+            response = await client.get(f'{TASKS_URL}{task_id}')
+        response.raise_for_status()
+        return response.json()
+
+    unfinished_ids = set(unfinished)
+    tasks = await asyncio.gather(*(fetch(task_id) for task_id in task_ids
+                                   if task_id not in unfinished_ids))
+    done = [task for task in tasks if task['completed_at'] and task['started_at']]
+    if not done:
+        return {'create': create_summary, 'unfinished': len(unfinished), 'completed': 0}
+
+    def at(task: dict, field: str) -> float:
+        return datetime.fromisoformat(task[field]).timestamp()
+
+    end_to_end = [at(task, 'completed_at') - at(task, 'created_at') for task in done]
+    span = (max(at(task, 'completed_at') for task in done)
+            - min(at(task, 'created_at') for task in done))
+    return {
+        'create': create_summary,
+        'end_to_end': summarize(end_to_end, span),
+        'queue_wait': summarize([at(task, 'started_at') - at(task, 'created_at')
+                                 for task in done], span),
+        'completed': sum(task['status'] == 'COMPLETED' for task in done),
+        'failed': sum(task['status'] != 'COMPLETED' for task in done),
+        'unfinished': len(unfinished)
+    }
+
+
+SCENARIOS = {
+    'create': bench_create,
+    'status': bench_status,
+    'list': bench_list,
+    'pipeline': bench_pipeline
+}
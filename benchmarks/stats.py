@@ -0,0 +1,33 @@
+import math
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    '''
+    Перцентиль по ближайшему рангу, values должны быть отсортированы
+    '''
+
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], duration: float, errors: int = 0) -> dict:
+    '''
+    Сводка по замерам в секундах: перцентили в миллисекундах и операций в секунду
+    '''
+
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'errors': errors,
+        'duration_s': round(duration, 4),
+        'throughput_per_s': round(len(values) / duration, 2) if duration > 0 else 0.0,
+        'latency_ms': {
+            'mean': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+            'p50': round(percentile(values, 0.50) * 1000, 3),
+            'p95': round(percentile(values, 0.95) * 1000, 3),
+            'p99': round(percentile(values, 0.99) * 1000, 3),
+            'max': round(values[-1] * 1000, 3) if values else 0.0
+        }
+    }
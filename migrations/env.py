@@ -8,6 +8,9 @@ from alembic import context
 import asyncio, greenlet
 
 from app.db.base import Base
+from app.models import (task, outbox, task_count, task_archive,  # noqa: F401
+                        task_result, task_schedule, task_dependency,
+                        task_idempotency_key)
 from app.core.config import settings
 
 
@@ -0,0 +1,42 @@
+"""tasks keyset pagination index
+
+Revision ID: 072fec93f315
+Revises: 2a53955dd189
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '072fec93f315'
+down_revision: Union[str, Sequence[str], None] = '2a53955dd189'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в большую таблицу, но не работает в транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tasks_created_at_id',
+            'tasks',
+            ['created_at', 'id'],
+            postgresql_include=['status', 'priority'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_tasks_created_at_id',
+            table_name='tasks',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
@@ -0,0 +1,73 @@
+"""initial schema
+
+Revision ID: 2a53955dd189
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a53955dd189'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+task_priority = postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', name='task_priority')
+task_status = postgresql.ENUM(
+    'NEW', 'PENDING', 'IN_PROGRESS', 'COMPLETED', 'FAILED', 'CANCELLED',
+    name='task_status'
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Базы, созданные раньше через Base.metadata.create_all, уже содержат эти таблицы
+    inspector = sa.inspect(op.get_bind())
+
+    task_priority.create(op.get_bind(), checkfirst=True)
+    task_status.create(op.get_bind(), checkfirst=True)
+
+    if not inspector.has_table('tasks'):
+        op.create_table(
+            'tasks',
+            sa.Column('id', sa.UUID(as_uuid=True), primary_key=True),
+            sa.Column('title', sa.String(), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('priority', postgresql.ENUM(name='task_priority', create_type=False),
+                      nullable=False),
+            sa.Column('status', postgresql.ENUM(name='task_status', create_type=False),
+                      nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.Column('result', sa.Text(), nullable=True),
+            sa.Column('error_info', sa.Text(), nullable=True)
+        )
+        op.create_index('ix_tasks_id', 'tasks', ['id'])
+        op.create_index('ix_tasks_status_priority', 'tasks', ['status', 'priority'])
+
+    if not inspector.has_table('task_outbox'):
+        op.create_table(
+            'task_outbox',
+            sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+            sa.Column('task_id', sa.UUID(as_uuid=True),
+                      sa.ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('priority', postgresql.ENUM(name='task_priority', create_type=False),
+                      nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False)
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('task_outbox')
+    op.drop_table('tasks')
+    task_status.drop(op.get_bind(), checkfirst=True)
+    task_priority.drop(op.get_bind(), checkfirst=True)
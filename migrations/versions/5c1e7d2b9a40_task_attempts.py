@@ -0,0 +1,31 @@
+"""task execution attempts
+
+Revision ID: 5c1e7d2b9a40
+Revises: ae3f59af4db3
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7d2b9a40'
+down_revision: Union[str, Sequence[str], None] = 'ae3f59af4db3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'tasks',
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tasks', 'attempts')
@@ -0,0 +1,37 @@
+"""task handler type and payload
+
+Revision ID: 9d4f3a6c1b27
+Revises: 5c1e7d2b9a40
+Create Date: 2026-10-18 09:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f3a6c1b27'
+down_revision: Union[str, Sequence[str], None] = '5c1e7d2b9a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'tasks',
+        sa.Column('type', sa.String(length=64), server_default='default', nullable=False)
+    )
+    op.add_column(
+        'tasks',
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tasks', 'payload')
+    op.drop_column('tasks', 'type')
@@ -0,0 +1,105 @@
+"""create_task_partitions moves rows out of tasks_default
+
+Revision ID: a3d6e1f09c52
+Revises: f5c8d2b6a417
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d6e1f09c52'
+down_revision: Union[str, Sequence[str], None] = 'f5c8d2b6a417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('''
+CREATE OR REPLACE FUNCTION create_task_partitions(
+    from_date timestamp,
+    months_ahead integer
+) RETURNS integer AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', from_date);
+    last_month timestamp := date_trunc(
+        'month',
+        (now() AT TIME ZONE 'utc') + make_interval(months => months_ahead)
+    );
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'tasks_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            IF EXISTS (
+                SELECT 1 FROM tasks_default
+                WHERE created_at >= month_start
+                    AND created_at < month_start + interval '1 month'
+            ) THEN
+                -- Строки месяца уже в tasks_default: она отключается на время
+                -- создания секции, строки переносятся между секциями напрямую,
+                -- минуя триггеры счетчиков на tasks
+                ALTER TABLE tasks DETACH PARTITION tasks_default;
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF tasks FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_start + interval '1 month'
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM tasks_default '
+                    'WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month_start, month_start + interval '1 month', partition_name
+                );
+                ALTER TABLE tasks ATTACH PARTITION tasks_default DEFAULT;
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF tasks FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_start + interval '1 month'
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+''')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('''
+CREATE OR REPLACE FUNCTION create_task_partitions(
+    from_date timestamp,
+    months_ahead integer
+) RETURNS integer AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', from_date);
+    last_month timestamp := date_trunc(
+        'month',
+        (now() AT TIME ZONE 'utc') + make_interval(months => months_ahead)
+    );
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'tasks_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF tasks FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_start + interval '1 month'
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+''')
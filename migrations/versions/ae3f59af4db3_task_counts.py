@@ -0,0 +1,116 @@
+"""task counters maintained by triggers
+
+Revision ID: ae3f59af4db3
+Revises: 072fec93f315
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ae3f59af4db3'
+down_revision: Union[str, Sequence[str], None] = '072fec93f315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TASK_COUNT_SHARDS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'task_counts',
+        sa.Column('status', postgresql.ENUM(name='task_status', create_type=False),
+                  primary_key=True),
+        sa.Column('priority', postgresql.ENUM(name='task_priority', create_type=False),
+                  primary_key=True),
+        sa.Column('shard', sa.SmallInteger(), primary_key=True),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        if_not_exists=True
+    )
+    op.execute(f'''
+CREATE OR REPLACE FUNCTION tasks_update_counts() RETURNS trigger AS $$
+DECLARE
+    target_shard smallint := floor(random() * {TASK_COUNT_SHARDS});
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO task_counts (status, priority, shard, count)
+        SELECT status, priority, target_shard, count(*)
+        FROM new_rows
+        GROUP BY status, priority
+        ORDER BY status, priority
+        ON CONFLICT (status, priority, shard)
+        DO UPDATE SET count = task_counts.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO task_counts (status, priority, shard, count)
+        SELECT status, priority, target_shard, -count(*)
+        FROM old_rows
+        GROUP BY status, priority
+        ORDER BY status, priority
+        ON CONFLICT (status, priority, shard)
+        DO UPDATE SET count = task_counts.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO task_counts (status, priority, shard, count)
+        SELECT status, priority, target_shard, sum(delta)
+        FROM (
+            SELECT old_rows.status, old_rows.priority, -1 AS delta
+            FROM old_rows JOIN new_rows USING (id)
+            WHERE (old_rows.status, old_rows.priority)
+                  IS DISTINCT FROM (new_rows.status, new_rows.priority)
+            UNION ALL
+            SELECT new_rows.status, new_rows.priority, 1
+            FROM old_rows JOIN new_rows USING (id)
+            WHERE (old_rows.status, old_rows.priority)
+                  IS DISTINCT FROM (new_rows.status, new_rows.priority)
+        ) AS changes
+        GROUP BY status, priority
+        HAVING sum(delta) <> 0
+        ORDER BY status, priority
+        ON CONFLICT (status, priority, shard)
+        DO UPDATE SET count = task_counts.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+''')
+
+    # Пока триггеры создаются и счетчики заполняются, запись в tasks ждет,
+    # иначе задачи, созданные между этими шагами, потеряются в счетчиках
+    op.execute('LOCK TABLE tasks IN SHARE ROW EXCLUSIVE MODE')
+    op.execute('DROP TRIGGER IF EXISTS tasks_counts_insert ON tasks')
+    op.execute('DROP TRIGGER IF EXISTS tasks_counts_update ON tasks')
+    op.execute('DROP TRIGGER IF EXISTS tasks_counts_delete ON tasks')
+    op.execute('''
+CREATE TRIGGER tasks_counts_insert AFTER INSERT ON tasks
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION tasks_update_counts()
+''')
+    op.execute('''
+CREATE TRIGGER tasks_counts_update AFTER UPDATE ON tasks
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION tasks_update_counts()
+''')
+    op.execute('''
+CREATE TRIGGER tasks_counts_delete AFTER DELETE ON tasks
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION tasks_update_counts()
+''')
+    op.execute('DELETE FROM task_counts')
+    op.execute('''
+INSERT INTO task_counts (status, priority, shard, count)
+SELECT status, priority, 0, count(*) FROM tasks GROUP BY status, priority
+''')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER IF EXISTS tasks_counts_delete ON tasks')
+    op.execute('DROP TRIGGER IF EXISTS tasks_counts_update ON tasks')
+    op.execute('DROP TRIGGER IF EXISTS tasks_counts_insert ON tasks')
+    op.execute('DROP FUNCTION IF EXISTS tasks_update_counts()')
+    op.drop_table('task_counts')
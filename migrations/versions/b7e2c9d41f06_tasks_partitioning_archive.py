@@ -0,0 +1,160 @@
+"""range partitioning of tasks and tasks_archive
+
+Revision ID: b7e2c9d41f06
+Revises: 9d4f3a6c1b27
+Create Date: 2026-10-18 10:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c9d41f06'
+down_revision: Union[str, Sequence[str], None] = '9d4f3a6c1b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TASK_COLUMNS = ('id, title, description, type, payload, priority, status, created_at, '
+                'started_at, completed_at, attempts, result, error_info')
+COUNT_TRIGGERS = {
+    'tasks_counts_insert': 'AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_rows',
+    'tasks_counts_update': ('AFTER UPDATE ON tasks '
+                            'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    'tasks_counts_delete': 'AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_rows'
+}
+
+
+def task_columns() -> list[sa.Column]:
+    return [
+        sa.Column('id', sa.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('type', sa.String(length=64), server_default='default', nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('priority', postgresql.ENUM(name='task_priority', create_type=False),
+                  nullable=False),
+        sa.Column('status', postgresql.ENUM(name='task_status', create_type=False),
+                  nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error_info', sa.Text(), nullable=True)
+    ]
+
+
+def drop_task_triggers_and_indexes():
+    for trigger in COUNT_TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger} ON tasks')
+    op.execute('DROP INDEX IF EXISTS ix_tasks_id')
+    op.execute('DROP INDEX IF EXISTS ix_tasks_status_priority')
+    op.execute('DROP INDEX IF EXISTS ix_tasks_created_at_id')
+
+
+def create_task_triggers_and_indexes():
+    op.create_index('ix_tasks_id', 'tasks', ['id'])
+    op.create_index('ix_tasks_status_priority', 'tasks', ['status', 'priority'])
+    op.create_index('ix_tasks_created_at_id', 'tasks', ['created_at', 'id'],
+                    postgresql_include=['status', 'priority'])
+    for trigger, timing in COUNT_TRIGGERS.items():
+        op.execute(f'CREATE TRIGGER {trigger} {timing} '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION tasks_update_counts()')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # У секционированной таблицы уникален только (id, created_at),
+    # поэтому внешний ключ outbox -> tasks(id) больше невозможен
+    op.execute('ALTER TABLE task_outbox DROP CONSTRAINT IF EXISTS task_outbox_task_id_fkey')
+
+    # Переименование блокирует tasks до конца миграции, запись ждет
+    drop_task_triggers_and_indexes()
+    op.execute('ALTER TABLE tasks RENAME TO tasks_unpartitioned')
+    op.execute('ALTER TABLE tasks_unpartitioned DROP CONSTRAINT tasks_pkey')
+
+    op.create_table(
+        'tasks',
+        *task_columns(),
+        sa.PrimaryKeyConstraint('id', 'created_at', name='tasks_pkey'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    op.execute('''
+CREATE OR REPLACE FUNCTION create_task_partitions(
+    from_date timestamp,
+    months_ahead integer
+) RETURNS integer AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', from_date);
+    last_month timestamp := date_trunc(
+        'month',
+        (now() AT TIME ZONE 'utc') + make_interval(months => months_ahead)
+    );
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'tasks_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF tasks FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_start + interval '1 month'
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+''')
+    op.execute('CREATE TABLE tasks_default PARTITION OF tasks DEFAULT')
+    op.execute('''
+SELECT create_task_partitions(
+    coalesce((SELECT min(created_at) FROM tasks_unpartitioned), now() AT TIME ZONE 'utc'),
+    2
+)
+''')
+    # Триггеры счетчиков создаются после копирования: строки те же, счетчики верны
+    op.execute(f'INSERT INTO tasks ({TASK_COLUMNS}) '
+               f'SELECT {TASK_COLUMNS} FROM tasks_unpartitioned')
+    op.execute('DROP TABLE tasks_unpartitioned')
+    create_task_triggers_and_indexes()
+
+    op.create_table(
+        'tasks_archive',
+        *task_columns(),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_task_triggers_and_indexes()
+    op.execute('ALTER TABLE tasks RENAME TO tasks_partitioned')
+    op.execute('ALTER TABLE tasks_partitioned DROP CONSTRAINT tasks_pkey')
+
+    op.create_table('tasks', *task_columns(), sa.PrimaryKeyConstraint('id', name='tasks_pkey'))
+    op.execute(f'INSERT INTO tasks ({TASK_COLUMNS}) '
+               f'SELECT {TASK_COLUMNS} FROM tasks_partitioned')
+    op.execute(f'INSERT INTO tasks ({TASK_COLUMNS}) '
+               f'SELECT {TASK_COLUMNS} FROM tasks_archive ON CONFLICT (id) DO NOTHING')
+    op.execute('DROP TABLE tasks_partitioned')
+    op.execute('DROP FUNCTION IF EXISTS create_task_partitions(timestamp, integer)')
+    op.drop_table('tasks_archive')
+    create_task_triggers_and_indexes()
+
+    # Архивные задачи вернулись в tasks мимо триггеров
+    op.execute('DELETE FROM task_counts')
+    op.execute('''
+INSERT INTO task_counts (status, priority, shard, count)
+SELECT status, priority, 0, count(*) FROM tasks GROUP BY status, priority
+''')
+    op.execute('DELETE FROM task_outbox WHERE task_id NOT IN (SELECT id FROM tasks)')
+    op.create_foreign_key('task_outbox_task_id_fkey', 'task_outbox', 'tasks',
+                          ['task_id'], ['id'], ondelete='CASCADE')
@@ -0,0 +1,30 @@
+"""task queued_at
+
+Revision ID: b9e4c7a2d160
+Revises: a3d6e1f09c52
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e4c7a2d160'
+down_revision: Union[str, Sequence[str], None] = 'a3d6e1f09c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('tasks', 'tasks_archive'):
+        op.add_column(table, sa.Column('queued_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('tasks', 'tasks_archive'):
+        op.drop_column(table, 'queued_at')
@@ -0,0 +1,50 @@
+"""large task results out of row
+
+Revision ID: c4a1f8e2d913
+Revises: b7e2c9d41f06
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a1f8e2d913'
+down_revision: Union[str, Sequence[str], None] = 'b7e2c9d41f06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'task_results',
+        sa.Column('digest', sa.String(length=64), primary_key=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False)
+    )
+    op.create_table(
+        'task_result_chunks',
+        sa.Column('digest', sa.String(length=64),
+                  sa.ForeignKey('task_results.digest', ondelete='CASCADE'),
+                  primary_key=True),
+        sa.Column('seq', sa.Integer(), primary_key=True),
+        sa.Column('data', sa.LargeBinary(), nullable=False)
+    )
+    # Куски уже сжаты zlib, повторно сжимать их в TOAST бессмысленно
+    op.execute('ALTER TABLE task_result_chunks ALTER COLUMN data SET STORAGE EXTERNAL')
+    for table in ('tasks', 'tasks_archive'):
+        op.add_column(table, sa.Column('result_ref', sa.String(length=64), nullable=True))
+        op.add_column(table, sa.Column('result_size', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('tasks', 'tasks_archive'):
+        op.drop_column(table, 'result_size')
+        op.drop_column(table, 'result_ref')
+    op.drop_table('task_result_chunks')
+    op.drop_table('task_results')
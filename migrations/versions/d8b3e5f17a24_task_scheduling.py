@@ -0,0 +1,58 @@
+"""run_at for delayed tasks and task_schedules
+
+Revision ID: d8b3e5f17a24
+Revises: c4a1f8e2d913
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8b3e5f17a24'
+down_revision: Union[str, Sequence[str], None] = 'c4a1f8e2d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('tasks', 'tasks_archive'):
+        op.add_column(table, sa.Column('run_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_tasks_run_at', 'tasks', ['run_at'],
+        postgresql_where=sa.text("status = 'NEW' AND run_at IS NOT NULL")
+    )
+
+    op.create_table(
+        'task_schedules',
+        sa.Column('id', sa.UUID(as_uuid=True), primary_key=True),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('type', sa.String(length=64), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('priority', postgresql.ENUM(name='task_priority', create_type=False),
+                  nullable=False),
+        sa.Column('cron', sa.String(length=255), nullable=False),
+        sa.Column('enabled', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('next_run_at', sa.DateTime(), nullable=False),
+        sa.Column('last_run_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index(
+        'ix_task_schedules_next_run_at', 'task_schedules', ['next_run_at'],
+        postgresql_where=sa.text('enabled')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_schedules_next_run_at', table_name='task_schedules')
+    op.drop_table('task_schedules')
+    op.drop_index('ix_tasks_run_at', table_name='tasks')
+    for table in ('tasks', 'tasks_archive'):
+        op.drop_column(table, 'run_at')
@@ -0,0 +1,41 @@
+"""task dependencies and pending_parents counter
+
+Revision ID: e2f7a9c3b815
+Revises: d8b3e5f17a24
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f7a9c3b815'
+down_revision: Union[str, Sequence[str], None] = 'd8b3e5f17a24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('tasks', 'tasks_archive'):
+        op.add_column(
+            table,
+            sa.Column('pending_parents', sa.Integer(), server_default='0', nullable=False)
+        )
+    op.create_table(
+        'task_dependencies',
+        sa.Column('parent_id', sa.UUID(as_uuid=True), primary_key=True),
+        sa.Column('child_id', sa.UUID(as_uuid=True), primary_key=True)
+    )
+    op.create_index('ix_task_dependencies_child_id', 'task_dependencies', ['child_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_dependencies_child_id', table_name='task_dependencies')
+    op.drop_table('task_dependencies')
+    for table in ('tasks', 'tasks_archive'):
+        op.drop_column(table, 'pending_parents')
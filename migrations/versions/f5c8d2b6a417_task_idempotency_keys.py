@@ -0,0 +1,37 @@
+"""task idempotency keys
+
+Revision ID: f5c8d2b6a417
+Revises: e2f7a9c3b815
+Create Date: 2026-10-18 12:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c8d2b6a417'
+down_revision: Union[str, Sequence[str], None] = 'e2f7a9c3b815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'task_idempotency_keys',
+        sa.Column('key', sa.String(length=255), primary_key=True),
+        sa.Column('task_id', sa.UUID(as_uuid=True), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False)
+    )
+    op.create_index('ix_task_idempotency_keys_created_at', 'task_idempotency_keys',
+                    ['created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_idempotency_keys_created_at', table_name='task_idempotency_keys')
+    op.drop_table('task_idempotency_keys')
@@ -0,0 +1,50 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from httpx import AsyncClient
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_create_and_delete_schedule(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    response = await client.post(
+        url='/api/v1/schedules',
+        json={'title': 'Каждый час', 'type': 'noop', 'cron': '0  * * * *'}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data['cron'] == '0 * * * *'
+    assert data['next_run_at'].endswith(':00:00')
+    assert data['last_run_at'] is None
+
+    response = await client.get('/api/v1/schedules')
+    assert [schedule['id'] for schedule in response.json()] == [data['id']]
+
+    response = await client.delete(f'/api/v1/schedules/{data["id"]}')
+    assert response.status_code == 204
+    response = await client.delete(f'/api/v1/schedules/{data["id"]}')
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_create_schedule_validation(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    response = await client.post(
+        url='/api/v1/schedules',
+        json={'title': 'Плохой cron', 'cron': '0 0 30 2 *'}
+    )
+    assert response.status_code == 422
+
+    response = await client.post(
+        url='/api/v1/schedules',
+        json={'title': 'Чужой тип', 'type': 'unknown', 'cron': '* * * * *'}
+    )
+    assert response.status_code == 422
@@ -1,14 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, text
 from httpx import AsyncClient
 
 from unittest.mock import AsyncMock
+from datetime import datetime
 from uuid import UUID
 
 import pytest
 
 from app.schemas.task import TaskStatus, TaskPriority
 from app.models.task import Task
+from app.models.outbox import OutboxMessage
+from app.servisec.cache import idempotency_cache
 
 
 @pytest.mark.asyncio
@@ -41,6 +44,47 @@ async def test_create_task(
     task_in_db = task_in_db.scalar_one_or_none()
 
 
+@pytest.mark.asyncio
+async def test_create_task_writes_outbox(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    response = await client.post(
+        url='/api/v1/tasks',
+        json={'title': 'Задача в outbox', 'priority': TaskPriority.LOW.value}
+    )
+    assert response.status_code == 201
+    task_id = UUID(response.json()['id'])
+
+    outbox = (await db_session.execute(
+        select(OutboxMessage).where(OutboxMessage.task_id == task_id)
+    )).scalar_one()
+    assert outbox.priority == TaskPriority.LOW
+    mock_rabbitmq_producer.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_delayed_task(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    response = await client.post(
+        url='/api/v1/tasks',
+        json={'title': 'Отложенная задача', 'run_at': '2099-01-01T00:00:00+03:00'}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data['status'] == TaskStatus.NEW.value
+    assert data['run_at'] == '2098-12-31T21:00:00'
+
+    outbox = (await db_session.execute(
+        select(OutboxMessage).where(OutboxMessage.task_id == UUID(data['id']))
+    )).scalar_one_or_none()
+    assert outbox is None
+
+
 @pytest.mark.asyncio
 async def test_get_tasks_list(
     client: AsyncClient,
@@ -77,6 +121,112 @@ async def test_get_tasks_list(
     assert data['items'][0]['title'] == 'Задача 1'
 
 
+@pytest.mark.asyncio
+async def test_get_tasks_total_counters(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    task = Task(
+        id=UUID('c2000000-0000-0000-0000-000000000001'),
+        title='Счетчик',
+        priority=TaskPriority.HIGH,
+        status=TaskStatus.PENDING
+    )
+    db_session.add(task)
+    await db_session.commit()
+
+    params = {'status': TaskStatus.PENDING.value, 'priority': TaskPriority.HIGH.value}
+    response = await client.get('/api/v1/tasks', params=params)
+    assert response.json()['total'] == 1
+
+    task.status = TaskStatus.COMPLETED
+    await db_session.commit()
+
+    response = await client.get('/api/v1/tasks', params=params)
+    assert response.json()['total'] == 0
+    response = await client.get(
+        '/api/v1/tasks',
+        params={'status': TaskStatus.COMPLETED.value, 'total': 'exact'}
+    )
+    assert response.json()['total'] == 1
+
+    await db_session.execute(text('ANALYZE tasks'))
+    await db_session.commit()
+    response = await client.get('/api/v1/tasks', params={'total': 'estimate'})
+    assert response.status_code == 200
+    assert response.json()['total'] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_cursor_pagination(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    db_session.add_all([
+        Task(
+            id=UUID(f'c1000000-0000-0000-0000-00000000000{index}'),
+            title=f'Курсор {index}',
+            priority=TaskPriority.MEDIUM,
+            status=TaskStatus.PENDING,
+            created_at=datetime(2025, 1, 1, 12, index)
+        )
+        for index in range(5)
+    ])
+    await db_session.commit()
+
+    titles = []
+    cursor = None
+    for _ in range(3):
+        params = {'page_size': 2}
+        if cursor:
+            params['cursor'] = cursor
+        response = await client.get('/api/v1/tasks', params=params)
+        assert response.status_code == 200
+        data = response.json()
+        titles.extend(item['title'] for item in data['items'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+
+    assert titles == ['Курсор 4', 'Курсор 3', 'Курсор 2', 'Курсор 1', 'Курсор 0']
+    assert cursor is None
+
+    response = await client.get('/api/v1/tasks', params={'cursor': 'не-курсор'})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_fields_projection(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    db_session.add(Task(
+        id=UUID('c5000000-0000-0000-0000-000000000001'),
+        title='Проекция',
+        description='Длинное описание',
+        priority=TaskPriority.HIGH,
+        status=TaskStatus.PENDING
+    ))
+    await db_session.commit()
+
+    response = await client.get('/api/v1/tasks', params={'fields': 'id,status,priority'})
+    assert response.status_code == 200
+    assert response.json()['items'] == [{
+        'id': 'c5000000-0000-0000-0000-000000000001',
+        'status': TaskStatus.PENDING.value,
+        'priority': TaskPriority.HIGH.value
+    }]
+
+    response = await client.get('/api/v1/tasks')
+    assert response.json()['items'][0]['description'] == 'Длинное описание'
+
+    response = await client.get('/api/v1/tasks', params={'fields': 'id,password'})
+    assert response.status_code == 422
+
+
 @pytest.mark.asyncio
 async def test_get_single_task(
     client: AsyncClient,
@@ -131,9 +281,15 @@ async def test_cancel_task(
     task_pending = result.scalar_one()
     assert task_pending.status == TaskStatus.CANCELLED
 
+    response = await client.delete(f'/api/v1/tasks/{task_in_progress.id}')
+    assert response.status_code == 204
+    result = await db_session.execute(
+        select(Task).where(Task.id == task_in_progress.id)
+    )
+    assert result.scalar_one().status == TaskStatus.CANCELLED
+
     response = await client.delete(f'/api/v1/tasks/{task_in_progress.id}')
     assert response.status_code == 400
-    assert 'in progress' in response.json()['detail']
 
     response = await client.delete(
         '/api/v1/tasks/f0000000-0000-0000-0000-000000000001'
@@ -166,3 +322,240 @@ async def test_get_task_status(
         '/api/v1/tasks/h0000000-0000-0000-0000-000000000001/status'
     )
     assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_create_tasks_batch(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    response = await client.post(
+        url='/api/v1/tasks/batch',
+        json=[
+            {'title': 'Пачка 1', 'priority': TaskPriority.HIGH.value},
+            {'title': 'Пачка 2'},
+            {'title': 'Пачка 3', 'priority': TaskPriority.LOW.value}
+        ]
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data['total'] == 3
+    assert data['queued'] == 3
+    assert data['failed'] == 0
+    assert [item['index'] for item in data['items']] == [0, 1, 2]
+    assert {item['status'] for item in data['items']} == {TaskStatus.PENDING.value}
+
+    task_ids = [UUID(item['id']) for item in data['items']]
+    tasks_in_db = (await db_session.execute(
+        select(Task).where(Task.id.in_(task_ids))
+    )).scalars().all()
+    assert {task.status for task in tasks_in_db} == {TaskStatus.PENDING}
+    assert all(task.queued_at is not None for task in tasks_in_db)
+    outbox = (await db_session.execute(
+        select(OutboxMessage).where(OutboxMessage.task_id.in_(task_ids))
+    )).scalars().all()
+    assert {message.task_id for message in outbox} == set(task_ids)
+
+    response = await client.post(url='/api/v1/tasks/batch', json=[])
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_task_events_for_finished_task(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    task = Task(
+        id=UUID('c3000000-0000-0000-0000-000000000001'),
+        title='Готовая задача',
+        priority=TaskPriority.LOW,
+        status=TaskStatus.COMPLETED
+    )
+    db_session.add(task)
+    await db_session.commit()
+
+    response = await client.get(f'/api/v1/tasks/{task.id}/events')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    assert response.text == (
+        'event: status\n'
+        f'data: {{"id": "{task.id}", "status": "COMPLETED"}}\n\n'
+    )
+
+    response = await client.get(
+        '/api/v1/tasks/c3000000-0000-0000-0000-000000000002/events'
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_task_result(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    finished = Task(
+        id=UUID('c4000000-0000-0000-0000-000000000001'),
+        title='Готовая задача',
+        priority=TaskPriority.LOW,
+        status=TaskStatus.COMPLETED,
+        result='Задача завершена за 1 сек.'
+    )
+    pending = Task(
+        id=UUID('c4000000-0000-0000-0000-000000000002'),
+        title='Новая задача',
+        priority=TaskPriority.LOW,
+        status=TaskStatus.PENDING
+    )
+    db_session.add_all([finished, pending])
+    await db_session.commit()
+
+    response = await client.get(f'/api/v1/tasks/{finished.id}/result')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert response.text == 'Задача завершена за 1 сек.'
+
+    response = await client.get(f'/api/v1/tasks/{finished.id}')
+    assert response.json()['result_url'] is None
+
+    response = await client.get(f'/api/v1/tasks/{pending.id}/result')
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_create_task_with_dependencies(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    running = Task(
+        id=UUID('c6000000-0000-0000-0000-000000000001'),
+        title='Выполняется',
+        priority=TaskPriority.LOW,
+        status=TaskStatus.IN_PROGRESS
+    )
+    done = Task(
+        id=UUID('c6000000-0000-0000-0000-000000000002'),
+        title='Готова',
+        priority=TaskPriority.LOW,
+        status=TaskStatus.COMPLETED
+    )
+    failed = Task(
+        id=UUID('c6000000-0000-0000-0000-000000000003'),
+        title='Упала',
+        priority=TaskPriority.LOW,
+        status=TaskStatus.FAILED
+    )
+    db_session.add_all([running, done, failed])
+    await db_session.commit()
+
+    response = await client.post(
+        url='/api/v1/tasks',
+        json={'title': 'Зависимая', 'depends_on': [str(running.id), str(done.id)]}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data['status'] == TaskStatus.NEW.value
+    assert data['pending_parents'] == 1
+    outbox = (await db_session.execute(
+        select(OutboxMessage).where(OutboxMessage.task_id == UUID(data['id']))
+    )).scalar_one_or_none()
+    assert outbox is None
+
+    response = await client.post(
+        url='/api/v1/tasks',
+        json={'title': 'После готовой', 'depends_on': [str(done.id)]}
+    )
+    assert response.json()['status'] == TaskStatus.PENDING.value
+
+    response = await client.post(
+        url='/api/v1/tasks',
+        json={'title': 'После упавшей', 'depends_on': [str(failed.id)]}
+    )
+    assert response.status_code == 422
+    response = await client.post(
+        url='/api/v1/tasks',
+        json={'title': 'Без родителя',
+              'depends_on': ['c6000000-0000-0000-0000-000000000009']}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_create_task_idempotency_key(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    body = {'title': 'Идемпотентная', 'priority': TaskPriority.HIGH.value}
+    headers = {'Idempotency-Key': 'order-42'}
+    first = await client.post(url='/api/v1/tasks', json=body, headers=headers)
+    assert first.status_code == 201
+    task_id = first.json()['id']
+
+    # Повтор из кэша процесса и, после его сброса, из БД.
+    # Оба возвращают текущее состояние задачи, а не снимок при создании
+    await db_session.execute(
+        update(Task).where(Task.id == UUID(task_id)).values(status=TaskStatus.COMPLETED)
+    )
+    await db_session.commit()
+    replay = await client.post(url='/api/v1/tasks', json=body, headers=headers)
+    assert replay.json()['id'] == task_id
+    assert replay.json()['status'] == TaskStatus.COMPLETED.value
+    idempotency_cache.clear()
+    replay = await client.post(url='/api/v1/tasks', json=body, headers=headers)
+    assert replay.status_code == 201
+    assert replay.json()['id'] == task_id
+
+    tasks = (await db_session.execute(
+        select(Task).where(Task.title == 'Идемпотентная')
+    )).scalars().all()
+    assert len(tasks) == 1
+    outbox = (await db_session.execute(
+        select(OutboxMessage).where(OutboxMessage.task_id == UUID(task_id))
+    )).scalars().all()
+    assert len(outbox) <= 1
+
+    response = await client.post(
+        url='/api/v1/tasks',
+        json={**body, 'title': 'Другая'},
+        headers=headers
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_create_tasks_batch_dedup_key(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    mock_rabbitmq_producer: AsyncMock
+):
+    first = await client.post(
+        url='/api/v1/tasks',
+        json={'title': 'Первая', 'dedup_key': 'batch-1'}
+    )
+    response = await client.post(
+        url='/api/v1/tasks/batch',
+        json=[
+            {'title': 'Новая', 'dedup_key': 'batch-2'},
+            {'title': 'Первая', 'dedup_key': 'batch-1'}
+        ]
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data['total'] == 2
+    assert data['deduplicated'] == 1
+    assert [item['index'] for item in data['items']] == [0, 1]
+    assert data['items'][1]['id'] == first.json()['id']
+    assert data['items'][1]['deduplicated'] is True
+
+    response = await client.post(
+        url='/api/v1/tasks/batch',
+        json=[
+            {'title': 'А', 'dedup_key': 'batch-3'},
+            {'title': 'Б', 'dedup_key': 'batch-3'}
+        ]
+    )
+    assert response.status_code == 422
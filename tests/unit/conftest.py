@@ -0,0 +1,27 @@
+from contextlib import ExitStack
+from typing import Callable, Iterator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+
+@pytest.fixture
+def patch_session_local() -> Iterator[Callable[[str], MagicMock]]:
+    '''
+    Фабрика фейковой сессии БД: patch_session_local('app.module') подменяет
+    SessionLocal в модуле и возвращает сессию с async execute и commit.
+    Подмены снимаются после теста
+    '''
+
+    with ExitStack() as stack:
+        def _patch(module: str) -> MagicMock:
+            session = MagicMock()
+            session.execute = AsyncMock(return_value=MagicMock())
+            session.commit = AsyncMock()
+            session_factory = MagicMock()
+            session_factory.return_value.__aenter__ = AsyncMock(return_value=session)
+            session_factory.return_value.__aexit__ = AsyncMock(return_value=False)
+            stack.enter_context(patch(f'{module}.SessionLocal', session_factory))
+            return session
+
+        yield _patch
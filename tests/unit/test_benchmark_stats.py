@@ -0,0 +1,19 @@
+from benchmarks.stats import percentile, summarize
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.95) == 0.0
+
+
+def test_summarize_reports_milliseconds_and_throughput():
+    summary = summarize([0.001, 0.003, 0.002], duration=0.5, errors=1)
+
+    assert summary['count'] == 3
+    assert summary['errors'] == 1
+    assert summary['throughput_per_s'] == 6.0
+    assert summary['latency_ms']['p50'] == 2.0
+    assert summary['latency_ms']['max'] == 3.0
@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+from app.core.cache import TTLCache
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=5)
+    with patch('app.core.cache.time.monotonic', return_value=100):
+        cache.set('a', 1)
+    with patch('app.core.cache.time.monotonic', return_value=104):
+        assert cache.get('a') == 1
+    with patch('app.core.cache.time.monotonic', return_value=106):
+        assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_cache_skips_value_read_before_invalidation():
+    cache = TTLCache(maxsize=10, ttl=60)
+    token = cache.token()
+    cache.invalidate('a')
+    cache.set('a', 'старое значение', token)
+    assert cache.get('a') is None
+
+    cache.set('a', 'новое значение', cache.token())
+    assert cache.get('a') == 'новое значение'
+
+
+def test_disabled_cache_stores_nothing():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.enabled = False
+    cache.set('a', 1)
+    cache.enabled = True
+    assert cache.get('a') is None
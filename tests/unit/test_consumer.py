@@ -0,0 +1,36 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import json
+import pytest
+
+from app.worker.consumer import RabbitMQConsumer
+
+
+def make_message(task_id: str) -> MagicMock:
+    message = MagicMock()
+    message.body = json.dumps({'task_id': task_id}).encode()
+    message.routing_key = 'task_queue_medium'
+    message.nack = AsyncMock()
+    message.acked = False
+
+    @asynccontextmanager
+    async def process(ignore_processed=False):
+        yield
+        if not message.nack.await_count:
+            message.acked = True
+
+    message.process = process
+    return message
+
+
+@pytest.mark.asyncio
+async def test_failed_claim_requeues_message():
+    message = make_message(str(uuid4()))
+    with patch('app.worker.consumer.TaskStatusWriter.claim',
+               AsyncMock(side_effect=ConnectionError('db down'))):
+        await RabbitMQConsumer._process_message(message)
+
+    message.nack.assert_awaited_once_with(requeue=True)
+    assert message.acked is False
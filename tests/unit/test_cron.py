@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.cron import CronExpression
+
+
+@pytest.mark.parametrize('expression, moment, expected', [
+    ('*/15 * * * *', datetime(2026, 1, 1, 10, 7, 30), datetime(2026, 1, 1, 10, 15)),
+    ('0 9 * * 1-5', datetime(2026, 10, 17, 10, 0), datetime(2026, 10, 19, 9, 0)),
+    ('30 23 31 * *', datetime(2026, 4, 1), datetime(2026, 5, 31, 23, 30)),
+    ('0 0 29 2 *', datetime(2026, 3, 1), datetime(2028, 2, 29, 0, 0)),
+    # Заданы и день месяца, и день недели: подходит любой
+    ('0 0 1 * 0', datetime(2026, 10, 2), datetime(2026, 10, 4, 0, 0)),
+    ('0 0 * * 7', datetime(2026, 10, 2), datetime(2026, 10, 4, 0, 0)),
+    ('5,10 * * * *', datetime(2026, 1, 1, 10, 5), datetime(2026, 1, 1, 10, 10)),
+])
+def test_cron_next_after(expression: str, moment: datetime, expected: datetime):
+    assert CronExpression(expression).next_after(moment) == expected
+
+
+@pytest.mark.parametrize('expression', [
+    '* * *', '61 * * * *', 'a * * * *', '*/0 * * * *', '5-1 * * * *'
+])
+def test_cron_rejects_invalid_expression(expression: str):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_cron_never_matching_expression():
+    with pytest.raises(ValueError):
+        CronExpression('0 0 30 2 *').next_after(datetime(2026, 1, 1))
@@ -0,0 +1,26 @@
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+
+import pytest
+
+from app.core.metrics import MetricsMiddleware
+
+
+@pytest.mark.asyncio
+async def test_metrics_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get('/items/{item_id}')
+    async def get_item(item_id: int):
+        return {'id': item_id}
+
+    labels = {'method': 'GET', 'route': '/items/{item_id}', 'status': '200'}
+    before = REGISTRY.get_sample_value('http_request_duration_seconds_count', labels) or 0
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as client:
+        for item_id in (1, 2):
+            assert (await client.get(f'/items/{item_id}')).status_code == 200
+
+    assert REGISTRY.get_sample_value('http_request_duration_seconds_count', labels) == before + 2
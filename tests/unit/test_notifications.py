@@ -0,0 +1,44 @@
+from fastapi import WebSocketDisconnect
+from unittest.mock import AsyncMock, MagicMock, patch
+from types import SimpleNamespace
+from uuid import uuid4
+
+import asyncio
+import pytest
+
+from app.models.task import TaskStatus
+from app.servisec.notifications import TaskEventHub, watch_tasks_ws
+
+
+@pytest.mark.asyncio
+async def test_ws_keeps_event_published_while_status_is_read():
+    task_id = uuid4()
+    sent = []
+    done = asyncio.Event()
+
+    async def receive_json():
+        if not sent:
+            return {'action': 'watch', 'task_ids': [str(task_id)]}
+        await done.wait()
+        raise WebSocketDisconnect()
+
+    async def send_json(data):
+        sent.append(data)
+        if data.get('status') == TaskStatus.COMPLETED.value:
+            done.set()
+
+    async def read_status(_task_id, _session):
+        # Задача завершилась, пока читался ее статус
+        TaskEventHub.publish(task_id, TaskStatus.COMPLETED)
+        await asyncio.sleep(0)
+        return SimpleNamespace(status=TaskStatus.IN_PROGRESS)
+
+    websocket = MagicMock(receive_json=receive_json, send_json=send_json)
+    with patch('app.servisec.notifications.get_task_status_s', read_status):
+        await asyncio.wait_for(
+            watch_tasks_ws(websocket, MagicMock(commit=AsyncMock())),
+            timeout=1
+        )
+
+    assert [message['status'] for message in sent] == ['IN_PROGRESS', 'COMPLETED']
+    assert task_id not in TaskEventHub._subscribers
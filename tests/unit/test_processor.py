@@ -0,0 +1,41 @@
+import hashlib
+import threading
+import pytest
+
+from app.servisec_worker.handlers import task_handler, HandlerKind, get_handler
+from app.servisec_worker.processor import (process_task_logic, start_process_pool,
+                                           shutdown_process_pool)
+
+
+@task_handler('test-thread', HandlerKind.THREAD)
+def blocking_handler(task_id: str, payload: dict | None) -> tuple[bool, str]:
+    return True, threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_thread_handler_runs_outside_event_loop_thread():
+    success, thread_name = await process_task_logic('task', 'test-thread')
+
+    assert success is True
+    assert thread_name != threading.main_thread().name
+
+
+@pytest.mark.asyncio
+async def test_process_handler_runs_in_pool():
+    start_process_pool()
+    try:
+        success, digest = await process_task_logic(
+            'task', 'sha256', {'data': 'abc', 'rounds': 2}
+        )
+    finally:
+        shutdown_process_pool()
+
+    expected = hashlib.sha256(hashlib.sha256(b'abc').digest()).hexdigest()
+    assert (success, digest) == (True, expected)
+
+
+def test_duplicate_and_unknown_handlers_are_rejected():
+    with pytest.raises(ValueError):
+        task_handler('sha256')(blocking_handler)
+    with pytest.raises(LookupError):
+        get_handler('missing')
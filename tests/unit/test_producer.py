@@ -0,0 +1,48 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+from aio_pika.exceptions import DeliveryError
+
+import pytest
+
+from app.core.config import settings
+from app.models.task import TaskPriority
+from app.queue.producer import RabbitMQProducer
+
+
+@pytest.fixture
+async def fake_channel():
+    channel = MagicMock(is_closed=False)
+    channel.default_exchange.publish = AsyncMock()
+    connection = MagicMock(is_closed=False)
+    connection.channel = AsyncMock(return_value=channel)
+    with patch.object(RabbitMQProducer, '_connection', connection), \
+            patch.object(RabbitMQProducer, '_channel', channel), \
+            patch.object(RabbitMQProducer, '_buffer', None), \
+            patch.object(RabbitMQProducer, '_publishers', []), \
+            patch.multiple(settings, PUBLISH_CHANNEL_POOL_SIZE=2, PUBLISH_BATCH_SIZE=2):
+        RabbitMQProducer._start_publishers()
+        yield channel
+        await RabbitMQProducer._stop_publishers()
+
+
+@pytest.mark.asyncio
+async def test_publish_task_messages_reports_each_confirm(fake_channel: MagicMock):
+    nack = DeliveryError(None, None)
+    fake_channel.default_exchange.publish.side_effect = [None, nack, None]
+
+    results = await RabbitMQProducer.publish_task_messages([
+        ('1', TaskPriority.HIGH),
+        ('2', TaskPriority.LOW),
+        ('3', TaskPriority.MEDIUM)
+    ])
+
+    assert results.count(None) == 2
+    assert nack in results
+    assert fake_channel.default_exchange.publish.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_publish_task_message_raises_when_broker_rejects(fake_channel: MagicMock):
+    fake_channel.default_exchange.publish.side_effect = DeliveryError(None, None)
+
+    with pytest.raises(DeliveryError):
+        await RabbitMQProducer.publish_task_message('1', TaskPriority.HIGH)
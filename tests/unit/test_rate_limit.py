@@ -0,0 +1,102 @@
+from fastapi import HTTPException
+from unittest.mock import patch
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.core.rate_limit import TokenBucketLimiter
+from app.models.task import TaskPriority
+from app.schemas.task import TaskCreate
+from app.servisec import admission, tasks
+from app.servisec.cache import idempotency_cache
+from app.servisec.admission import QueueDepthMonitor, admit_tasks_s, get_client_id
+
+
+def test_bucket_allows_burst_then_refills():
+    limiter = TokenBucketLimiter(rate=2, burst=3, maxsize=10)
+    with patch('app.core.rate_limit.time.monotonic', return_value=100):
+        assert [limiter.acquire('a') for _ in range(3)] == [0, 0, 0]
+        assert limiter.acquire('a') == pytest.approx(0.5)
+        # Другой клиент лимит первого не расходует
+        assert limiter.acquire('b') == 0
+    with patch('app.core.rate_limit.time.monotonic', return_value=100.5):
+        assert limiter.acquire('a') == 0
+        assert limiter.acquire('a') == pytest.approx(0.5)
+
+
+def test_bucket_caps_cost_and_evicts_idle_clients():
+    limiter = TokenBucketLimiter(rate=1, burst=5, maxsize=2)
+    with patch('app.core.rate_limit.time.monotonic', return_value=100):
+        assert limiter.acquire('a', cost=50) == 0
+        assert limiter.acquire('a') == pytest.approx(1)
+        limiter.acquire('b')
+        limiter.acquire('c')
+    assert len(limiter) == 2
+
+
+@pytest.fixture
+def queue_depths():
+    QueueDepthMonitor._fetched_at = float('inf')
+    yield QueueDepthMonitor._depths
+    QueueDepthMonitor._depths = {}
+    QueueDepthMonitor._fetched_at = float('-inf')
+    admission.rate_limiter.clear()
+
+
+def test_admission_rejects_full_queue(queue_depths):
+    queue_depths['task_queue_high'] = 10
+    task = TaskCreate(title='Срочная', priority=TaskPriority.HIGH)
+    with patch.object(admission.settings, 'TASK_QUEUE_MAX_DEPTH', 5):
+        with pytest.raises(HTTPException) as err:
+            admit_tasks_s('ip:1', [task])
+        assert err.value.status_code == 503
+        assert err.value.headers['Retry-After'] == str(admission.settings.TASK_QUEUE_RETRY_AFTER)
+
+        # Отложенная задача в очередь сразу не попадет
+        admit_tasks_s('ip:1', [TaskCreate(
+            title='Потом',
+            priority=TaskPriority.HIGH,
+            run_at=datetime.utcnow() + timedelta(hours=1)
+        )])
+        admit_tasks_s('ip:1', [TaskCreate(title='Обычная')])
+
+
+def test_admission_rate_limits_client(queue_depths):
+    tasks = [TaskCreate(title=f'Задача {index}') for index in range(3)]
+    with patch.object(admission.rate_limiter, 'burst', 3), \
+            patch.object(admission.rate_limiter, 'rate', 0.5):
+        admit_tasks_s('key:tenant', tasks)
+        with pytest.raises(HTTPException) as err:
+            admit_tasks_s('key:tenant', tasks[:1])
+        assert err.value.status_code == 429
+        assert err.value.headers['Retry-After'] == '2'
+        admit_tasks_s('key:other', tasks[:1])
+
+
+def test_client_id_uses_only_configured_api_keys():
+    def request(api_key: str | None):
+        headers = {'x-api-key': api_key} if api_key else {}
+        return SimpleNamespace(headers=headers, client=SimpleNamespace(host='10.0.0.1'))
+
+    with patch.object(admission.settings, 'API_KEYS', frozenset({'tenant'})):
+        assert get_client_id(request('tenant')) == 'key:tenant'
+        assert get_client_id(request('random')) == 'ip:10.0.0.1'
+        assert get_client_id(request(None)) == 'ip:10.0.0.1'
+
+
+@pytest.mark.asyncio
+async def test_idempotent_replay_is_not_charged():
+    task = TaskCreate(title='Повтор', dedup_key='retry-1')
+    task_id = uuid4()
+    response = object()
+    idempotency_cache.set('retry-1', (tasks._fingerprint(task), task_id))
+    try:
+        with patch.object(tasks, 'admit_tasks_s') as admit, \
+                patch.object(tasks, 'get_task_s', return_value=response) as get_task:
+            assert await tasks.create_task_s(task, session=None, client_id='ip:1') is response
+        admit.assert_not_called()
+        get_task.assert_awaited_once_with(task_id, None)
+    finally:
+        idempotency_cache.clear()
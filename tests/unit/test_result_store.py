@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock
+
+import hashlib
+import pytest
+import zlib
+
+from app.core.config import settings
+from app.servisec_worker.result_store import (offload_result, compress_chunks,
+                                              INSERT_RESULT_STATEMENT, INSERT_CHUNK_STATEMENT)
+
+
+@pytest.fixture
+def fake_session(patch_session_local):
+    return patch_session_local('app.servisec_worker.result_store')
+
+
+def test_compress_chunks_round_trip():
+    data = bytes(range(256)) * 10
+
+    chunks = compress_chunks(data, 1000)
+
+    assert len(chunks) == 3
+    assert b''.join(zlib.decompress(chunk) for chunk in chunks) == data
+
+
+@pytest.mark.asyncio
+async def test_offload_result_keeps_small_result_inline(fake_session: MagicMock):
+    assert await offload_result('готово') == ('готово', None, None)
+    assert await offload_result(None) == (None, None, None)
+    fake_session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_offload_result_stores_large_result(fake_session: MagicMock):
+    result = 'x' * (settings.TASK_RESULT_INLINE_LIMIT + 1)
+    digest = hashlib.sha256(result.encode()).hexdigest()
+    fake_session.execute.return_value.scalar_one_or_none.return_value = digest
+
+    assert await offload_result(result) == (None, digest, len(result))
+    (result_call, chunks_call) = fake_session.execute.await_args_list
+    assert result_call.args == (INSERT_RESULT_STATEMENT,
+                                {'digest': digest, 'size': len(result)})
+    assert chunks_call.args[0] is INSERT_CHUNK_STATEMENT
+    assert zlib.decompress(chunks_call.args[1][0]['data']) == result.encode()
+    fake_session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_offload_result_skips_stored_duplicate(fake_session: MagicMock):
+    fake_session.execute.return_value.scalar_one_or_none.return_value = None
+
+    await offload_result('y' * (settings.TASK_RESULT_INLINE_LIMIT + 1))
+
+    assert fake_session.execute.await_count == 1
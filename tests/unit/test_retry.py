@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+import asyncio
+import pytest
+
+from app.core.config import settings
+from app.queue.retry import get_retry_delay, get_retry_delays
+from app.worker.consumer import RabbitMQConsumer
+
+
+def test_retry_delay_grows_exponentially_up_to_max():
+    with patch.multiple(settings, TASK_RETRY_BASE_DELAY=5.0,
+                        TASK_RETRY_MAX_DELAY=30.0, TASK_MAX_ATTEMPTS=6):
+        assert [get_retry_delay(attempt) for attempt in range(1, 6)] == [
+            5000, 10000, 20000, 30000, 30000
+        ]
+        assert get_retry_delays() == [5000, 10000, 20000, 30000]
+
+
+@pytest.mark.asyncio
+async def test_execute_turns_timeout_into_failed_attempt():
+    async def hang(task_id: str, task_type: str, payload: dict | None) -> tuple[bool, str]:
+        await asyncio.sleep(10)
+        return True, 'готово'
+
+    with patch('app.worker.consumer.process_task_logic', hang):
+        success, error_info = await RabbitMQConsumer._execute('task', 'default', None, 0.01)
+
+    assert success is False
+    assert '0.01' in error_info
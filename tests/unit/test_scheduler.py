@@ -0,0 +1,75 @@
+from collections import Counter
+from unittest.mock import patch
+
+import asyncio
+import pytest
+
+from app.models.task import TaskPriority
+from app.worker.scheduler import PriorityScheduler
+
+
+WEIGHTS = {
+    TaskPriority.HIGH: 6,
+    TaskPriority.MEDIUM: 3,
+    TaskPriority.LOW: 1
+}
+
+
+async def _fill(scheduler: PriorityScheduler, count: int):
+    for index in range(count):
+        for priority in TaskPriority:
+            await scheduler.put(priority, (priority, index))
+
+
+@pytest.mark.asyncio
+async def test_scheduler_respects_weights():
+    scheduler = PriorityScheduler(WEIGHTS, max_wait=3600, buffer_size=100)
+    await _fill(scheduler, 100)
+
+    picked = Counter()
+    for _ in range(100):
+        priority, _ = await scheduler.get()
+        picked[priority] += 1
+
+    assert picked[TaskPriority.HIGH] == 60
+    assert picked[TaskPriority.MEDIUM] == 30
+    assert picked[TaskPriority.LOW] == 10
+
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_single_backlog():
+    scheduler = PriorityScheduler(WEIGHTS, max_wait=3600, buffer_size=10)
+    for index in range(5):
+        await scheduler.put(TaskPriority.LOW, index)
+
+    assert [await scheduler.get() for _ in range(5)] == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_picks_overdue_message_first():
+    scheduler = PriorityScheduler(WEIGHTS, max_wait=10, buffer_size=10)
+    with patch('app.worker.scheduler.time.monotonic', return_value=0):
+        await scheduler.put(TaskPriority.LOW, 'low')
+    with patch('app.worker.scheduler.time.monotonic', return_value=15):
+        await scheduler.put(TaskPriority.HIGH, 'high')
+        assert await scheduler.get() == 'low'
+        assert await scheduler.get() == 'high'
+
+
+@pytest.mark.asyncio
+async def test_scheduler_put_blocks_when_buffer_full():
+    scheduler = PriorityScheduler(WEIGHTS, max_wait=3600, buffer_size=1)
+    await scheduler.put(TaskPriority.HIGH, 'first')
+
+    pending_put = asyncio.create_task(scheduler.put(TaskPriority.HIGH, 'second'))
+    await asyncio.sleep(0)
+    assert not pending_put.done()
+
+    assert await scheduler.get() == 'first'
+    await pending_put
+    assert await scheduler.get() == 'second'
+
+
+def test_scheduler_rejects_zero_weight():
+    with pytest.raises(ValueError):
+        PriorityScheduler({TaskPriority.HIGH: 0}, max_wait=1)
@@ -0,0 +1,163 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime
+from uuid import uuid4
+
+import asyncio
+import pytest
+
+from app.models.task import TaskStatus, TaskPriority
+from app.servisec_worker.status_writer import (TaskStatusWriter, CLAIM_STATEMENT,
+                                               FINISH_STATEMENT)
+from app.servisec_worker.dependencies import (RELEASE_CHILDREN_STATEMENT,
+                                              FAIL_DESCENDANTS_STATEMENT)
+
+
+@pytest.fixture
+def fake_session(patch_session_local):
+    session = patch_session_local('app.servisec_worker.status_writer')
+    session.execute.return_value.scalars.return_value = []
+    session.execute.return_value.all.return_value = []
+    with patch('app.servisec_worker.status_writer.RabbitMQProducer.publish_task_event',
+               new=AsyncMock()), \
+            patch('app.servisec_worker.status_writer.OutboxRelay.notify'):
+        yield session
+
+
+@pytest.mark.asyncio
+async def test_status_writer_coalesces_updates(fake_session: MagicMock):
+    started_id, finished_id = uuid4(), uuid4()
+    queued_at = datetime.utcnow()
+    fake_session.execute.return_value.all.return_value = [
+        (started_id, 'HIGH', 1, 'sha256', {'data': 'x'}, queued_at)
+    ]
+    fake_session.execute.return_value.scalars.return_value = [finished_id]
+    await TaskStatusWriter.start()
+    try:
+        now = datetime.utcnow()
+        claimed, finished = await asyncio.gather(
+            TaskStatusWriter.claim(started_id, now),
+            TaskStatusWriter.mark_finished(finished_id, TaskStatus.COMPLETED, now,
+                                           result='готово')
+        )
+    finally:
+        await TaskStatusWriter.stop()
+
+    assert claimed == (TaskPriority.HIGH, 1, 'sha256', {'data': 'x'}, queued_at)
+    assert finished is True
+    assert fake_session.commit.await_count == 1
+    (claim_call, finish_call, release_call) = fake_session.execute.await_args_list
+    assert claim_call.args == (CLAIM_STATEMENT, {'ids': [started_id], 'started_at': [now]})
+    assert finish_call.args[0] is FINISH_STATEMENT
+    assert finish_call.args[1]['ids'] == [finished_id]
+    assert finish_call.args[1]['statuses'] == ['COMPLETED']
+    assert finish_call.args[1]['results'] == ['готово']
+    assert release_call.args[0] is RELEASE_CHILDREN_STATEMENT
+    assert release_call.args[1]['ids'] == [finished_id]
+
+
+@pytest.mark.asyncio
+async def test_status_writer_propagates_flush_error(fake_session: MagicMock):
+    fake_session.commit.side_effect = ConnectionError('БД недоступна')
+    await TaskStatusWriter.start()
+    try:
+        with pytest.raises(ConnectionError):
+            await TaskStatusWriter.claim(uuid4(), datetime.utcnow())
+    finally:
+        await TaskStatusWriter.stop()
+
+
+@pytest.mark.asyncio
+async def test_status_writer_grants_duplicate_claim_once(fake_session: MagicMock):
+    task_id, missing_id = uuid4(), uuid4()
+    queued_at = datetime.utcnow()
+    fake_session.execute.return_value.all.return_value = [
+        (task_id, 'LOW', 2, 'default', None, queued_at)
+    ]
+    await TaskStatusWriter.start()
+    try:
+        now = datetime.utcnow()
+        results = await asyncio.gather(
+            TaskStatusWriter.claim(task_id, now),
+            TaskStatusWriter.claim(task_id, now),
+            TaskStatusWriter.claim(missing_id, now)
+        )
+    finally:
+        await TaskStatusWriter.stop()
+
+    assert results == [(TaskPriority.LOW, 2, 'default', None, queued_at), None, None]
+
+
+@pytest.mark.asyncio
+async def test_status_writer_releases_task_for_retry(fake_session: MagicMock):
+    task_id = uuid4()
+    fake_session.execute.return_value.scalars.return_value = [task_id]
+    await TaskStatusWriter.start()
+    try:
+        released = await TaskStatusWriter.release(task_id, 'таймаут')
+    finally:
+        await TaskStatusWriter.stop()
+
+    assert released is True
+    (finish_call,) = fake_session.execute.await_args_list
+    assert finish_call.args[1]['statuses'] == ['PENDING']
+    assert finish_call.args[1]['completed_at'] == [None]
+    assert finish_call.args[1]['errors'] == ['таймаут']
+
+
+@pytest.mark.asyncio
+async def test_status_writer_passes_result_reference(fake_session: MagicMock):
+    task_id = uuid4()
+    fake_session.execute.return_value.scalars.return_value = [task_id]
+    await TaskStatusWriter.start()
+    try:
+        finished = await TaskStatusWriter.mark_finished(
+            task_id, TaskStatus.COMPLETED, datetime.utcnow(),
+            result_ref='ab' * 32, result_size=10_000
+        )
+    finally:
+        await TaskStatusWriter.stop()
+
+    assert finished is True
+    params = fake_session.execute.await_args_list[0].args[1]
+    assert params['results'] == [None]
+    assert params['result_refs'] == ['ab' * 32]
+    assert params['result_sizes'] == [10_000]
+
+
+@pytest.mark.asyncio
+async def test_status_writer_fails_descendants_of_failed_task(fake_session: MagicMock):
+    task_id = uuid4()
+    fake_session.execute.return_value.scalars.return_value = [task_id]
+    await TaskStatusWriter.start()
+    try:
+        await TaskStatusWriter.mark_finished(task_id, TaskStatus.FAILED, datetime.utcnow(),
+                                             error_info='ошибка')
+    finally:
+        await TaskStatusWriter.stop()
+
+    (_, fail_call) = fake_session.execute.await_args_list
+    assert fail_call.args[0] is FAIL_DESCENDANTS_STATEMENT
+    assert fail_call.args[1]['ids'] == [task_id]
+    assert fail_call.args[1]['status'] == 'FAILED'
+
+
+@pytest.mark.asyncio
+async def test_status_writer_does_not_wait_for_fan_out_events(fake_session: MagicMock):
+    task_id = uuid4()
+    fake_session.execute.return_value.scalars.return_value = [task_id]
+    published = asyncio.Event()
+
+    async def slow_publish(task_id: str, status: TaskStatus):
+        await published.wait()
+
+    with patch('app.servisec_worker.status_writer.RabbitMQProducer.publish_task_event',
+               new=slow_publish):
+        await TaskStatusWriter.start()
+        try:
+            now = datetime.utcnow()
+            assert await TaskStatusWriter.mark_finished(task_id, TaskStatus.COMPLETED, now)
+            # Следующая пачка пишется, пока события еще публикуются
+            await asyncio.wait_for(TaskStatusWriter.claim(uuid4(), now), timeout=1)
+        finally:
+            published.set()
+            await TaskStatusWriter.stop()
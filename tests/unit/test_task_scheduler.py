@@ -0,0 +1,59 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.servisec.scheduler import TaskScheduler, RELEASE_STATEMENT
+
+
+@pytest.fixture
+def fake_session(patch_session_local):
+    session = patch_session_local('app.servisec.scheduler')
+    with patch('app.servisec.scheduler.RabbitMQProducer.publish_task_event',
+               new=AsyncMock()), \
+            patch('app.servisec.scheduler.OutboxRelay.notify') as notify:
+        session.notify = notify
+        yield session
+    TaskScheduler._heap = []
+
+
+@pytest.mark.asyncio
+async def test_release_due_takes_only_due_tasks(fake_session: MagicMock):
+    now = datetime.utcnow()
+    due_id, cancelled_id, future_id = uuid4(), uuid4(), uuid4()
+    TaskScheduler._heap = [
+        (now - timedelta(seconds=2), due_id),
+        (now - timedelta(seconds=1), cancelled_id),
+        (now + timedelta(hours=1), future_id)
+    ]
+    fake_session.execute.return_value.scalars.return_value.all.return_value = [due_id]
+
+    assert await TaskScheduler.release_due() == 2
+
+    fake_session.execute.assert_awaited_once_with(
+        RELEASE_STATEMENT, {'ids': [due_id, cancelled_id]}
+    )
+    fake_session.commit.assert_awaited_once()
+    fake_session.notify.assert_called_once()
+    assert TaskScheduler._heap == [(now + timedelta(hours=1), future_id)]
+
+
+@pytest.mark.asyncio
+async def test_release_due_respects_batch_size(fake_session: MagicMock):
+    past = datetime.utcnow() - timedelta(seconds=1)
+    TaskScheduler._heap = [(past, uuid4()) for _ in range(settings.SCHEDULER_BATCH_SIZE + 1)]
+    fake_session.execute.return_value.scalars.return_value.all.return_value = []
+
+    assert await TaskScheduler.release_due() == settings.SCHEDULER_BATCH_SIZE
+    assert len(TaskScheduler._heap) == 1
+    fake_session.notify.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_release_due_without_due_tasks(fake_session: MagicMock):
+    TaskScheduler._heap = [(datetime.utcnow() + timedelta(minutes=1), uuid4())]
+
+    assert await TaskScheduler.release_due() == 0
+    fake_session.execute.assert_not_awaited()